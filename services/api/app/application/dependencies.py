@@ -5,17 +5,21 @@ import typing as t
 import app.infrastructure.dependencies as ideps
 import app.application.services as services
 import app.presentation.schemas as schemas
+from app.common.config import Config
+
+#Per-process: activity is queued here and flushed by a background task (app.infrastructure.telemetry.metrics)
+ActivityDebouncer = services.ActivityDebouncer(Config.ACTIVE_USERS_DEBOUNCE_SECONDS, Config.ACTIVE_USERS_MAX_PENDING) if Config.ACTIVE_USERS_DEBOUNCE_SECONDS > 0 else None
 
 async def get_auth_service(user_repo: ideps.UserRepoDependency, session_repo: ideps.SessionRepoDependency):
     #use a matching service here
     strategy = ideps.AuthStrategyType(session_repo, user_repo, ideps.PasswordHasherType())
     return services.StatefulOAuthService(strategy)
 
-async def get_user_service(user_repo: ideps.UserRepoDependency):
-    return services.UserService(user_repo, ideps.PasswordHasherType())
+async def get_user_service(user_repo: ideps.UserRepoDependency, session_repo: ideps.SessionRepoDependency, uow: ideps.UoWDependency):
+    return services.UserService(user_repo, ideps.PasswordHasherType(), session_repo, uow)
 
 async def get_metric_active_users_service(metric_active_users_repo: ideps.MetricActiveUsersRepoDependency):
-    return services.MetricActiveUsersService(metric_active_users_repo)
+    return services.MetricActiveUsersService(metric_active_users_repo, ActivityDebouncer)
 
 UserServiceDependency = t.Annotated[services.UserService, Depends(get_user_service)]
 OAuthServiceDependency = t.Annotated[services.StatefulOAuthService, Depends(get_auth_service)]
@@ -22,6 +22,11 @@ class ILoginLogoutMixin(ABC):
         """Retract granted access"""
         ...
 
+    @abstractmethod
+    async def logout_everywhere(self, credentials: t.Any) -> int:
+        """Retract every access granted to the user, returns the number of retracted sessions"""
+        ...
+
 class IPasswordMixin(ABC):
     @property
     @abstractmethod
@@ -1,4 +1,5 @@
 import pydantic as p, uuid
+from enum import Enum
 
 class UserSession(p.BaseModel):
     id: str = p.Field(default_factory=lambda: str(uuid.uuid4()))
@@ -6,4 +7,10 @@ class UserSession(p.BaseModel):
     roles: list[str]
 
 class RotatingTokenSession(UserSession):
-    refresh_token: str
\ No newline at end of file
+    refresh_token_hash: str #sha256 (hex) of the current refresh token, see security.refresh_tokens
+
+
+class RotationResult(str, Enum):
+    ROTATED = 'rotated'
+    NOT_FOUND = 'not_found' #expired or logged out
+    REUSED = 'reused' #the presented token was rotated already: the session has been revoked
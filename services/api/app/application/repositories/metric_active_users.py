@@ -1,10 +1,13 @@
-import abc
+import abc, typing as t
 
 
 class IMetricActiveUsersStorage(abc.ABC):
     @abc.abstractmethod
     async def register_activity(self, user_id: int) -> None: ... 
 
+    @abc.abstractmethod
+    async def register_many(self, user_ids: t.Iterable[int]) -> None: ...
+
     @abc.abstractmethod
     async def get_active_count(self, timespan_sec: int) -> int: ...
 
@@ -14,4 +14,17 @@ class SessionRepository(ABC):
     async def get_session(self, session_id: str) -> m.UserSession | None: ...
 
     @abstractmethod
-    async def refresh(self, session_id: str, ttl: int) -> None: ...
\ No newline at end of file
+    async def refresh(self, session_id: str, ttl: int) -> None: ...
+
+    @abstractmethod
+    async def rotate(self, session_id: str, expected_hash: str, new_hash: str, ttl: int) -> m.RotationResult:
+        """Atomically replaces the refresh token hash if the stored one is expected_hash.
+        A mismatch means the presented token is reused: the session is revoked (RotationResult.REUSED)
+        """
+
+    @abstractmethod
+    async def list_user_sessions(self, user_id: int) -> list[str]: ...
+
+    @abstractmethod
+    async def delete_user_sessions(self, user_id: int) -> int:
+        """Revokes every session of the user, returns how many were deleted"""
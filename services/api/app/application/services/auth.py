@@ -10,7 +10,7 @@ class AuthService:
 
     async def authenticate(self, credentials: dict) -> schemas.UserDTO:
         user = await self.auth_strategy.authenticate(credentials)
-        return schemas.UserDTO.model_validate(user, from_attributes=True)
+        return schemas.UserDTO.from_user(user)
 
 
 class LoginLogoutMixin(t.Generic[TLoginReturn]):
@@ -20,6 +20,9 @@ class LoginLogoutMixin(t.Generic[TLoginReturn]):
     async def logout(self, session_id: str) -> None: 
         await self.auth_strategy.logout(session_id)
 
+    async def logout_everywhere(self, credentials: dict) -> int:
+        return await self.auth_strategy.logout_everywhere(credentials)
+
 class PasswordServiceMixin:
     async def verify_password(self, password:str, password_hash: str) -> bool:
         return await self.auth_strategy.verify_password(password, password_hash)
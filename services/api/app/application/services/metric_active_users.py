@@ -1,15 +1,81 @@
 import app.application.repositories as irepo
 import app.application.interfaces as iapp
-import logging, datetime as dt
+import logging, datetime as dt, time, typing as t
 logger = logging.getLogger('app')
 
 
+class ActivityDebouncer:
+    """Per-process buffer of active users: each user is taken at most once per *window_sec*,
+    the collected IDs are written in one batch by drain() (see MetricActiveUsersService.flush).
+    Storage writes become proportional to unique users instead of requests.
+    At most *max_pending* IDs are queued: a failed batch is put back by requeue() and kept
+    until the storage is back, and users beyond the bound are dropped meanwhile.
+    """
+    def __init__(self, window_sec: float, max_pending: int = 100_000):
+        self.window_sec = window_sec
+        self.max_pending = max_pending
+        self._last_seen: dict[t.Any, float] = {}
+        self._pending: set = set()
+
+    def mark(self, user_id, now: float | None = None) -> bool:
+        """Returns True if the user was queued, False if it was seen within the window or the queue is full"""
+        now = time.monotonic() if now is None else now
+        last = self._last_seen.get(user_id)
+        if last is not None and now - last < self.window_sec:
+            return False
+        if len(self._pending) >= self.max_pending:
+            return False
+        self._last_seen[user_id] = now
+        self._pending.add(user_id)
+        return True
+
+    def drain(self, now: float | None = None) -> list:
+        """Takes the queued IDs and forgets users whose window has passed"""
+        now = time.monotonic() if now is None else now
+        pending, self._pending = self._pending, set()
+        self._last_seen = {uid: ts for uid, ts in self._last_seen.items() if now - ts < self.window_sec}
+        return list(pending)
+
+    def requeue(self, user_ids: list) -> int:
+        """Puts back a batch that failed to be written. Returns how many IDs were dropped to stay within max_pending"""
+        dropped = 0
+        for user_id in user_ids:
+            if user_id in self._pending:
+                continue
+            if len(self._pending) >= self.max_pending:
+                dropped += 1
+                continue
+            self._pending.add(user_id)
+        return dropped
+
+
 class MetricActiveUsersService:
-    def __init__(self, repo: irepo.IMetricActiveUsersStorage):
+    def __init__(self, repo: irepo.IMetricActiveUsersStorage, debouncer: ActivityDebouncer | None = None):
         self.repo = repo
+        self.debouncer = debouncer
 
     async def register_activity(self, user_id):
+        """With a debouncer only queues the user (no I/O), flush() writes the batch"""
+        if self.debouncer is not None:
+            self.debouncer.mark(user_id)
+            return
         await self.repo.register_activity(user_id)
+
+    async def flush(self) -> int:
+        """Writes users queued by the debouncer in one batch. Returns the batch size.
+        If the write fails, the batch is queued again and the error is re-raised"""
+        if self.debouncer is None:
+            return 0
+        user_ids = self.debouncer.drain()
+        if user_ids:
+            try:
+                await self.repo.register_many(user_ids)
+            except Exception:
+                dropped = self.debouncer.requeue(user_ids) #retried on the next flush
+                if dropped:
+                    logger.warning(f'[METRICS: ACTIVE USERS] Activity queue is full, dropped {dropped} users of a failed batch')
+                raise
+        return len(user_ids)
     
     async def count_activity(self, timespan: dt.timedelta | int, cleanup: bool = False):
         """
@@ -1,8 +1,10 @@
 import app.domain.repositories as repos
+import app.application.repositories as apprepos
 import app.presentation.schemas as schemas
 import app.domain.models as domain
 import app.domain.services as services
 import app.domain.exceptions as domexc
+import app.infrastructure.interfaces as iabc
 
 import typing as t
 import logging
@@ -11,9 +13,19 @@ logger = logging.getLogger('app')
 
 class UserService:
 
-    def __init__(self, user_repo: repos.IUserRepository, password_hasher: services.IPasswordHasherAsync) -> None:
+    def __init__(
+        self,
+        user_repo: repos.IUserRepository,
+        password_hasher: services.IPasswordHasherAsync,
+        session_repo: apprepos.SessionRepository | None = None,
+        uow: iabc.IUnitOfWork | None = None,
+    ) -> None:
+        if (session_repo is None) != (uow is None):
+            raise ValueError('session_repo and uow must be given together: deactivation revokes sessions after the commit')
         self.user_repo = user_repo
         self.hasher = password_hasher
+        self.session_repo = session_repo
+        self.uow = uow #sessions are revoked only once the change is committed
 
  
     async def create(self, user_data: schemas.PublicUserCreationModel) -> schemas.UserDTO:
@@ -25,7 +37,7 @@ class UserService:
             hasher=self.hasher
         )
         saved_user = await self.user_repo.create(user)
-        return schemas.UserDTO.model_validate(saved_user, from_attributes=True)    
+        return schemas.UserDTO.from_user(saved_user)    
 
     async def admin_create(self, current_user: schemas.UserDTO, user_data: schemas.PrivateUserCreationModel) -> schemas.UserDTO:
         'Used by ADMINS to create accounts with any role'
@@ -39,7 +51,7 @@ class UserService:
             hasher=self.hasher
         )
         saved_user = await self.user_repo.create(user)
-        return schemas.UserDTO.model_validate(saved_user, from_attributes=True)
+        return schemas.UserDTO.from_user(saved_user)
         
     async def update(self, current_user: schemas.UserDTO, edited_user: schemas.PublicUserUpdateModel):
         'Used by users to edit their profile'
@@ -54,7 +66,7 @@ class UserService:
             await current_user.change_password(old = edited_user.old_password, new = edited_user.new_password, hasher = self.hasher)
 
         current_user = await self.user_repo.update(current_user)
-        return schemas.UserDTO.model_validate(current_user, from_attributes=True)
+        return schemas.UserDTO.from_user(current_user)
     
     async def admin_update(self, current_user: schemas.UserDTO, target_user_id: int, edited_user: schemas.PrivateUserUpdateModel):
         if not current_user.is_admin:
@@ -84,16 +96,19 @@ class UserService:
 
 
         edited = await self.user_repo.update(target_user)
-        return schemas.UserDTO.model_validate(edited, from_attributes=True)
+        if edited_user.status == domain.Status.DEACTIVATED and self.session_repo is not None:
+            #deactivated users are logged out everywhere, after the commit: a failed update keeps them logged in
+            self.uow.add_post_commit_hook(lambda: self.session_repo.delete_user_sessions(target_user_id))
+        return schemas.UserDTO.from_user(edited)
     
 
     async def list(self, limit: int = 100, offset: int = 0, filters: schemas.UserFilterSchema = None, filter_mode: t.Literal["and","or"] = "and") -> list[schemas.UserDTO]:        
         users = await self.user_repo.list(limit, offset, filters, filter_mode)
-        return [schemas.UserDTO.model_validate(user, from_attributes=True) for user in users]
+        return [schemas.UserDTO.from_user(user) for user in users]
 
     async def get_user(self, user_id: int) -> schemas.UserDTO:    
         user = await self.user_repo.get_by_id(user_id)
-        return schemas.UserDTO.model_validate(user, from_attributes=True) if user else None
+        return schemas.UserDTO.from_user(user) if user else None
     
     async def delete(self, current_user: schemas.UserDTO) -> None:
         user = await self.user_repo.get_by_id(current_user.id)
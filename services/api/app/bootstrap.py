@@ -0,0 +1,130 @@
+"""One-time deployment bootstrap: wait for Redis/DB, create tables, load Lua scripts, ensure the default admin.
+
+It runs once per deployment instead of once per worker:
+- under gunicorn: started by the master (on_starting) as `python -m app.bootstrap`, before workers are forked.
+  Workers inherit BOOTSTRAP_DONE_ENV and skip it. Can also be run by hand or as a deploy step the same way
+- without a master (uvicorn, several containers): the first worker that takes a Redis lock runs it, the others
+  wait for the done-marker of the current commit
+Every phase is timed: logged as `[BOOT: <stage>]` lines and recorded in the app_boot_phase_seconds histogram.
+Lua scripts are only preloaded here: rqueue and the session repository reload them on NOSCRIPT,
+so a Redis restart after the done-marker was written does not break workers.
+"""
+from opentelemetry import metrics
+from app.common.config import Config
+import asyncio, contextlib, logging, os, subprocess, sys, time, uuid
+
+logger = logging.getLogger('app')
+meter = metrics.get_meter("app.metrics")
+
+boot_phase_seconds = meter.create_histogram(
+    "app_boot_phase_seconds",
+    description="Duration of startup phases (stage: bootstrap | worker)",
+)
+
+BOOTSTRAP_DONE_ENV = 'APP_BOOTSTRAP_DONE'
+BOOTSTRAP_LOCK_KEY = 'bootstrap:lock'
+BOOTSTRAP_DONE_KEY = f'bootstrap:done:{Config.GIT_COMMIT}'
+
+
+class BootTimer:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.phases: dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = elapsed
+            boot_phase_seconds.record(elapsed, {"stage": self.stage, "phase": name})
+            logger.info(f'[BOOT: {self.stage}] {name} took {elapsed * 1000:.0f}ms')
+
+    def finish(self) -> dict[str, float]:
+        total = time.perf_counter() - self.started
+        boot_phase_seconds.record(total, {"stage": self.stage, "phase": "total"})
+        summary = ', '.join(f'{name}={seconds * 1000:.0f}ms' for name, seconds in self.phases.items())
+        logger.info(f'[BOOT: {self.stage}] finished in {total * 1000:.0f}ms ({summary})')
+        return self.phases
+
+
+async def run_bootstrap(cache_mgr, db_mgr, wait_for_redis: bool = True) -> dict[str, float]:
+    import app.infrastructure.dependencies as idep
+    import app.common.libs.rqueue.queue as rqueue
+
+    timer = BootTimer('bootstrap')
+    if wait_for_redis:
+        with timer.phase('redis_wait'):
+            await cache_mgr.wait_for_startup()
+            await cache_mgr.initialize_data_structures()
+    with timer.phase('lua_scripts'):
+        async with cache_mgr.connect() as cache:
+            await rqueue.load_scripts_to_redis(cache)
+            await idep.repos.load_session_scripts(cache)
+    with timer.phase('db_wait'):
+        await db_mgr.wait_for_startup(attempts=Config.DB_WAIT_MAX_RETRIES, interval_sec=Config.DB_WAIT_INTERVAL_SECONDS)
+    with timer.phase('create_tables'):
+        await db_mgr.initialize_data_structures()
+    with timer.phase('ensure_admin'):
+        async with db_mgr.session() as session:
+            async with cache_mgr.connect() as cache:
+                db = idep.UserDB(session)
+                uow = idep.UnitOfWork(session)
+                repo = idep.UserRepository(connection=cache, user_db_repo=db, uow=uow)
+                await repo.ensure_admin_exists(idep.PasswordHasherType())
+                await session.commit()
+    return timer.finish()
+
+
+def bootstrap_in_master() -> None:
+    """gunicorn on_starting: runs the bootstrap in a child interpreter and waits for it.
+    The master must not import the app (see app.common.libs.prom_multiproc): app.infrastructure.dependencies
+    creates the DB engine, connection pools and instrumentors at import, and every forked worker would inherit them.
+    """
+    result = subprocess.run([sys.executable, '-m', 'app.bootstrap'])
+    if result.returncode != 0:
+        raise RuntimeError(f'Bootstrap failed (exit code {result.returncode}), not starting workers')
+    os.environ[BOOTSTRAP_DONE_ENV] = '1'
+
+
+async def _run_standalone() -> None:
+    import app.infrastructure.dependencies as idep
+    try:
+        await run_bootstrap(idep.CacheManager, idep.DatabaseManager)
+    finally:
+        await idep.CacheManager.close()
+        await idep.DatabaseManager.close()
+
+
+async def ensure_bootstrapped(cache_mgr, db_mgr) -> None:
+    """Worker lifespan: no-op under a bootstrapped master, otherwise one worker (Redis lock) bootstraps and the rest wait"""
+    if os.environ.get(BOOTSTRAP_DONE_ENV) == '1':
+        return
+    await cache_mgr.wait_for_startup()
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + Config.BOOTSTRAP_WAIT_TIMEOUT_SECONDS
+    async with cache_mgr.connect() as cache:
+        while True:
+            if await cache.exists(BOOTSTRAP_DONE_KEY):
+                logger.info('[BOOT] Bootstrap already done for this deployment')
+                return
+            if await cache.set(BOOTSTRAP_LOCK_KEY, token, nx=True, ex=Config.BOOTSTRAP_WAIT_TIMEOUT_SECONDS):
+                try:
+                    await run_bootstrap(cache_mgr, db_mgr, wait_for_redis=False)
+                    await cache.set(BOOTSTRAP_DONE_KEY, '1', ex=Config.BOOTSTRAP_DONE_TTL_SECONDS)
+                finally:
+                    if await cache.get(BOOTSTRAP_LOCK_KEY) == token:
+                        await cache.delete(BOOTSTRAP_LOCK_KEY)
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Bootstrap was not finished by another worker within {Config.BOOTSTRAP_WAIT_TIMEOUT_SECONDS}s')
+            await asyncio.sleep(0.5)
+
+
+if __name__ == '__main__':
+    import app.infrastructure.telemetry.logs as logs
+    logs.configure_logger('app')
+    asyncio.run(_run_standalone())
@@ -1,4 +1,6 @@
 from datetime import datetime,date
+import pydantic as p
+import typing as t
 import logging
 import re
 
@@ -17,3 +19,21 @@ def json_serializer(obj):
         return obj.isoformat()
     raise TypeError(f"{type(obj)} is not serializable!")
 
+
+TModel = t.TypeVar('TModel', bound=p.BaseModel)
+_new = object.__new__
+_setattr = object.__setattr__ #BaseModel.__setattr__ would validate
+
+def construct_trusted(cls: type[TModel], data: dict[str, t.Any]) -> TModel:
+    """Creates a model from data that is valid already (our own DB rows and cache records), skipping validation.
+
+    `data` must contain every field, already of the field's type: nothing is coerced, no defaults are applied.
+    Cheaper than model_construct, which resolves defaults, aliases and extras in Python on every call.
+    Assignments on the result are still validated (validate_assignment).
+    """
+    obj = _new(cls)
+    _setattr(obj, '__dict__', data)
+    _setattr(obj, '__pydantic_fields_set__', set(data))
+    _setattr(obj, '__pydantic_extra__', None)
+    _setattr(obj, '__pydantic_private__', None)
+    return obj
@@ -16,6 +16,34 @@ class Config():
     GIT_COMMIT = os.getenv("GIT_COMMIT", "[commit hash unknown]")
     MODE = os.getenv("MODE", "Local build")
     JSON_LOGS = 1
+    LOG_JSON_FORMATTER = os.getenv("LOG_JSON_FORMATTER", "fast") #fast | legacy (pythonjsonlogger)
+    LOG_COMPACT = os.getenv("LOG_COMPACT", "0") == "1" #only level/logger/message (+ trace ids, extras)
+    #Logs are enqueued on the event loop thread and written by a listener thread
+    LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "1") == "1"
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop") #drop | block - what to do when the queue is full
+    #Access log policy (TelemetryMiddleware): 5xx/exceptions and slow requests are always logged
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    ACCESS_LOG_ROUTE_SAMPLE_RATES = {
+        #'/users/me': 0.1, #route template -> share of requests logged
+    }
+    ACCESS_LOG_EXCLUDE_PATHS = ('/health', '/ready', '/metrics')
+    ACCESS_LOG_SLOW_REQUEST_MS = float(os.getenv("ACCESS_LOG_SLOW_REQUEST_MS", "500"))
+
+    #Startup: one-time bootstrap per deployment (app/bootstrap.py)
+    BOOTSTRAP_IN_MASTER = os.getenv("BOOTSTRAP_IN_MASTER", "1") == "1" #gunicorn master bootstraps before forking workers
+    BOOTSTRAP_WAIT_TIMEOUT_SECONDS = 120 #without a master: how long workers wait for the one holding the lock
+    BOOTSTRAP_DONE_TTL_SECONDS = 600
+    #Per worker, before /ready reports ready: pooled connections opened ahead of traffic (keep DB within pool_size, default 5)
+    WARMUP_REDIS_CONNECTIONS = int(os.getenv("WARMUP_REDIS_CONNECTIONS", "4"))
+    WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "4"))
+
+    #Shutdown (app/common/libs/drain.py): readiness fails first, then in-flight requests are awaited, then pools/exporters close.
+    #Everything must fit into gunicorn's graceful_timeout, after which the master kills the worker
+    GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+    DRAIN_READINESS_GRACE_SECONDS = float(os.getenv("DRAIN_READINESS_GRACE_SECONDS", "5")) #keep >= readiness probe interval
+    SHUTDOWN_CLEANUP_SECONDS = 5 #reserved for flushing telemetry and closing pools
+    DRAIN_TIMEOUT_SECONDS = max(1.0, GRACEFUL_TIMEOUT_SECONDS - DRAIN_READINESS_GRACE_SECONDS - SHUTDOWN_CLEANUP_SECONDS)
 
     #Security settings
     DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
@@ -32,6 +60,11 @@ class Config():
     REDIS_PASS = os.getenv("REDIS_PASS")
     REDIS_URL = f'redis://:{REDIS_PASS}@redis:6379/{REDIS_DB}'
     USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+    CACHE_CODEC = os.getenv("CACHE_CODEC", "json") #users in Redis: json (fastest decode) | msgpack (~40% smaller) | struct (stdlib). Readers accept all
+    ACTIVE_USERS_DEBOUNCE_SECONDS = float(os.getenv("ACTIVE_USERS_DEBOUNCE_SECONDS", "30")) #a user is written at most once per window per worker, 0 = write every request
+    ACTIVE_USERS_FLUSH_INTERVAL_SECONDS = 5
+    ACTIVE_USERS_MAX_PENDING = int(os.getenv("ACTIVE_USERS_MAX_PENDING", "100000")) #per worker; bounds the batch kept for retry while Redis is down
+    ACTIVE_USERS_STORAGE = os.getenv("ACTIVE_USERS_STORAGE", "zset") #zset (exact, grows with users) | hll (HyperLogLog buckets, constant memory)
 
     #MySQL Template
     DB_USER = os.getenv("MYSQL_USER")
@@ -56,9 +89,51 @@ class Config():
         'echo': False,
     }
 
+    #Outbound HTTP: named clients over shared keep-alive pools (app/infrastructure/http)
+    OUTBOUND_HTTP_POOLS = {
+        'default': dict(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0, http2=False),
+    }
+    OUTBOUND_HTTP_CLIENTS = {
+        #'example': dict(base_url='https://api.example.com', pool='default', timeout=10.0, retries=2, max_connections_per_host=10,
+        #                rate_limit=dict(seconds_between_requests=0.2, burst_capacity=5, seconds_between_burst_requests=0.05)),
+    }
+
+    #Redis queue (rqueue)
+    RQUEUE_METRICS_SAMPLE_INTERVAL_SECONDS = 15
+    #Weighted fair queuing: slots under contention go to priority classes in proportion to these shares
+    RQUEUE_CLASS_SHARES = {
+        'interactive': float(os.getenv("RQUEUE_SHARE_INTERACTIVE", "8")),
+        'default': float(os.getenv("RQUEUE_SHARE_DEFAULT", "4")),
+        'batch': float(os.getenv("RQUEUE_SHARE_BATCH", "1")),
+    }
+    LEADER_LEASE_SECONDS = 15 #cluster-wide periodic jobs: failover within this time if the leader dies
+    #Cluster-wide in-flight caps for expensive routes (ConcurrencyLimitMiddleware); local = per worker process
+    LOGIN_CONCURRENCY_LIMIT = int(os.getenv("LOGIN_CONCURRENCY_LIMIT", "32"))
+    LOGIN_CONCURRENCY_LOCAL_LIMIT = int(os.getenv("LOGIN_CONCURRENCY_LOCAL_LIMIT", "8"))
+    USERS_LIST_CONCURRENCY_LIMIT = int(os.getenv("USERS_LIST_CONCURRENCY_LIMIT", "64"))
+    USERS_LIST_CONCURRENCY_LOCAL_LIMIT = int(os.getenv("USERS_LIST_CONCURRENCY_LOCAL_LIMIT", "16"))
+
     #OpenTelemetry
     OTEL_GRPC_HOST = os.getenv("OTEL_GRPC_HOST")
     OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME")
+    #Metrics: prometheus = pulled from METRICS_PORT (gunicorn master aggregates workers), otlp = pushed per worker
+    METRICS_EXPORT = os.getenv("METRICS_EXPORT", "prometheus")
+    METRICS_PORT = 8001
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "/tmp/app_metrics")
+    METRICS_DUMP_INTERVAL_SECONDS = 5
+    METRICS_SUM_GAUGES = ('http_requests_in_flight',) #per-worker gauges summed across workers (others take the max)
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1" #off: @traced resolves to the raw function, no span export
+    #Head sampling: share of new traces recorded (child spans follow the parent's decision)
+    TRACES_SAMPLER_RATIO = float(os.getenv("TRACES_SAMPLER_RATIO", "1.0"))
+    #Tail sampling: export local traces with errors, slow ones and TRACES_TAIL_KEEP_RATIO of the rest
+    TRACES_TAIL_SAMPLING_ENABLED = os.getenv("TRACES_TAIL_SAMPLING_ENABLED", "0") == "1"
+    TRACES_TAIL_KEEP_RATIO = float(os.getenv("TRACES_TAIL_KEEP_RATIO", "0.1"))
+    TRACES_TAIL_SLOW_MS = float(os.getenv("TRACES_TAIL_SLOW_MS", "500"))
+    TRACES_TAIL_MAX_TRACES = int(os.getenv("TRACES_TAIL_MAX_TRACES", "2048"))
+    #BatchSpanProcessor
+    TRACES_BSP_MAX_QUEUE_SIZE = int(os.getenv("TRACES_BSP_MAX_QUEUE_SIZE", "2048"))
+    TRACES_BSP_MAX_EXPORT_BATCH_SIZE = int(os.getenv("TRACES_BSP_MAX_EXPORT_BATCH_SIZE", "512"))
+    TRACES_BSP_SCHEDULE_DELAY_MILLIS = int(os.getenv("TRACES_BSP_SCHEDULE_DELAY_MILLIS", "5000"))
     
 
 
@@ -0,0 +1,103 @@
+"""Graceful drain of an ASGI worker on SIGTERM/SIGINT.
+
+Sequence after the first signal:
+1. `draining` flips => the readiness probe fails, load balancers stop routing new requests here
+2. readiness_grace seconds pass, so probes notice it while the worker still serves
+3. in-flight requests are awaited (asyncio.Condition, no polling), bounded by timeout
+4. the signal is handed to the previous handler (uvicorn's), which stops the server and runs
+   the lifespan shutdown, where pools, exporters and background tasks are flushed and closed
+A second signal skips the wait and goes to the previous handler at once.
+
+Keep readiness_grace + timeout + the lifespan shutdown within gunicorn's graceful_timeout,
+after which the master kills the worker.
+Handlers must be installed from the running loop (lifespan startup): uvicorn installs its own
+handlers when the server starts, so ones set at import time are either replaced or replace uvicorn's.
+"""
+import asyncio, signal, logging, time, typing as t
+
+logger = logging.getLogger('app')
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class DrainCoordinator:
+    def __init__(self, timeout: float = 20.0, readiness_grace: float = 0.0):
+        self.timeout = timeout
+        self.readiness_grace = readiness_grace
+        self.draining = False
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        self._previous_handlers: dict[int, t.Any] = {}
+        self._drain_task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def request_started(self) -> None:
+        self._in_flight += 1
+
+    async def request_finished(self) -> None:
+        self._in_flight -= 1
+        if self.draining: #the condition is only awaited while draining, no lock on the normal path
+            async with self._condition:
+                self._condition.notify_all()
+
+    async def wait_idle(self, timeout: float | None = None) -> bool:
+        """Waits until no request is in flight. Returns False if the timeout ran out first"""
+        try:
+            async with self._condition:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self._in_flight == 0), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def drain(self) -> bool:
+        self.draining = True
+        started = time.perf_counter()
+        logger.info(f'[DRAIN] Not ready anymore, {self._in_flight} requests in flight')
+        if self.readiness_grace > 0:
+            await asyncio.sleep(self.readiness_grace)
+        idle = await self.wait_idle(self.timeout)
+        elapsed = time.perf_counter() - started
+        if idle:
+            logger.info(f'[DRAIN] Drained in {elapsed:.2f}s')
+        else:
+            logger.warning(f'[DRAIN] {self._in_flight} requests still in flight after {elapsed:.2f}s, shutting down anyway')
+        return idle
+
+    def install_signal_handlers(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for sig in HANDLED_SIGNALS:
+            self._previous_handlers[sig] = signal.signal(sig, self._handle_signal)
+
+    def restore_signal_handlers(self) -> None:
+        for sig, handler in self._previous_handlers.items():
+            signal.signal(sig, handler)
+        self._previous_handlers.clear()
+
+    def _handle_signal(self, sig: int, frame) -> None:
+        if self._drain_task is None:
+            self._loop.call_soon_threadsafe(self._start_drain, sig, frame)
+        else:
+            logger.warning(f'[DRAIN] Signal {signal.Signals(sig).name} received again, not waiting for requests')
+            self._hand_over(sig, frame)
+
+    def _start_drain(self, sig: int, frame) -> None:
+        if self._drain_task is None:
+            self._drain_task = self._loop.create_task(self._drain_and_hand_over(sig, frame))
+
+    async def _drain_and_hand_over(self, sig: int, frame) -> None:
+        try:
+            await self.drain()
+        finally:
+            self._hand_over(sig, frame)
+
+    def _hand_over(self, sig: int, frame) -> None:
+        previous = self._previous_handlers.get(sig, signal.SIG_DFL)
+        if callable(previous):
+            previous(sig, frame)
+        elif previous == signal.SIG_DFL: #nothing to chain to: default action (terminate)
+            signal.signal(sig, signal.SIG_DFL)
+            signal.raise_signal(sig)
@@ -0,0 +1,180 @@
+"""Prometheus exposition for a pre-fork server (gunicorn): one scrape target for all workers.
+
+Workers dump their registry (OTEL PrometheusMetricReader + process collectors) in the OpenMetrics
+format to `<directory>/<pid>.prom` every few seconds from a daemon thread. The master serves one
+/metrics endpoint that parses and merges those files:
+- counters, histograms and summaries are summed across workers
+- gauges take the max (cluster-wide values every worker reports the same way), except `sum_gauges`
+  (per-worker quantities such as in-flight requests), which are summed
+- exemplars (trace ids on histogram buckets): the newest one across workers is kept
+The endpoint answers in OpenMetrics, with exemplars, to scrapers that ask for it (Prometheus does
+when exemplar storage is enabled) and in the text format, without exemplars, to the others.
+Series carry no pid label, so the number of series does not grow with the number of workers.
+When a worker exits, its counters/histograms are folded into `archive.prom`, so totals do not drop.
+
+Without a master (plain uvicorn) start_worker_exporter serves the process registry directly.
+Only prometheus_client and the stdlib are imported here: the gunicorn master loads this module
+before forking and must not pull in the app (grpc, SQLAlchemy engines, Celery).
+"""
+from prometheus_client import CollectorRegistry, REGISTRY, start_http_server
+from prometheus_client.metrics_core import Metric
+from prometheus_client.openmetrics.exposition import generate_latest
+from prometheus_client.openmetrics.parser import text_string_to_metric_families
+import os, glob, threading, logging, typing as t
+
+logger = logging.getLogger('app')
+
+#Set by the gunicorn master, inherited by forked workers: where workers dump their metrics
+DIRECTORY_ENV = 'METRICS_MULTIPROC_DIR'
+ARCHIVE_FILE = 'archive.prom'
+_ACCUMULATED_TYPES = frozenset({'counter', 'histogram', 'summary'})
+
+
+def _exemplar_time(exemplar) -> float:
+    return float(exemplar.timestamp) if exemplar.timestamp is not None else 0.0
+
+
+def aggregate(texts: t.Iterable[str], sum_gauges: t.Container[str] = (), types: t.Container[str] | None = None) -> list[Metric]:
+    """Merges OpenMetrics dumps into metric families (see module docstring for the rules)"""
+    families: dict[str, Metric] = {}
+    values: dict[str, dict[tuple, float]] = {}
+    exemplars: dict[tuple, t.Any] = {}
+    for text in texts:
+        if not text: #no archive yet, or a worker exited between glob and open
+            continue
+        for family in text_string_to_metric_families(text):
+            if types is not None and family.type not in types:
+                continue
+            merged = families.get(family.name)
+            if merged is None:
+                merged = families[family.name] = Metric(family.name, family.documentation, family.type, family.unit)
+                values[family.name] = {}
+            acc = values[family.name]
+            summed = family.type != 'gauge' or family.name in sum_gauges
+            for sample in family.samples:
+                if sample.name.endswith('_created'): #per-process timestamps, meaningless once merged
+                    continue
+                key = (sample.name, tuple(sorted(sample.labels.items())))
+                if key not in acc:
+                    acc[key] = sample.value
+                elif summed:
+                    acc[key] += sample.value
+                else:
+                    acc[key] = max(acc[key], sample.value)
+                if sample.exemplar is not None:
+                    current = exemplars.get((family.name, key))
+                    if current is None or _exemplar_time(sample.exemplar) >= _exemplar_time(current):
+                        exemplars[(family.name, key)] = sample.exemplar
+
+    for name, metric in families.items():
+        for key, value in values[name].items():
+            sample_name, labels = key
+            metric.add_sample(sample_name, dict(labels), value, exemplar=exemplars.get((name, key)))
+    return list(families.values())
+
+
+def render(families: list[Metric]) -> bytes:
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(_StaticCollector(families))
+    return generate_latest(registry)
+
+
+class _StaticCollector:
+    def __init__(self, families: list[Metric]):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError: #worker exited between glob and open
+        return ''
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class MultiprocessCollector:
+    """Collector for the master's registry: merges all worker dumps on every scrape"""
+
+    def __init__(self, directory: str, sum_gauges: t.Container[str] = ()):
+        self.directory = directory
+        self.sum_gauges = sum_gauges
+
+    def collect(self):
+        texts = (_read(path) for path in glob.glob(os.path.join(self.directory, '*.prom')))
+        return aggregate(texts, self.sum_gauges)
+
+
+def prepare_directory(directory: str) -> None:
+    """Called by the master on start: previous runs' dumps must not leak into the new counters"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.prom*')):
+        os.remove(path)
+    os.environ[DIRECTORY_ENV] = directory
+
+
+def start_master_server(port: int, directory: str, sum_gauges: t.Container[str] = ()):
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(MultiprocessCollector(directory, sum_gauges))
+    server, thread = start_http_server(port, registry=registry)
+    logger.info(f'[METRICS] Serving aggregated worker metrics on :{port}')
+    return server, thread
+
+
+def archive_worker(directory: str, pid: int) -> None:
+    """Folds an exited worker's counters/histograms into the archive and removes its dump"""
+    path = os.path.join(directory, f'{pid}.prom')
+    worker_text = _read(path)
+    if worker_text:
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        families = aggregate([_read(archive_path), worker_text], types=_ACCUMULATED_TYPES)
+        _write_atomic(archive_path, render(families))
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class WorkerDumper(threading.Thread):
+    """Daemon thread writing this process' registry to <directory>/<pid>.prom"""
+
+    def __init__(self, directory: str, interval: float, registry: CollectorRegistry = REGISTRY):
+        super().__init__(name='metrics-dumper', daemon=True)
+        self.path = os.path.join(directory, f'{os.getpid()}.prom')
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+
+    def dump(self) -> None:
+        _write_atomic(self.path, generate_latest(self.registry))
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.dump()
+            except Exception:
+                logger.exception('[METRICS] Failed to dump worker metrics')
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.dump()
+
+
+def start_worker_exporter(port: int, interval: float) -> WorkerDumper | None:
+    """Under the gunicorn master: dump to the shared directory. Standalone: serve this process' registry"""
+    directory = os.environ.get(DIRECTORY_ENV)
+    if directory is None:
+        start_http_server(port)
+        logger.info(f'[METRICS] Serving process metrics on :{port}')
+        return None
+    dumper = WorkerDumper(directory, interval)
+    dumper.dump()
+    dumper.start()
+    return dumper
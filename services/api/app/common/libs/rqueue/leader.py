@@ -0,0 +1,70 @@
+from opentelemetry import metrics
+import app.common.libs.rqueue.queue as rqueue
+import asyncio, logging, os, socket, time, uuid, typing as t
+
+logger = logging.getLogger('app')
+meter = metrics.get_meter("app.metrics")
+
+leader_changes_total = meter.create_counter(
+    "rqueue_leader_changes_total",
+    description="Leader lease acquired/lost by this process (event: acquired | lost)",
+)
+
+
+class LeaderElection:
+    """Redis lease based leader election: at most one process in the cluster holds `leader:{name}`.
+    - the lease is a token key with a TTL (SET NX PX); the holder renews it every lease/3 (lease_renew.lua)
+    - if the leader dies, the key expires and another process takes over within lease_seconds
+    - release() deletes the key only if we still own it (lock_release.lua), so failover is immediate on shutdown
+    Jobs run by the leader should take less than the lease, or a second leader may appear meanwhile.
+    """
+
+    def __init__(self, queue_mgr: rqueue.RedisQueueManager, name: str, lease_seconds: float = 15):
+        self.queue_mgr = queue_mgr
+        self.name = name
+        self.key = f'leader:{name}'
+        self.token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}'
+        self.lease_ms = int(lease_seconds * 1000)
+        self.renew_interval = lease_seconds / 3
+        self.is_leader = False
+
+    async def acquire_or_renew(self) -> bool:
+        was_leader = self.is_leader
+        if self.is_leader:
+            self.is_leader = bool(await self.queue_mgr.run_script('lease_renew.lua', [self.key], [self.token, self.lease_ms]))
+        if not self.is_leader:
+            self.is_leader = bool(await self.queue_mgr.redis.set(self.key, self.token, nx=True, px=self.lease_ms))
+        if self.is_leader != was_leader:
+            event = 'acquired' if self.is_leader else 'lost'
+            leader_changes_total.add(1, {"name": self.name, "event": event})
+            logger.info(f'[LEADER: {self.name}] Lease {event} by {self.token}')
+        return self.is_leader
+
+    async def release(self) -> None:
+        if self.is_leader:
+            self.is_leader = False
+            await self.queue_mgr.run_script('lock_release.lua', [self.key], [self.token, f'{self.key}:released'])
+
+    async def run_periodic(self, job: t.Callable[[], t.Awaitable[t.Any]], interval: float) -> None:
+        """Background task: keeps the lease and, while leader, runs job every interval. Releases the lease when cancelled."""
+        last_run = None
+        try:
+            while True:
+                try:
+                    if await self.acquire_or_renew():
+                        now = time.monotonic()
+                        if last_run is None or now - last_run >= interval:
+                            last_run = now
+                            await job()
+                    else:
+                        last_run = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f'[LEADER: {self.name}] Periodic job failed: {e}')
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            try:
+                await asyncio.shield(self.release())
+            except Exception as e:
+                logger.warning(f'[LEADER: {self.name}] Failed to release the lease: {e}')
@@ -0,0 +1,170 @@
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Scope, Receive, Send
+import dataclasses as dc
+import collections
+import asyncio
+import time
+import logging
+import uuid
+import app.common.libs.rqueue.queue as rqueue
+
+logger = logging.getLogger('app.queue')
+CONCURRENCY_LIMIT_ATTR = '__concurrency_limit__'
+
+
+@dc.dataclass
+class ConcurrencyLimit:
+    """Route-level limit of in-flight requests.
+    - limit: int - cluster-wide cap (Redis semaphore)
+    - local_limit: int | None - per-process cap checked first; if it is full, Redis is not asked at all
+    - resource: str | None - semaphore name; routes sharing it share the cap. Defaults to the route path
+    - lease_seconds: float - a slot is considered leaked (crashed worker) after this time without renewal;
+      in-flight requests renew it every lease_seconds/3, so it does not bound the request duration
+    - retry_after: int - Retry-After of shed responses; grows by this much per `limit` callers already told to retry
+    """
+    limit: int
+    local_limit: int | None = None
+    resource: str | None = None
+    lease_seconds: float = 60
+    retry_after: int = 1
+    _local: asyncio.Semaphore | None = dc.field(default=None, repr=False)
+    _local_shed: collections.deque = dc.field(default_factory=collections.deque, repr=False) #retry deadlines of locally shed requests
+
+    @property
+    def local_cap(self) -> int:
+        return min(self.local_limit or self.limit, self.limit)
+
+    @property
+    def local(self) -> asyncio.Semaphore:
+        if self._local is None:
+            self._local = asyncio.Semaphore(self.local_cap)
+        return self._local
+
+    def local_shed_hint(self) -> tuple[int, int]:
+        """Same (position, retry_after) as semaphore_acquire.lua, counted over this process' shed requests"""
+        now = time.monotonic()
+        while self._local_shed and self._local_shed[0] <= now:
+            self._local_shed.popleft()
+        position = len(self._local_shed) + 1
+        retry = self.retry_after * (1 + (position - 1) // self.local_cap)
+        self._local_shed.append(now + retry) #deadlines only grow: retry is non-decreasing in position
+        return position, retry
+
+
+def concurrency_limit(limit: int, local_limit: int | None = None, resource: str | None = None, lease_seconds: float = 60, retry_after: int = 1):
+    """Marks an endpoint for ConcurrencyLimitMiddleware. Put it BELOW the router decorator:
+
+        @router.post('/login')
+        @concurrency_limit(32, local_limit=8)
+        async def login(...): ...
+    """
+    def decorator(func):
+        setattr(func, CONCURRENCY_LIMIT_ATTR, ConcurrencyLimit(limit, local_limit, resource, lease_seconds, retry_after))
+        return func
+    return decorator
+
+
+class ConcurrencyLimitMiddleware:
+    """Pure ASGI middleware capping in-flight requests of marked routes cluster-wide.
+    Uses app.state.rqueue (RedisQueueManager) for the Redis semaphore; without it (e.g. lifespan not run) only local caps apply.
+    Sheds load with 503 + Retry-After and position hints instead of queueing: the position is the number of
+    requests shed and not yet due to retry (including this one), and Retry-After spreads their retries out.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._routes: list[tuple[APIRoute, ConcurrencyLimit]] | None = None
+
+    def _resolve_routes(self, scope: Scope) -> list[tuple[APIRoute, ConcurrencyLimit]]:
+        if self._routes is None:
+            routes = []
+            for route in scope['app'].routes:
+                limit = getattr(getattr(route, 'endpoint', None), CONCURRENCY_LIMIT_ATTR, None)
+                if isinstance(route, APIRoute) and limit:
+                    limit.resource = limit.resource or route.path
+                    routes.append((route, limit))
+            self._routes = routes
+            logger.info(f'[QUEUE] Concurrency limits: {[(r.path, l.limit, l.local_limit) for r, l in routes]}')
+        return self._routes
+
+    def _match(self, scope: Scope) -> ConcurrencyLimit | None:
+        for route, limit in self._resolve_routes(scope):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return limit
+        return None
+
+    @staticmethod
+    async def _renew_lease(queue_mgr: rqueue.RedisQueueManager, key: str, token: str, limit: ConcurrencyLimit) -> None:
+        """Background task: keeps the slot of an in-flight request (same pattern as LeaderElection's lease)"""
+        while True:
+            await asyncio.sleep(limit.lease_seconds / 3)
+            try:
+                if not await queue_mgr.run_script('semaphore_renew.lua', keys=[key], args=[token, limit.lease_seconds]):
+                    logger.warning(f'[QUEUE] Lost slot of semaphore {key}: the limit may be exceeded until this request ends')
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'[QUEUE] Failed to renew slot of semaphore {key}: {e}')
+
+    @staticmethod
+    def _shed(limit: ConcurrencyLimit, in_flight: int, position: int, retry_after: int, scope_name: str) -> JSONResponse:
+        rqueue.queue_rejections_total.add(1, {"resource": limit.resource, "reason": f"shed_{scope_name}"})
+        return JSONResponse(
+            status_code=503,
+            content={
+                "detail": "Server is busy, retry later",
+                "limit": limit.limit,
+                "in_flight": in_flight,
+                "queue_position": position,
+            },
+            headers={
+                "Retry-After": str(retry_after),
+                "X-Concurrency-Limit": str(limit.limit),
+                "X-Queue-Position": str(position),
+            },
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        limit = self._match(scope)
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        #local semaphore first: a full worker would only send hopeless acquisitions to Redis
+        local = limit.local
+        if local.locked():
+            position, retry_after = limit.local_shed_hint()
+            return await self._shed(limit, limit.local_cap, position, retry_after, 'local')(scope, receive, send)
+
+        async with local:
+            queue_mgr: rqueue.RedisQueueManager | None = getattr(scope['app'].state, 'rqueue', None)
+            if queue_mgr is None:
+                return await self.app(scope, receive, send)
+
+            key = f'semaphore:{limit.resource}'
+            token = uuid.uuid4().hex
+            try:
+                acquired, in_flight, position, retry_after = await queue_mgr.run_script(
+                    'semaphore_acquire.lua', keys=[key, f'{key}:shed'], args=[token, limit.limit, limit.lease_seconds, limit.retry_after]
+                )
+            except Exception as e:
+                #fail open: Redis trouble must not take the endpoint down
+                logger.warning(f'[QUEUE] Semaphore {key} unavailable, letting request through: {e}')
+                return await self.app(scope, receive, send)
+
+            if not acquired:
+                return await self._shed(limit, int(in_flight), int(position), int(retry_after), 'cluster')(scope, receive, send)
+            renewer = asyncio.create_task(self._renew_lease(queue_mgr, key, token, limit))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                renewer.cancel()
+                try:
+                    await queue_mgr.redis.zrem(key, token)
+                except Exception as e:
+                    logger.warning(f'[QUEUE] Failed to release semaphore {key}, lease will expire in {limit.lease_seconds}s: {e}')
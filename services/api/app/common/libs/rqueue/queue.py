@@ -6,10 +6,12 @@ import logging
 import asyncio
 import uuid
 import time
-import httpx
 import os.path
 from redis.asyncio.client import Redis
+from redis.exceptions import NoScriptError
+from opentelemetry import metrics
 logger = logging.getLogger('app.queue')
+meter = metrics.get_meter("app.metrics")
 
 
 class RedisQueueError(Exception):
@@ -25,12 +27,80 @@ class RedisQueueResourceIsAlreadyUsed(RedisQueueError):
     pass
 
 
+user_lock_hold_seconds = meter.create_histogram(
+    "rqueue_user_lock_hold_seconds",
+    unit="s",
+    description="Time a per-user lock was held by its owner",
+)
+
+user_lock_wait_seconds = meter.create_histogram(
+    "rqueue_user_lock_wait_seconds",
+    unit="s",
+    description="Time spent waiting for a per-user lock held by another request",
+)
+
+user_lock_contention_total = meter.create_counter(
+    "rqueue_user_lock_contention_total",
+    description="Per-user lock acquisitions that found the lock already taken",
+)
+
+queue_wait_seconds = meter.create_histogram(
+    "rqueue_wait_seconds",
+    unit="s",
+    description="Time a task spent in the waiting queue before getting a slot",
+)
+
+queue_timeouts_total = meter.create_counter(
+    "rqueue_timeouts_total",
+    description="Tasks that gave up waiting for a slot (timeout)",
+)
+
+queue_rejections_total = meter.create_counter(
+    "rqueue_rejections_total",
+    description="Tasks that did not finish on a slot: cancelled while waiting or killed by exec_timeout",
+)
+
+#resource -> (waiting, active). Filled by RedisQueueManager.sample_metrics_task, read by the observable gauges below.
+_queue_stats: dict[str, tuple[int, int]] = {}
+
+def observe_queue_length(options=None):
+    return [metrics.Observation(waiting, {"resource": resource}) for resource, (waiting, _) in _queue_stats.items()]
+
+def observe_active_slots(options=None):
+    return [metrics.Observation(active, {"resource": resource}) for resource, (_, active) in _queue_stats.items()]
+
+queue_length_gauge = meter.create_observable_gauge(
+    "rqueue_queue_length",
+    callbacks=[observe_queue_length],
+    description="Tasks waiting for a slot, per resource",
+)
+
+queue_active_slots_gauge = meter.create_observable_gauge(
+    "rqueue_active_slots",
+    callbacks=[observe_active_slots],
+    description="Occupied slots, per resource",
+)
+
+
+#Weights of priority classes in the waiting queue: under contention, a class gets slots proportionally to its share,
+#which is split evenly between the class's tenants that have tasks waiting
+DEFAULT_CLASS_SHARES = {
+    'interactive': 8.0,
+    'default': 4.0,
+    'batch': 1.0,
+}
+FLOW_STATE_TTL = 3600 #seconds; virtual finish tags of a class are dropped after an hour of inactivity
+
+
 REDIS_SCRIPTS_DIRECTORY_PATH = os.path.join(os.path.dirname(__file__), 'scripts')
 REDIS_SCRIPTS_KEY = 'rqueue:scripts'
+REDIS_RESOURCES_KEY = 'rqueue:resources' #every resource that ever queued a task (written by fair_enqueue.lua), sampled for metrics
 
 
 
-async def load_scripts_to_redis(redis:Redis):
+async def load_scripts_to_redis(redis:Redis) -> dict[str, str]:
+    """SCRIPT LOADs every script and registers its SHA in REDIS_SCRIPTS_KEY. Idempotent, returns {filename: sha}"""
+    scripts = {}
     for filename in os.listdir(REDIS_SCRIPTS_DIRECTORY_PATH):
         if not filename.endswith('.lua'):
             continue
@@ -39,25 +109,78 @@ async def load_scripts_to_redis(redis:Redis):
             script = f.read()
             sha = await redis.script_load(script)
             await redis.hset(REDIS_SCRIPTS_KEY, filename, sha)
+            scripts[filename] = sha
             logger.info(f"[RedisScripts] Loaded {filename} -> {sha}")
+    return scripts
 
 
 class RedisQueueManager:
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, class_shares: dict[str, float] | None = None):
         self.redis = redis
+        self.class_shares = class_shares or DEFAULT_CLASS_SHARES
+        if any(share <= 0 for share in self.class_shares.values()):
+            raise ValueError(f'Class shares must be positive, got {self.class_shares}')
         self.scripts = {}
         self.scripts_path = os.path.join(os.path.dirname(__file__),'scripts')
+        self.resources: set[str] = set() #resources decorated here; sampled even before their first task registers them in Redis
 
     async def init_scripts(self):
+        """Reads the SHAs registered by the bootstrap. Loads the scripts itself if the registry is missing or incomplete:
+        Redis may have restarted (the bootstrap done-marker outlives its script cache) or evicted the hash (allkeys-lru)
+        """
         self.scripts = await self.redis.hgetall(REDIS_SCRIPTS_KEY)
-        if not self.scripts:
-            raise RuntimeError("Lua scripts not loaded in Redis. Did you run the loader?")
+        expected = {filename for filename in os.listdir(self.scripts_path) if filename.endswith('.lua')}
+        if not expected <= set(self.scripts):
+            logger.warning(f"[RedisScripts] Missing in Redis: {sorted(expected - set(self.scripts))}, reloading")
+            self.scripts = await load_scripts_to_redis(self.redis)
 
     async def run_script(self, script_name: str, keys: list[str], args: list[str] = []):
         sha = self.scripts.get(script_name)
         if not sha:
             raise KeyError(f"No SHA found for script: {script_name}")
-        return await self.redis.evalsha(sha, len(keys), *keys, *args)
+        try:
+            return await self.redis.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError: #Redis restarted or flushed its script cache since init_scripts
+            logger.warning(f"[RedisScripts] {script_name} is not in the Redis script cache, reloading")
+            self.scripts = await load_scripts_to_redis(self.redis)
+            return await self.redis.evalsha(self.scripts[script_name], len(keys), *keys, *args)
+
+    async def sample_queue_stats(self) -> dict[str, tuple[int, int]]:
+        """Reads waiting/active counts of every resource queued in the cluster (registry in Redis),
+        not only of the ones decorated in this process. Pipelined, no queue lock needed for reads.
+        Resources idle for FLOW_STATE_TTL (flow tags expired, nothing waiting or active) are dropped from the registry.
+        """
+        resources = sorted(self.resources | set(await self.redis.smembers(REDIS_RESOURCES_KEY)))
+        if not resources:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for resource in resources:
+                keys = self.queue_keys(resource)
+                pipe.zcard(keys['waiting'])
+                pipe.get(keys['active'])
+                pipe.exists(*(self.flows_key(resource, priority) for priority in self.class_shares))
+            values = await pipe.execute()
+
+        stats, idle = {}, []
+        for i, resource in enumerate(resources):
+            waiting, active, has_flows = int(values[3*i] or 0), int(values[3*i+1] or 0), values[3*i+2]
+            stats[resource] = (waiting, active)
+            if not (waiting or active or has_flows) and resource not in self.resources:
+                idle.append(resource)
+        if idle:
+            await self.redis.srem(REDIS_RESOURCES_KEY, *idle)
+        return stats
+
+    async def sample_metrics_task(self, interval: float = 15.0):
+        """Background task: periodically refreshes queue length / active slots gauges. Start it once per process."""
+        while True:
+            try:
+                _queue_stats.update(await self.sample_queue_stats())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'[QUEUE] Failed to sample queue metrics: {e}')
+            await asyncio.sleep(interval)
 
     @staticmethod
     def is_async(func):
@@ -71,48 +194,75 @@ class RedisQueueManager:
             return inspect.iscoroutinefunction(func)  
         return False
 
-    async def wait_for_slot(self, resource_queue_key: str, used_slots_key:str, lock_key:str, task: str, limit: int, timeout: float, check_interval: float = 1.0):
-        """FIFO queue waiting - waits until a free slot for given resource has appeared.
+    @staticmethod
+    def queue_keys(resource: str) -> dict[str, str]:
+        """Redis keys of a resource queue. The waiting queue is a ZSET (score = WFQ virtual finish tag).
+        'flows' is the prefix of per-class ZSETs of tenant -> finish tag of its last task, see flows_key
+        """
+        return {
+            'waiting': f'queue:{resource}:wfq',
+            'flows': f'queue:{resource}:flows',
+            'vtime': f'queue:{resource}:vtime',
+            'active': f'queue:{resource}:active',
+        }
+
+    @classmethod
+    def flows_key(cls, resource: str, priority: str) -> str:
+        return f"{cls.queue_keys(resource)['flows']}:{priority}"
+
+    async def wait_for_slot(self, resource: str, task: str, limit: int, timeout: float, check_interval: float = 1.0, priority: str = 'default', tenant: str = '-'):
+        """Weighted fair queue waiting - waits until a free slot for given resource has appeared and it is our turn.
+        On success the slot is already taken (active counter incremented) - the caller must release it.
         Arguments:
-        - resource_queue_key:str - key to the queue for given resource
-        - used_slots_key:str - key to the counter of used slots for given resource
-        - lock_key:str - key to a redis lock
+        - resource:str - name of the resource
         - task:str - a UUID/ID of this task (to track our position in the queue)
         - limit:int number of slots
         - timeout:float - timeout in seconds, for how long we are going to wait at max before throwing an exception
         - check_interval:float - interval between checks (if a free slot appeared) in seconds
+        - priority:str - priority class, its weight is taken from self.class_shares
+        - tenant:str - tenant/user within the class; the class weight is split evenly between its tenants with waiting tasks,
+          so a class gets its share however many tenants it has, and they are served fairly between each other
         """
-
-        #another approach: using redis lists to maintian FIFO    
-        async with self.redis.lock(lock_key, 30):
-            await self.redis.rpush(resource_queue_key, task)
-
+        if priority not in self.class_shares:
+            raise ValueError(f'Unknown priority class {priority}. Known: {list(self.class_shares)}')
+        keys = self.queue_keys(resource)
+        attributes = {"resource": resource, "priority": priority}
+
+        await self.run_script(
+            'fair_enqueue.lua',
+            keys=[keys['waiting'], self.flows_key(resource, priority), keys['vtime'], REDIS_RESOURCES_KEY],
+            args=[task, tenant, self.class_shares[priority], FLOW_STATE_TTL, resource]
+        )
+
+        acquired = False
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
         try:
-            start_time = asyncio.get_event_loop().time()
-            while asyncio.get_event_loop().time() - start_time <= timeout:
-                async with self.redis.lock(lock_key, 30):
-                    used_slots = int(await self.redis.get(used_slots_key) or 0)
-
-                if used_slots < limit: #if free slot appeared
-                    async with self.redis.lock(lock_key, 30):
-                        first = await self.redis.lindex(resource_queue_key, 0) #who's first in the queue?
-                    if first == task: #if that's us - exit queue
-                        return
+            while loop.time() - start_time <= timeout:
+                acquired = bool(await self.run_script(
+                    'fair_acquire.lua',
+                    keys=[keys['waiting'], keys['active'], keys['vtime']],
+                    args=[task, limit]
+                ))
+                if acquired:
+                    queue_wait_seconds.record(loop.time() - start_time, attributes)
+                    return
                 await asyncio.sleep(check_interval) #else - wait
 
-            #if timed out     
-            async with self.redis.lock(lock_key, 30):
-                await self.redis.lrem(resource_queue_key, 0, task)
-            raise RedisQueueTimeoutError(f'Redis Queue timeout waiting for {resource_queue_key} for {(asyncio.get_event_loop().time() - start_time):.2f}s. Limit = {limit}')
+            #if timed out
+            queue_wait_seconds.record(loop.time() - start_time, attributes)
+            queue_timeouts_total.add(1, attributes)
+            raise RedisQueueTimeoutError(f'Redis Queue timeout waiting for {resource} ({priority}) for {(loop.time() - start_time):.2f}s. Limit = {limit}')
 
         #if cancelled
         except asyncio.CancelledError:
+            queue_rejections_total.add(1, attributes | {"reason": "cancelled"})
             raise 
         finally:
-            async with self.redis.lock(lock_key, 30):
-                await self.redis.lrem(resource_queue_key, 0, task) 
+            if not acquired:
+                await self.redis.zrem(keys['waiting'], task)
 
-    def use_queue_for_resource(self, resource: str, limit: int, exec_timeout: int, timeout:float = 10.0, check_interval: float = 1.0):
+    def use_queue_for_resource(self, resource: str, limit: int, exec_timeout: int, timeout:float = 10.0, check_interval: float = 1.0, priority: str = 'default', tenant_kwarg_name: str | None = None):
         """Decorator factory that creates resource sepcific queue managers
         Arguments:
         - resource: str - arbitrary name of the resource (queue name)
@@ -120,71 +270,111 @@ class RedisQueueManager:
         - exec_timeout: int - time in seconds for which a slot can be occupied
         - timeout: float - time in seconds for which a task is waiting for a free slot
         - check_interval: float - time in seconds between checks for a free slot
+        - priority: str - priority class of the decorated function (see class_shares), e.g. 'interactive' or 'batch'
+        - tenant_kwarg_name: str | None - kwarg whose value identifies a tenant/user; tenants of one class split its share evenly
         """
 
+        if priority not in self.class_shares:
+            raise ValueError(f'Unknown priority class {priority}. Known: {list(self.class_shares)}')
+        self.resources.add(resource)
+        used_slots_key = self.queue_keys(resource)['active']
+
         def decorator(func):
             @wraps(func)
             async def wrapper(*args,**kwargs):
-                resource_queue_key = f'queue:{resource}:waiting'
-                used_slots_key = f'queue:{resource}:active'
-                lock_key = f'queue:{resource}:queue_lock'
                 task = str(uuid.uuid4()) 
+                tenant = str(kwargs.get(tenant_kwarg_name, '-')) if tenant_kwarg_name else '-'
 
-                async with self.redis.lock(lock_key, 30):
-                    qlen = await self.redis.llen(resource_queue_key)
-                    used = int(await self.redis.get(used_slots_key) or 0)
-
-                logger.debug(f'[QUEUE] Resource {resource} is accessed. Waiting: {qlen}; Active: {used}. Func: {func.__name__}')
-
-                await self.wait_for_slot(resource_queue_key, used_slots_key, lock_key, task, limit, timeout, check_interval) #This will raise Exception, so no need to check for limits.
+                logger.debug(f'[QUEUE] Resource {resource} is accessed. Priority: {priority}; Tenant: {tenant}. Func: {func.__name__}')
 
-                async with self.redis.lock(lock_key, 30):
-                    await self.redis.incr(used_slots_key) #Active users don't need a list, a counter must be enough
+                await self.wait_for_slot(resource, task, limit, timeout, check_interval, priority=priority, tenant=tenant) #This will raise Exception, so no need to check for limits.
 
                 try: 
                     if self.is_async(func):
                         return await asyncio.wait_for(func(*args, **kwargs), timeout=exec_timeout)
                     else:
                         return func(*args, **kwargs)
+                except asyncio.TimeoutError:
+                    queue_rejections_total.add(1, {"resource": resource, "priority": priority, "reason": "exec_timeout"})
+                    raise
                 except asyncio.CancelledError:
                     logger.warning(f'[QUEUE] Task cancelled! Cleaning up slot {task[:8]}...{task[:-8]}.')
                     raise  
                 finally:
-                    async with self.redis.lock(lock_key, 30):
-                        await self.redis.decr(used_slots_key) #Active users don't need a list, a counter must be enough
-                        qlen = await self.redis.llen(resource_queue_key)
-                        used = int(await self.redis.get(used_slots_key) or 0)
-                    logger.debug(f'[QUEUE] Resource with key {used_slots_key} is released. Waiting: {qlen}; Active: {used}. Func: {func.__name__}')
+                    await self.redis.decr(used_slots_key) #Active users don't need a list, a counter must be enough
+                    logger.debug(f'[QUEUE] Resource with key {used_slots_key} is released. Func: {func.__name__}')
 
             return wrapper
         return decorator                
 
-    def lock_for_same_user(self, resource:str, user_id_kwarg_name:str):
+    async def _wait_for_user_lock(self, key: str, token: str, ttl_ms: int, timeout: float, check_interval: float) -> bool:
+        """Waits until the per-user lock is released (PUBLISH from lock_release.lua) or expires, then retries SET NX.
+        Returns True if the lock was acquired within the timeout.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        async with self.redis.pubsub() as pubsub:
+            await pubsub.subscribe(f'{key}:released')
+            while True:
+                #retry after subscribing, so a release between our first SET and SUBSCRIBE is not missed
+                if await self.redis.set(key, token, nx=True, px=ttl_ms):
+                    return True
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                #bounded wait: a crashed holder never publishes, its key just expires
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, check_interval))
+
+    def lock_for_same_user(self, resource:str, user_id_kwarg_name:str, lock_ttl: float = 60, wait_timeout: float | None = None, check_interval: float = 1.0):
         """Locks a resource with an arbitrary name <resource>. A user is identified by a value contained in a kwarg with a passed name.
         Example: A target function is def vote_in_a_poll(user_id:int, option:int) -> then user_id_kwarg is "user_id", i.e. it's value is going to be used to distinguish users.
+        Arguments:
+        - lock_ttl: float - seconds after which the lock expires even if the holder never released it (crashed worker)
+        - wait_timeout: float | None - if set, waits up to this many seconds for the lock instead of rejecting immediately
+        - check_interval: float - max seconds between re-checks while waiting (covers expired locks which are never published)
+        Lock is taken with SET NX PX and an owner token; release is a compare-and-delete (lock_release.lua),
+        so a request can never delete a lock that has expired and been re-acquired by another one.
         """
+        ttl_ms = int(lock_ttl * 1000)
 
         def decorator(func):
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 user_id = kwargs.get(user_id_kwarg_name)
                 user_specific_key = f'queue:{resource}:{user_id}'
-                locked = await self.redis.get(user_specific_key)
-                if not locked:
-                    logger.debug(f'[QUEUE] User {user_id} used {resource}')
-                    await self.redis.set(user_specific_key, 1)
-
-                    try:
-                        if self.is_async(func):
-                            return await func(*args, **kwargs)
-                        else:
-                            return func(*args,**kwargs)
-                    finally:
+                token = uuid.uuid4().hex
+                attributes = {"resource": resource}
+
+                acquired = await self.redis.set(user_specific_key, token, nx=True, px=ttl_ms)
+                if not acquired:
+                    if not wait_timeout:
+                        user_lock_contention_total.add(1, attributes | {"outcome": "rejected"})
+                        logger.debug(f'[QUEUE] User {user_id} tried to use {resource} twice!')
+                        raise RedisQueueResourceIsAlreadyUsed(f'Resource {resource} cannot be accessed twice by {user_id}')
+
+                    wait_started = time.perf_counter()
+                    acquired = await self._wait_for_user_lock(user_specific_key, token, ttl_ms, wait_timeout, check_interval)
+                    user_lock_wait_seconds.record(time.perf_counter() - wait_started, attributes)
+                    if not acquired:
+                        user_lock_contention_total.add(1, attributes | {"outcome": "timeout"})
+                        logger.debug(f'[QUEUE] User {user_id} timed out waiting for {resource}')
+                        raise RedisQueueTimeoutError(f'Resource {resource} is still used by {user_id} after {wait_timeout}s')
+                    user_lock_contention_total.add(1, attributes | {"outcome": "waited"})
+
+                logger.debug(f'[QUEUE] User {user_id} used {resource}')
+                held_since = time.perf_counter()
+                try:
+                    if self.is_async(func):
+                        return await func(*args, **kwargs)
+                    else:
+                        return func(*args,**kwargs)
+                finally:
+                    user_lock_hold_seconds.record(time.perf_counter() - held_since, attributes)
+                    released = await self.run_script('lock_release.lua', keys=[user_specific_key], args=[token, f'{user_specific_key}:released'])
+                    if released:
                         logger.debug(f'[QUEUE] User {user_id} freed {resource}')
-                        await self.redis.delete(user_specific_key)
-                else:
-                    logger.debug(f'[QUEUE] User {user_id} tried to use {resource} twice!')
-                    raise RedisQueueResourceIsAlreadyUsed(f'Resource {resource} cannot be accessed twice by {user_id}')
+                    else:
+                        logger.warning(f'[QUEUE] Lock {user_specific_key} expired before release (held longer than {lock_ttl}s)')
             return wrapper
         return decorator
 
@@ -232,36 +422,16 @@ class RedisQueueManager:
             return wrapper
         return decorator
 
-class RateLimitedTransport(httpx.AsyncBaseTransport):
-    """Custom HTTPx Async transport that uses rate_limit"""
-
-    def __init__(
-            self,
-            queue_mgr: RedisQueueManager,
-            base: httpx.AsyncBaseTransport = None,
-            retries: int = 0,
-            resource:str = "default",
-            seconds_between_requests:float = 1,
-            burst_capacity: int = 3,
-            seconds_between_burst_requests:float = 1
-        ):
-
-        self.base_transport = base or httpx.AsyncHTTPTransport(retries=retries)
-        self.resource = resource
-        self.seconds_between_requests = seconds_between_requests
-        self.burst_capacity = burst_capacity
-        self.seconds_between_burst_requests = seconds_between_burst_requests
-        self.queue_mgr = queue_mgr
-    
-    async def handle_async_request(self, request):
-        @self.queue_mgr.rate_limit(self.resource, seconds_between_requests=self.seconds_between_requests,seconds_between_burst_requests=self.seconds_between_burst_requests, burst_capacity=self.burst_capacity)
-        async def _handle(self, request):
-            return await self.base_transport.handle_async_request(request)
-        return await _handle(self, request)
-
-
 
 def get_rqueue(request: Request):
     return request.app.state.rqueue
 
-RQueueDependency = Annotated[RedisQueueManager, Depends(get_rqueue)]
\ No newline at end of file
+RQueueDependency = Annotated[RedisQueueManager, Depends(get_rqueue)]
+
+
+def __getattr__(name: str):
+    #httpx (~70ms to import) is loaded only by processes that build rate limited HTTP clients
+    if name == 'RateLimitedTransport':
+        from app.common.libs.rqueue.transport import RateLimitedTransport
+        return RateLimitedTransport
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,31 @@
+-- Takes a slot for a waiting task if a slot is free and the task is among the
+-- first <free slots> tasks by virtual finish tag. Atomic: no separate queue lock needed.
+local waiting_key = KEYS[1]
+local active_key = KEYS[2]
+local vtime_key = KEYS[3]
+
+local task = ARGV[1]
+local limit = tonumber(ARGV[2])
+
+local active = tonumber(redis.call('GET', active_key)) or 0
+local free = limit - active
+if free <= 0 then
+    return 0
+end
+
+local rank = redis.call('ZRANK', waiting_key, task)
+if (not rank) or rank >= free then
+    return 0
+end
+
+local score = tonumber(redis.call('ZSCORE', waiting_key, task))
+redis.call('ZREM', waiting_key, task)
+redis.call('INCR', active_key)
+
+-- Virtual time follows the tags of dequeued tasks
+local vtime = tonumber(redis.call('GET', vtime_key)) or 0
+if score > vtime then
+    redis.call('SET', vtime_key, tostring(score))
+end
+
+return 1
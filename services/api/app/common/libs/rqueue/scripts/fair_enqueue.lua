@@ -0,0 +1,38 @@
+-- Weighted fair queuing: enqueues a task with a virtual finish tag.
+-- A flow is a tenant within a priority class. The class weight is split evenly between the
+-- class's backlogged flows, so under contention classes are served proportionally to their
+-- weights however many tenants they have, and tenants of one class share it fairly.
+local waiting_key = KEYS[1]
+local flows_key = KEYS[2] -- ZSET of this class: flow -> virtual finish tag of its last task
+local vtime_key = KEYS[3]
+local resources_key = KEYS[4]
+
+local task = ARGV[1]
+local flow = ARGV[2]
+local weight = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local resource = ARGV[5]
+
+local vtime = tonumber(redis.call('GET', vtime_key)) or 0
+
+-- Flows whose last tag is behind the virtual time have nothing queued: they are idle,
+-- and an idle flow restarts from the current virtual time anyway (it cannot bank credit)
+redis.call('ZREMRANGEBYSCORE', flows_key, '-inf', vtime)
+local last_finish = tonumber(redis.call('ZSCORE', flows_key, flow))
+local backlogged = redis.call('ZCARD', flows_key)
+if not last_finish then
+    last_finish = vtime
+    backlogged = backlogged + 1
+end
+
+-- Each of the class's backlogged flows advances by 1 / (weight / backlogged) per task
+local finish = math.max(vtime, last_finish) + backlogged / weight
+
+redis.call('ZADD', flows_key, finish, flow)
+redis.call('EXPIRE', flows_key, ttl)
+redis.call('ZADD', waiting_key, finish, task)
+-- Registry read by metric samplers of every process, including ones that never queue this resource
+redis.call('SADD', resources_key, resource)
+
+-- Lua numbers are truncated to integers when returned => return as string
+return tostring(finish)
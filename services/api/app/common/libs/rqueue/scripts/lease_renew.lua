@@ -0,0 +1,13 @@
+-- Extends a lease (leader election) only for its current holder.
+-- Returns 1 if the caller still holds the lease, 0 if it was lost (expired and taken by someone else).
+local lease_key = KEYS[1]
+
+local token = ARGV[1]
+local ttl_ms = tonumber(ARGV[2])
+
+if redis.call('GET', lease_key) == token then
+    redis.call('PEXPIRE', lease_key, ttl_ms)
+    return 1
+end
+
+return 0
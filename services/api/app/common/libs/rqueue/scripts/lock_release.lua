@@ -0,0 +1,14 @@
+-- Compare-and-delete release of an owner-token lock.
+-- Only the holder that set the token may delete the key; waiters are notified via PUBLISH.
+local lock_key = KEYS[1]
+
+local token = ARGV[1]
+local channel = ARGV[2]
+
+if redis.call('GET', lock_key) == token then
+    redis.call('DEL', lock_key)
+    redis.call('PUBLISH', channel, token)
+    return 1
+end
+
+return 0
@@ -0,0 +1,29 @@
+-- Cluster-wide counting semaphore with leases.
+-- Holders live in a ZSET scored by lease expiry, so slots of crashed workers free themselves.
+-- Rejected callers are kept in a second ZSET until the moment they were told to retry:
+-- their rank there is the position hint, and Retry-After grows by retry_after per `limit` callers ahead.
+local holders_key = KEYS[1]
+local shed_key = KEYS[2]
+
+local token = ARGV[1]
+local limit = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local retry_after = tonumber(ARGV[4])
+
+local now_data = redis.call('TIME')
+local now = tonumber(now_data[1]) + tonumber(now_data[2]) / 1000000
+
+redis.call('ZREMRANGEBYSCORE', holders_key, '-inf', now)
+local holders = redis.call('ZCARD', holders_key)
+if holders >= limit then
+    redis.call('ZREMRANGEBYSCORE', shed_key, '-inf', now)
+    local position = redis.call('ZCARD', shed_key) + 1
+    local retry = retry_after * (1 + math.floor((position - 1) / limit))
+    redis.call('ZADD', shed_key, now + retry, token)
+    redis.call('EXPIRE', shed_key, retry + 1)
+    return {0, holders, position, retry}
+end
+
+redis.call('ZADD', holders_key, now + lease, token)
+redis.call('EXPIRE', holders_key, math.ceil(lease) + 1)
+return {1, holders + 1, 0, 0}
@@ -0,0 +1,19 @@
+-- Extends the lease of a semaphore slot (semaphore_acquire.lua) only for its current holder.
+-- Returns 1 if the caller still holds the slot, 0 if it was lost (lease expired and pruned by an acquire).
+local holders_key = KEYS[1]
+
+local token = ARGV[1]
+local lease = tonumber(ARGV[2])
+
+if not redis.call('ZSCORE', holders_key, token) then
+    return 0
+end
+
+local now_data = redis.call('TIME')
+local now = tonumber(now_data[1]) + tonumber(now_data[2]) / 1000000
+
+redis.call('ZADD', holders_key, now + lease, token)
+if redis.call('TTL', holders_key) < math.ceil(lease) + 1 then
+    redis.call('EXPIRE', holders_key, math.ceil(lease) + 1)
+end
+return 1
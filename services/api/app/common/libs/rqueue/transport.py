@@ -0,0 +1,30 @@
+from app.common.libs.rqueue.queue import RedisQueueManager
+import httpx
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Custom HTTPx Async transport that uses rate_limit"""
+
+    def __init__(
+            self,
+            queue_mgr: RedisQueueManager,
+            base: httpx.AsyncBaseTransport = None,
+            retries: int = 0,
+            resource:str = "default",
+            seconds_between_requests:float = 1,
+            burst_capacity: int = 3,
+            seconds_between_burst_requests:float = 1
+        ):
+
+        self.base_transport = base or httpx.AsyncHTTPTransport(retries=retries)
+        self.resource = resource
+        self.seconds_between_requests = seconds_between_requests
+        self.burst_capacity = burst_capacity
+        self.seconds_between_burst_requests = seconds_between_burst_requests
+        self.queue_mgr = queue_mgr
+    
+    async def handle_async_request(self, request):
+        @self.queue_mgr.rate_limit(self.resource, seconds_between_requests=self.seconds_between_requests,seconds_between_burst_requests=self.seconds_between_burst_requests, burst_capacity=self.burst_capacity)
+        async def _handle(self, request):
+            return await self.base_transport.handle_async_request(request)
+        return await _handle(self, request)
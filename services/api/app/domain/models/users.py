@@ -3,6 +3,7 @@ import pydantic as p
 from enum import Enum
 from app.domain.services import IPasswordHasherAsync
 import app.domain.exceptions as domexc
+from app.common.common import construct_trusted
 
 class Role(str, Enum):
     ADMIN = "admin"
@@ -28,6 +29,16 @@ class User(p.BaseModel):
             raise domexc.UserValueError("Username must contain only numbers and letters")
         return v
 
+    @classmethod
+    def from_trusted(cls, id: int|None, username: str, password_hash: str, role: Role|str, status: Status|str, version: int|None) -> 'User':
+        'Builds a user from our own DB rows / cache records without validation (they were validated when written)'
+        return construct_trusted(cls, dict(
+            id=id, username=username, password_hash=password_hash,
+            role=role if isinstance(role, Role) else Role(role), #rows hold plain strings
+            status=status if isinstance(status, Status) else Status(status),
+            version=version,
+        ))
+
     @staticmethod
     async def _hash_password(password: str, hasher: IPasswordHasherAsync):
         if len(password) < 8:
@@ -1,6 +1,8 @@
 # gunicorn_conf.py
 import multiprocessing
 import logging
+from app.common.config import Config
+import app.common.libs.prom_multiproc as prom_mp
 
 bind = "0.0.0.0:8000"
 
@@ -21,8 +23,24 @@ asyncio_logger = logging.getLogger("asyncio")
 asyncio_logger.addFilter(ExcludeAioHttpFilter())
 
 timeout = 30      
-graceful_timeout = 30
+graceful_timeout = Config.GRACEFUL_TIMEOUT_SECONDS #workers drain within it (readiness grace + in-flight wait + cleanup)
 
 reload = False
 
 
+def on_starting(server):
+    #Prometheus: workers dump their metrics to files, the master aggregates them on :METRICS_PORT
+    if Config.METRICS_EXPORT == 'prometheus':
+        prom_mp.prepare_directory(Config.METRICS_MULTIPROC_DIR)
+    #One-time bootstrap (tables, Lua scripts, default admin) before workers are forked, in a child interpreter
+    if Config.BOOTSTRAP_IN_MASTER:
+        import app.bootstrap as bootstrap
+        bootstrap.bootstrap_in_master()
+
+def when_ready(server):
+    if Config.METRICS_EXPORT == 'prometheus':
+        prom_mp.start_master_server(Config.METRICS_PORT, Config.METRICS_MULTIPROC_DIR, Config.METRICS_SUM_GAUGES)
+
+def child_exit(server, worker):
+    if Config.METRICS_EXPORT == 'prometheus':
+        prom_mp.archive_worker(Config.METRICS_MULTIPROC_DIR, worker.pid)
@@ -1,4 +1,5 @@
 from app.domain.services import IPasswordHasher, IPasswordHasherAsync
+import app.infrastructure.telemetry.timing as timing
 import asyncio
 
 class AsyncHasher(IPasswordHasherAsync):
@@ -6,7 +7,9 @@ class AsyncHasher(IPasswordHasherAsync):
         self._sync_hasher = sync_hasher
 
     async def hash(self, password: str) -> str:
-        return await asyncio.to_thread(self._sync_hasher.hash, password)
+        with timing.timed(timing.BCRYPT):
+            return await asyncio.to_thread(self._sync_hasher.hash, password)
 
     async def verify(self, password: str, password_hash: str) -> bool:
-        return await asyncio.to_thread(self._sync_hasher.verify, password, password_hash)
+        with timing.timed(timing.BCRYPT):
+            return await asyncio.to_thread(self._sync_hasher.verify, password, password_hash)
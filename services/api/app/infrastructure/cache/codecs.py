@@ -0,0 +1,264 @@
+"""Binary encoding of cached records (users, user lists, sessions).
+
+Every encoded value starts with a version byte naming its format:
+- 0x01  struct:  fixed-layout header + length-prefixed strings, no field names (stdlib only)
+- 0x02  msgpack: a positional array
+- '{' / '[': legacy pydantic JSON written before codecs existed (also what the `json` codec writes)
+Readers understand every format regardless of the one they write (CACHE_CODEC), so codecs can be
+switched with a rolling deploy: old and new workers read each other's records. A value with an unknown
+version byte (written by a newer release) raises CodecError and is treated as a cache miss.
+Binary records are only ever written by these codecs from validated models, so they are decoded
+with trusted construction (no validation); JSON, which may predate the codecs, is validated.
+
+Sessions are stored as Redis hashes (SessionHashCodec); SessionCodec only reads the string records
+written by earlier releases until they expire.
+
+The connection is created with decode_responses=True, so binary values must be read with
+`get_raw` / NEVER_DECODE, otherwise redis-py tries to decode them as UTF-8.
+"""
+from abc import ABC, abstractmethod
+from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
+import app.domain.models as domain
+import app.application.models as mapp
+from app.common.common import construct_trusted
+from app.infrastructure.security.refresh_tokens import hash_refresh_token
+import pydantic as p, struct, typing as t
+
+import msgpack, orjson
+
+JSON = 'json'
+STRUCT = 'struct'
+MSGPACK = 'msgpack'
+
+_VERSION_STRUCT = 0x01
+_VERSION_MSGPACK = 0x02
+_LEGACY_JSON = (ord('{'), ord('['))
+
+#Enum <-> byte. Append only: positions are stored in the cache
+_ROLES = (domain.Role.ADMIN, domain.Role.USER)
+_STATUSES = (domain.Status.ACTIVE, domain.Status.DEACTIVATED)
+_ROLE_INDEX = {role: i for i, role in enumerate(_ROLES)}
+_STATUS_INDEX = {status: i for i, status in enumerate(_STATUSES)}
+
+T = t.TypeVar('T')
+
+
+class CodecError(ValueError):
+    """Value is corrupt or written in a format this release does not know"""
+
+
+async def get_raw(redis: Redis, key: str) -> bytes | None:
+    return await redis.execute_command('GET', key, **{NEVER_DECODE: True})
+
+async def hgetall_raw(redis: Redis, key: str) -> dict[bytes, bytes]:
+    return await redis.execute_command('HGETALL', key, **{NEVER_DECODE: True})
+
+
+_STR_SIZE = struct.Struct('<H')
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    return _STR_SIZE.pack(len(data)) + data
+
+def _unpack_str(buf: memoryview, offset: int) -> tuple[str, int]:
+    (size,) = _STR_SIZE.unpack_from(buf, offset)
+    offset += 2
+    return str(buf[offset:offset + size], 'utf-8'), offset + size
+
+
+class RecordCodec(ABC, t.Generic[T]):
+    """Encodes one record type in the configured format; decodes any known format"""
+    model: type[T]
+
+    def __init__(self, fmt: str = JSON):
+        if fmt not in (JSON, STRUCT, MSGPACK):
+            raise ValueError(f'Unknown cache codec {fmt}. Known: {JSON}, {STRUCT}, {MSGPACK}')
+        self.fmt = fmt
+        #JSON is parsed and validated by pydantic-core in one pass, no intermediate dicts
+        self._adapter = p.TypeAdapter(self.model)
+        self._list_adapter = p.TypeAdapter(list[self.model])
+
+    #Record <-> tuple of primitives (msgpack) and <-> bytes (struct), implemented per record type
+    @abstractmethod
+    def to_fields(self, obj: T) -> tuple: ...
+
+    @abstractmethod
+    def from_fields(self, fields: t.Sequence) -> T: ...
+
+    @abstractmethod
+    def pack(self, obj: T) -> bytes: ...
+
+    @abstractmethod
+    def unpack(self, buf: memoryview, offset: int) -> tuple[T, int]: ...
+
+    def from_json(self, data: bytes) -> T:
+        return self._adapter.validate_json(data)
+
+    def encode(self, obj: T) -> bytes:
+        if self.fmt == STRUCT:
+            return bytes((_VERSION_STRUCT,)) + self.pack(obj)
+        if self.fmt == MSGPACK:
+            return bytes((_VERSION_MSGPACK,)) + msgpack.packb(self.to_fields(obj))
+        return self._adapter.dump_json(obj)
+
+    def decode(self, data: bytes | str) -> T:
+        if isinstance(data, str):
+            data = data.encode()
+        try:
+            version = data[0]
+            if version == _VERSION_STRUCT:
+                obj, offset = self.unpack(memoryview(data), 1)
+                if offset != len(data):
+                    raise CodecError('Trailing bytes after the record')
+                return obj
+            if version == _VERSION_MSGPACK:
+                return self.from_fields(msgpack.unpackb(memoryview(data)[1:]))
+            if version in _LEGACY_JSON:
+                return self.from_json(data)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f'Corrupt cache record: {e}') from e
+        raise CodecError(f'Unknown cache record version {version}')
+
+    def encode_many(self, objs: t.Sequence[T]) -> bytes:
+        if self.fmt == STRUCT:
+            return bytes((_VERSION_STRUCT,)) + struct.pack('<I', len(objs)) + b''.join(self.pack(obj) for obj in objs)
+        if self.fmt == MSGPACK:
+            return bytes((_VERSION_MSGPACK,)) + msgpack.packb([self.to_fields(obj) for obj in objs])
+        return self._list_adapter.dump_json(list(objs))
+
+    def decode_many(self, data: bytes | str) -> list[T]:
+        if isinstance(data, str):
+            data = data.encode()
+        try:
+            version = data[0]
+            if version == _VERSION_STRUCT:
+                buf = memoryview(data)
+                (count,) = struct.unpack_from('<I', buf, 1)
+                offset, objs = 5, []
+                for _ in range(count):
+                    obj, offset = self.unpack(buf, offset)
+                    objs.append(obj)
+                if offset != len(data):
+                    raise CodecError('Trailing bytes after the records')
+                return objs
+            if version == _VERSION_MSGPACK:
+                return [self.from_fields(fields) for fields in msgpack.unpackb(memoryview(data)[1:])]
+            if version in _LEGACY_JSON:
+                return self._list_adapter.validate_json(data)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f'Corrupt cache record: {e}') from e
+        raise CodecError(f'Unknown cache record version {version}')
+
+
+class UserCodec(RecordCodec[domain.User]):
+    """struct layout: <id q><version q><role B><status B> username password_hash (-1 = None for ints)"""
+    model = domain.User
+    _HEADER = struct.Struct('<qqBB')
+
+    def to_fields(self, user: domain.User) -> tuple:
+        return (user.id, user.username, user.password_hash, _ROLE_INDEX[user.role], _STATUS_INDEX[user.status], user.version)
+
+    def from_fields(self, fields: t.Sequence) -> domain.User:
+        id, username, password_hash, role, status, version = fields
+        return domain.User.from_trusted(id, username, password_hash, _ROLES[role], _STATUSES[status], version)
+
+    def pack(self, user: domain.User) -> bytes:
+        header = self._HEADER.pack(
+            -1 if user.id is None else user.id,
+            -1 if user.version is None else user.version,
+            _ROLE_INDEX[user.role],
+            _STATUS_INDEX[user.status],
+        )
+        return header + _pack_str(user.username) + _pack_str(user.password_hash)
+
+    def unpack(self, buf: memoryview, offset: int) -> tuple[domain.User, int]:
+        id, version, role, status = self._HEADER.unpack_from(buf, offset)
+        username, offset = _unpack_str(buf, offset + self._HEADER.size)
+        password_hash, offset = _unpack_str(buf, offset)
+        user = domain.User.from_trusted(
+            None if id == -1 else id, username, password_hash, _ROLES[role], _STATUSES[status], None if version == -1 else version,
+        )
+        return user, offset
+
+
+
+class SessionCodec(RecordCodec[mapp.RotatingTokenSession]):
+    """struct layout: <user_id q><roles count B> id roles... <refresh token sha256, 32 raw bytes>
+
+    Legacy JSON records carry the refresh token itself: it is hashed on decode.
+    """
+    model = mapp.RotatingTokenSession
+    _HEADER = struct.Struct('<qB')
+
+    def to_fields(self, session: mapp.RotatingTokenSession) -> tuple:
+        return (session.id, session.user_id, list(session.roles), bytes.fromhex(session.refresh_token_hash))
+
+    def from_fields(self, fields: t.Sequence) -> mapp.RotatingTokenSession:
+        id, user_id, roles, token_hash = fields
+        return construct_trusted(mapp.RotatingTokenSession, dict(id=id, user_id=user_id, roles=list(roles), refresh_token_hash=bytes(token_hash).hex()))
+
+    def from_json(self, data: bytes) -> mapp.RotatingTokenSession:
+        fields = orjson.loads(data)
+        if 'refresh_token' in fields:
+            fields['refresh_token_hash'] = hash_refresh_token(fields.pop('refresh_token'))
+        return self._adapter.validate_python(fields)
+
+    def pack(self, session: mapp.RotatingTokenSession) -> bytes:
+        parts = [self._HEADER.pack(session.user_id, len(session.roles)), _pack_str(session.id)]
+        parts.extend(_pack_str(role) for role in session.roles)
+        parts.append(bytes.fromhex(session.refresh_token_hash))
+        return b''.join(parts)
+
+    def unpack(self, buf: memoryview, offset: int) -> tuple[mapp.RotatingTokenSession, int]:
+        user_id, roles_count = self._HEADER.unpack_from(buf, offset)
+        id, offset = _unpack_str(buf, offset + self._HEADER.size)
+        roles = []
+        for _ in range(roles_count):
+            role, offset = _unpack_str(buf, offset)
+            roles.append(role)
+        token_hash = bytes(buf[offset:offset + 32])
+        if len(token_hash) != 32:
+            raise CodecError('Truncated session record')
+        return self.from_fields((id, user_id, roles, token_hash)), offset + 32
+
+
+class SessionHashCodec:
+    """Session as a Redis hash: u = user id, r = comma separated roles, t = sha256 of the refresh token (32 raw bytes).
+
+    One-letter field names keep the hash small enough for Redis' compact listpack encoding.
+    Rotation rewrites only TOKEN_FIELD.
+    """
+    USER_FIELD = 'u'
+    ROLES_FIELD = 'r'
+    TOKEN_FIELD = 't'
+
+    def encode(self, session: mapp.RotatingTokenSession) -> dict[str, bytes | str | int]:
+        return {
+            self.USER_FIELD: session.user_id,
+            self.ROLES_FIELD: ','.join(session.roles),
+            self.TOKEN_FIELD: self.encode_token_hash(session.refresh_token_hash),
+        }
+
+    @staticmethod
+    def encode_token_hash(refresh_token_hash: str) -> bytes:
+        return bytes.fromhex(refresh_token_hash)
+
+    def decode(self, session_id: str, fields: dict[bytes, bytes]) -> mapp.RotatingTokenSession:
+        """fields as returned by HGETALL with NEVER_DECODE"""
+        try:
+            user_id, roles, token_hash = fields[b'u'], fields[b'r'], fields[b't'] #raw names of the fields above
+            if len(token_hash) != 32:
+                raise CodecError('Truncated session token hash')
+            return construct_trusted(mapp.RotatingTokenSession, dict(
+                id=session_id, user_id=int(user_id), roles=roles.decode().split(',') if roles else [], refresh_token_hash=token_hash.hex(),
+            ))
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f'Corrupt session hash: {e}') from e
+
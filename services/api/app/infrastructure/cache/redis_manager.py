@@ -55,6 +55,23 @@ class RedisConnectionManager(mgrs.ConnectionManagerInterface[Redis]):
             raise exc.StorageBootError(f"Redis failed to boot within {retries * interval_sec} sec!")
 
 
+    async def warm_up(self, connections: int) -> None:
+        '''Opens and authenticates *connections* pool connections (PING each), then returns them to the pool'''
+        if connections <= 0:
+            return
+        async with self.connect() as client:
+            pool = client.connection_pool
+            acquired = await asyncio.gather(*(pool.get_connection('PING') for _ in range(connections)))
+            try:
+                for conn in acquired:
+                    await conn.send_command('PING')
+                    await conn.read_response()
+            finally:
+                for conn in acquired:
+                    await pool.release(conn)
+        logger.info(f"[WARM UP] {connections} Redis connections opened")
+
+
     async def initialize_data_structures(self):
         """
         Initialization of key structures.
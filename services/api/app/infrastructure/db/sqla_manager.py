@@ -85,6 +85,20 @@ class SQLAlchemySessionManager(mgrs.SessionManagerInterface[AsyncConnection, Asy
             logger.info(f"[WAIT FOR DB] Database is not available after all {attempts} retries. All other components will launch regardless...")
             raise exc.StorageBootError(f"Database failed to boot within {retries*interval_sec}sec!")
 
+    async def warm_up(self, connections: int) -> None:
+        """Checks out *connections* pool connections at once (TCP + MySQL auth), then returns them to the pool.
+        Keep it within pool_size, overflow connections are closed on return.
+        """
+        if self._engine is None:
+            raise exc.StorageNotInitialzied("[DB Manager] DatabaseSessionManager is not initizalized!")
+        if connections <= 0:
+            return
+        async with contextlib.AsyncExitStack() as stack:
+            conns = await asyncio.gather(*(stack.enter_async_context(self._engine.connect()) for _ in range(connections)))
+            for conn in conns:
+                await conn.execute(sqlm.text("SELECT 1"))
+        logger.info(f"[WARM UP] {connections} database connections opened")
+
     async def initialize_data_structures(self):
         if self._engine is None:
             raise exc.StorageNotInitialzied("[DB Manager] DatabaseSessionManager is not initizalized!")
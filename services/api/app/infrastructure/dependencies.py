@@ -1,23 +1,19 @@
 from fastapi import Depends, Request
-import typing as t
-
-
-import opentelemetry.instrumentation.redis as otel_redis
-import opentelemetry.instrumentation.sqlalchemy as otel_sqla
+import typing as t, threading
 
 import app.infrastructure.db as db
 from app.infrastructure.cache.redis_manager import RedisConnectionManager
 from app.infrastructure.db.sqla_manager import SQLAlchemySessionManager
 import app.infrastructure.repositories as repos
 import app.infrastructure.security as security
-import app.infrastructure.tasks as tasks
 import app.infrastructure.telemetry.traces as tracing
+import app.infrastructure.telemetry.timing as timing
 import app.infrastructure.adapters as adap
+import app.infrastructure.http as http
 from app.common.config import Config, CeleryConfig
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
-from celery import Celery
 
 
 #Auth infrastructure choices
@@ -26,12 +22,28 @@ AuthStrategyType = security.StatefulOAuthStrategy
 _PasswordHasherType = security.BCryptHasher
 PasswordHasherType = lambda: adap.AsyncHasher(_PasswordHasherType())
 
-#BackgroundTasks
-_celery = Celery(Config.APP_NAME)
-_celery.config_from_object(CeleryConfig)
-_celery.autodiscover_tasks(['app.application.tasks'], related_name='__init__.py')
-TaskProcessorType = tasks.CeleryTaskProcessor
-TaskProcessor = TaskProcessorType(_celery)
+#BackgroundTasks: the Celery app (~200ms to build) is created on first access of
+#_celery / TaskProcessorType / TaskProcessor => web workers that never send tasks don't pay for it.
+#`celery -A app.infrastructure.dependencies:_celery` and `@TaskProcessor.task` work as before.
+_LAZY_TASK_NAMES = frozenset({'_celery', 'TaskProcessorType', 'TaskProcessor'})
+_tasks_lock = threading.RLock()
+
+def _init_task_processor():
+    import app.infrastructure.tasks as tasks
+    from celery import Celery
+    with _tasks_lock:
+        if '_celery' in globals():
+            return
+        celery = Celery(Config.APP_NAME)
+        celery.config_from_object(CeleryConfig)
+        globals().update(_celery=celery, TaskProcessorType=tasks.CeleryTaskProcessor, TaskProcessor=tasks.CeleryTaskProcessor(celery))
+        celery.autodiscover_tasks(['app.application.tasks'], related_name='__init__.py')
+
+def __getattr__(name: str):
+    if name in _LAZY_TASK_NAMES:
+        _init_task_processor()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 #Dependeny itself is left in module to allow the use of decorator globally
 TracerDependency = t.Annotated[tracing.TracerType, Depends(tracing.get_tracer)]
@@ -47,8 +59,14 @@ DatabaseManager = DatabaseManagerType(Config.DB_URL, Config.DB_KWARGS)
 
 ####
 #OTEL WRAPPERS
-otel_redis.RedisInstrumentor().instrument()
-otel_sqla.SQLAlchemyInstrumentor().instrument(engine=DatabaseManager._engine.sync_engine)
+if Config.TRACING_ENABLED: #instrumentors (~80ms each) are imported only when tracing is on
+    import opentelemetry.instrumentation.redis as otel_redis
+    import opentelemetry.instrumentation.sqlalchemy as otel_sqla
+    otel_redis.RedisInstrumentor().instrument()
+    otel_sqla.SQLAlchemyInstrumentor().instrument(engine=DatabaseManager._engine.sync_engine)
+#Per-request redis/db time for the latency histograms
+timing.instrument_redis()
+timing.instrument_sqlalchemy(DatabaseManager._engine.sync_engine)
 ####
 
 
@@ -65,6 +83,10 @@ CacheManager = CacheManagerType(**cache_args)
 
 UnitOfWork = db.SQLAlchemyUnitOfWork
 
+#Outbound HTTP clients: started/closed in lifespan
+HttpClientRegistryType = http.OutboundClientRegistry
+HttpClients = HttpClientRegistryType(pools=Config.OUTBOUND_HTTP_POOLS, clients=Config.OUTBOUND_HTTP_CLIENTS)
+
 async def get_db_session():
     async with DatabaseManager.session() as session:
         yield session
@@ -91,7 +113,7 @@ UoWDependency = t.Annotated[UnitOfWork, Depends(get_uow)]
 UserDB = repos.SQLAUserRepository
 UserRepository = repos.RedisCacheUserRepository
 SessionRepository = repos.RedisSessionRepository
-MetricActiveUsersRepository = repos.RedisMetricActiveUserStorage
+MetricActiveUsersRepository = repos.RedisHLLMetricActiveUserStorage if Config.ACTIVE_USERS_STORAGE == 'hll' else repos.RedisMetricActiveUserStorage
 
 async def get_user_repo(cache: CacheDependency, uow: UoWDependency):
     user_db = UserDB(uow.session)
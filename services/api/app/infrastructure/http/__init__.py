@@ -0,0 +1,10 @@
+from .clients import *
+
+#transports subclass httpx classes => loaded on first use (OutboundClientRegistry.start), not with the registry
+_TRANSPORTS = frozenset({'InstrumentedTransport', 'HostLimitedTransport', 'RetryTransport', 'IDEMPOTENT_METHODS'})
+
+def __getattr__(name: str):
+    if name in _TRANSPORTS:
+        import app.infrastructure.http.transports as transports
+        return getattr(transports, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,108 @@
+import app.common.libs.rqueue.queue as rqueue
+import dataclasses as dc, typing as t, logging, importlib.util
+
+if t.TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger('app')
+
+
+@dc.dataclass(frozen=True)
+class OutboundPoolConfig:
+    """A keep-alive connection pool (one httpx.AsyncHTTPTransport) that can be shared by several named clients"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False #requires the `h2` package (httpx[http2]), which is not a dependency of this service
+
+    def __post_init__(self):
+        #fail when the config is loaded, not when the first client starts
+        if self.http2 and importlib.util.find_spec('h2') is None:
+            raise ValueError('http2=True in OUTBOUND_HTTP_POOLS needs the h2 package: install httpx[http2] or disable http2')
+
+
+@dc.dataclass(frozen=True)
+class OutboundClientConfig:
+    """Per-target settings of a named client"""
+    base_url: str = ''
+    pool: str = 'default'
+    timeout: float = 10.0
+    headers: dict[str, str] = dc.field(default_factory=dict)
+    max_connections_per_host: int | None = None
+    retries: int = 0
+    backoff_base: float = 0.1
+    backoff_max: float = 5.0
+    retry_statuses: tuple[int, ...] = (502, 503, 504)
+    rate_limit: dict[str, t.Any] | None = None #kwargs of rqueue.RateLimitedTransport: resource, seconds_between_requests, burst_capacity, ...
+
+
+class OutboundClientRegistry:
+    """Lifespan-managed registry of named outbound httpx clients.
+
+    Transport chain of a client (outermost first):
+    RetryTransport -> RateLimitedTransport -> HostLimitedTransport -> InstrumentedTransport -> shared pool.
+    Rate limiting sits inside retries, so every attempt takes a token.
+    """
+
+    def __init__(self, pools: dict[str, dict] | None = None, clients: dict[str, dict] | None = None):
+        self.pool_configs = {name: OutboundPoolConfig(**cfg) for name, cfg in (pools or {}).items()}
+        self.client_configs = {name: OutboundClientConfig(**cfg) for name, cfg in (clients or {}).items()}
+        self._pools: dict[str, 'httpx.AsyncHTTPTransport'] = {}
+        self._clients: dict[str, 'httpx.AsyncClient'] = {}
+
+    def _build_transport(self, name: str, cfg: OutboundClientConfig, queue_mgr: rqueue.RedisQueueManager | None) -> 'httpx.AsyncBaseTransport':
+        from app.infrastructure.http.transports import InstrumentedTransport, HostLimitedTransport, RetryTransport
+        if cfg.pool not in self._pools:
+            raise KeyError(f'Client {name} refers to unknown pool {cfg.pool}. Known: {list(self._pools)}')
+        transport: 'httpx.AsyncBaseTransport' = InstrumentedTransport(self._pools[cfg.pool], client_name=name)
+        if cfg.max_connections_per_host:
+            transport = HostLimitedTransport(transport, cfg.max_connections_per_host)
+        if cfg.rate_limit:
+            if queue_mgr is None:
+                raise ValueError(f'Client {name} is rate limited, but no RedisQueueManager was given')
+            transport = rqueue.RateLimitedTransport(queue_mgr, base=transport, **({'resource': f'http:{name}'} | cfg.rate_limit))
+        if cfg.retries:
+            transport = RetryTransport(
+                transport,
+                client_name=name,
+                retries=cfg.retries,
+                backoff_base=cfg.backoff_base,
+                backoff_max=cfg.backoff_max,
+                retry_statuses=cfg.retry_statuses,
+            )
+        return transport
+
+    async def start(self, queue_mgr: rqueue.RedisQueueManager | None = None) -> None:
+        import httpx #imported on start: processes that never start the registry (celery, scripts) skip it
+        for name, cfg in self.pool_configs.items():
+            self._pools[name] = httpx.AsyncHTTPTransport(
+                http2=cfg.http2,
+                limits=httpx.Limits(
+                    max_connections=cfg.max_connections,
+                    max_keepalive_connections=cfg.max_keepalive_connections,
+                    keepalive_expiry=cfg.keepalive_expiry,
+                ),
+            )
+        for name, cfg in self.client_configs.items():
+            self._clients[name] = httpx.AsyncClient(
+                base_url=cfg.base_url,
+                timeout=cfg.timeout,
+                headers=cfg.headers,
+                transport=self._build_transport(name, cfg, queue_mgr),
+            )
+        logger.info(f'[HTTP] Outbound clients ready: {list(self._clients)} over pools {list(self._pools)}')
+
+    def get(self, name: str) -> 'httpx.AsyncClient':
+        try:
+            return self._clients[name]
+        except KeyError:
+            raise KeyError(f'Outbound HTTP client {name} is not configured (or registry is not started)') from None
+
+    async def close(self) -> None:
+        #Wrapping transports do not own the pools => clients first, then pools
+        for client in self._clients.values():
+            await client.aclose()
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._clients.clear()
+        self._pools.clear()
@@ -0,0 +1,159 @@
+from opentelemetry import metrics
+import httpx, asyncio, random, time, logging, typing as t
+
+logger = logging.getLogger('app')
+meter = metrics.get_meter("app.metrics")
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+http_client_request_duration = meter.create_histogram(
+    "http_client_request_duration_seconds",
+    unit="s",
+    description="Outbound HTTP request latency (until response headers), per client and host",
+)
+
+http_client_connections_total = meter.create_counter(
+    "http_client_connections_total",
+    description="Outbound HTTP requests by connection reuse: reused=false means a new TCP/TLS connection was opened",
+)
+
+http_client_retries_total = meter.create_counter(
+    "http_client_retries_total",
+    description="Outbound HTTP retry attempts",
+)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records per-host latency and whether the pooled connection was reused (via httpcore trace events)"""
+
+    def __init__(self, base: httpx.AsyncBaseTransport, client_name: str):
+        self.base_transport = base
+        self.client_name = client_name
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        new_connection = False
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict):
+            nonlocal new_connection
+            if event_name == "connection.connect_tcp.complete":
+                new_connection = True
+            if outer_trace:
+                await outer_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        attributes = {"client": self.client_name, "host": request.url.host}
+        start = time.perf_counter()
+        try:
+            response = await self.base_transport.handle_async_request(request)
+        except httpx.TransportError:
+            http_client_request_duration.record(time.perf_counter() - start, attributes | {"status_class": "error"})
+            raise
+        http_client_request_duration.record(time.perf_counter() - start, attributes | {"status_class": f"{response.status_code // 100}xx"})
+        http_client_connections_total.add(1, attributes | {"reused": str(not new_connection).lower()})
+        return response
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response stream that calls `release` once the body is closed (the connection goes back to the pool at that point)"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: t.Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> t.AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Caps concurrent requests (i.e. connections) per host. httpx limits are per pool, not per host."""
+
+    def __init__(self, base: httpx.AsyncBaseTransport, max_connections_per_host: int):
+        self.base_transport = base
+        self.max_connections_per_host = max_connections_per_host
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return semaphore
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore(request.url.host)
+        await semaphore.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        try:
+            response = await self.base_transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Retries idempotent requests on transport errors and retryable statuses with full-jitter exponential backoff"""
+
+    def __init__(
+            self,
+            base: httpx.AsyncBaseTransport,
+            client_name: str,
+            retries: int = 2,
+            backoff_base: float = 0.1,
+            backoff_max: float = 5.0,
+            retry_statuses: t.Iterable[int] = (502, 503, 504),
+        ):
+        self.base_transport = base
+        self.client_name = client_name
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform(0, min(max, base * 2^attempt)) - spreads retries of many callers in time"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT_METHODS:
+            return await self.base_transport.handle_async_request(request)
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.base_transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in self.retry_statuses or attempt >= self.retries:
+                    return response
+                await response.aclose()
+                reason = str(response.status_code)
+
+            delay = self.backoff(attempt)
+            attempt += 1
+            http_client_retries_total.add(1, {"client": self.client_name, "host": request.url.host, "reason": reason})
+            logger.debug(f'[HTTP: {self.client_name}] Retrying {request.method} {request.url.host} ({reason}) in {delay:.3f}s, attempt {attempt}/{self.retries}')
+            await asyncio.sleep(delay)
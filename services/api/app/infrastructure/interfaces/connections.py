@@ -25,6 +25,10 @@ class ConnectionManagerInterface(t.Generic[ConnectionType], ABC):
     async def flush_data(self):
         '''Drops all data'''
 
+    @abstractmethod
+    async def warm_up(self, connections: int) -> None:
+        '''Opens *connections* pooled connections ahead of the first requests'''
+
 
 class SessionManagerInterface(ConnectionManagerInterface[ConnectionType], t.Generic[ConnectionType, SessionType], ABC):
     @abstractmethod
@@ -11,6 +11,13 @@ class RedisMetricActiveUserStorage(iapp.IMetricActiveUsersStorage):
         '''Inserts a user into a ZSET with a timestamp as score'''
         await self.redis.zadd(self.zset_key, {user_id:dt.datetime.now().timestamp()})
 
+    async def register_many(self, user_ids):
+        '''One ZADD for a batch of users'''
+        now = dt.datetime.now().timestamp()
+        mapping = {user_id: now for user_id in user_ids}
+        if mapping:
+            await self.redis.zadd(self.zset_key, mapping)
+
     async def get_active_count(self, timespan_sec: int) -> int:
         '''Returns users that were updated within less than *self.timespan*'''
         now = dt.datetime.now().timestamp()
@@ -19,4 +26,83 @@ class RedisMetricActiveUserStorage(iapp.IMetricActiveUsersStorage):
     async def remove_old(self, timespan_sec: int):
         '''Removes stale records'''
         now = dt.datetime.now().timestamp()
-        await self.redis.zremrangebyscore(self.zset_key,min=0, max=now-timespan_sec)
\ No newline at end of file
+        await self.redis.zremrangebyscore(self.zset_key,min=0, max=now-timespan_sec)
+
+
+class RedisHLLMetricActiveUserStorage(iapp.IMetricActiveUsersStorage):
+    '''
+    Active users counted with HyperLogLogs per time bucket: memory does not depend on the number of users
+    (<=12KB per bucket, ~0.81% standard error).
+    - activity goes into a minute bucket (PFADD), buckets expire on their own after *retention_sec*
+    - completed hours are merged once (PFMERGE) into an hourly roll-up, so a 24h window is
+      PFCOUNT over ~24 roll-ups + up to ~120 minute buckets instead of 1440 keys
+    Windows are aligned to the bucket size.
+    '''
+    def __init__(self, redis: Redis, key_prefix='metrics:active:hll', bucket_sec=60, rollup_sec=3600, retention_sec=25*3600):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.bucket_sec = bucket_sec
+        self.buckets_per_rollup = rollup_sec // bucket_sec
+        self.retention_sec = retention_sec
+
+    def bucket_key(self, bucket: int) -> str:
+        return f'{self.key_prefix}:b:{bucket}'
+
+    def rollup_key(self, rollup: int) -> str:
+        return f'{self.key_prefix}:r:{rollup}'
+
+    async def register_activity(self, user_id):
+        '''Adds a user to the current bucket'''
+        await self.register_many([user_id])
+
+    async def register_many(self, user_ids):
+        '''One PFADD for a batch of users'''
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        key = self.bucket_key(int(dt.datetime.now().timestamp() // self.bucket_sec))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.pfadd(key, *user_ids)
+            pipe.expire(key, self.retention_sec, nx=True)
+            await pipe.execute()
+
+    async def get_active_count(self, timespan_sec: int) -> int:
+        '''Returns the estimated number of users active within the last *timespan_sec*'''
+        now = dt.datetime.now().timestamp()
+        current = int(now // self.bucket_sec)
+        bucket = int((now - timespan_sec) // self.bucket_sec) + 1
+        keys, rollups = [], []
+        while bucket <= current:
+            complete_rollup = bucket % self.buckets_per_rollup == 0 and bucket + self.buckets_per_rollup <= current
+            if complete_rollup:
+                rollups.append(bucket // self.buckets_per_rollup)
+                keys.append(self.rollup_key(bucket // self.buckets_per_rollup))
+                bucket += self.buckets_per_rollup
+            else:
+                keys.append(self.bucket_key(bucket))
+                bucket += 1
+        await self._ensure_rollups(rollups)
+        return await self.redis.pfcount(*keys)
+
+    async def _ensure_rollups(self, rollups: list[int]) -> None:
+        '''Builds missing roll-ups of completed periods (their buckets no longer change). Idempotent across workers.'''
+        if not rollups:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for rollup in rollups:
+                pipe.exists(self.rollup_key(rollup))
+            exists = await pipe.execute()
+        missing = [rollup for rollup, found in zip(rollups, exists) if not found]
+        if not missing:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for rollup in missing:
+                first = rollup * self.buckets_per_rollup
+                sources = [self.bucket_key(b) for b in range(first, first + self.buckets_per_rollup)]
+                pipe.pfmerge(self.rollup_key(rollup), *sources)
+                pipe.expire(self.rollup_key(rollup), self.retention_sec)
+            await pipe.execute()
+
+    async def remove_old(self, timespan_sec: int):
+        '''Nothing to do: buckets and roll-ups expire on their own'''
+        return None
@@ -0,0 +1,41 @@
+-- Compare-and-swap rotation of a session's refresh token hash.
+-- A presented token that does not match the stored hash was rotated already, so it is being reused
+-- (replayed or stolen): the session, and with it every token descended from its login, is revoked.
+-- Returns {1} rotated, {0} no session, {-1, user_id} reuse detected and session revoked,
+-- {-2} the session is a string written by an earlier release (the caller rotates it).
+local session_key = KEYS[1]
+
+local presented = ARGV[1]
+local rotated = ARGV[2]
+local ttl = tonumber(ARGV[3])
+local index_ttl = tonumber(ARGV[4])
+local index_prefix = ARGV[5]
+local session_id = ARGV[6]
+
+local key_type = redis.call('TYPE', session_key)['ok']
+if key_type == 'none' then
+    return {0}
+end
+if key_type ~= 'hash' then
+    return {-2}
+end
+
+local fields = redis.call('HMGET', session_key, 'u', 't')
+local user_id, stored = fields[1], fields[2]
+if not user_id or not stored then
+    redis.call('DEL', session_key)
+    return {0}
+end
+
+-- the index key is derived from the session (standalone Redis: keys need not be declared for slot routing)
+local index_key = index_prefix .. user_id
+if stored ~= presented then
+    redis.call('DEL', session_key)
+    redis.call('SREM', index_key, session_id)
+    return {-1, user_id}
+end
+
+redis.call('HSET', session_key, 't', rotated)
+redis.call('EXPIRE', session_key, ttl)
+redis.call('EXPIRE', index_key, index_ttl)
+return {1}
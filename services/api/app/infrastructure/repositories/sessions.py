@@ -1,25 +1,160 @@
 import app.application.repositories as apprepo
 import app.application.models as m
+import app.infrastructure.cache.codecs as codecs
+from app.common.config import Config
 from redis.asyncio import Redis
+import redis.exceptions as rexc
+import logging, hashlib, hmac, os
 
+logger = logging.getLogger('app')
 
+SESSION_CODEC = codecs.SessionCodec(Config.CACHE_CODEC)
+SESSION_HASH_CODEC = codecs.SessionHashCodec()
 
+#The index must outlive every session it lists: refreshed sessions live REFRESH_TOKEN_EXPIRE_HOURS
+SESSION_INDEX_TTL_SECONDS = Config.REFRESH_TOKEN_EXPIRE_HOURS * 3600
+
+
+SESSION_SCRIPTS_DIRECTORY_PATH = os.path.join(os.path.dirname(__file__), 'scripts')
+with open(os.path.join(SESSION_SCRIPTS_DIRECTORY_PATH, 'session_rotate.lua'), 'r', encoding='utf-8') as f:
+    ROTATE_SCRIPT = f.read()
+ROTATE_SCRIPT_SHA = hashlib.sha1(ROTATE_SCRIPT.encode()).hexdigest() #what SCRIPT LOAD returns
+
+
+async def load_session_scripts(redis: Redis):
+    sha = await redis.script_load(ROTATE_SCRIPT)
+    logger.info(f"[RedisScripts] Loaded session_rotate.lua -> {sha}")
+
+
+def _wrong_type(error: rexc.ResponseError) -> bool:
+    return 'WRONGTYPE' in str(error) #pipelines prefix the message with the failed command
 
 
 class RedisSessionRepository(apprepo.SessionRepository):
-    def __init__(self, redis: Redis):
+    """Sessions as hashes under session:{id}, indexed per user in the set sessions:user:{user_id}.
+
+    The index may hold ids of sessions that expired already: readers skip them and prune the set.
+    Sessions written by earlier releases are strings under the same key; they are still read
+    (SessionCodec) and are replaced by a hash on their next rotation.
+    """
+
+    def __init__(self, redis: Redis, codec: codecs.SessionCodec | None = None, index_ttl: int = SESSION_INDEX_TTL_SECONDS):
         self.redis = redis
+        self.codec = codec or SESSION_CODEC
+        self.hash_codec = SESSION_HASH_CODEC
+        self.index_ttl = index_ttl
 
-    async def create(self, session: m.RotatingTokenSession, ttl:int) -> None:    
-        await self.redis.set(f'session:{session.id}', session.model_dump_json(), ex=ttl)
-        return session
+    @staticmethod
+    def _index_key(user_id: int) -> str:
+        return f'sessions:user:{user_id}'
+
+    async def create(self, session: m.RotatingTokenSession, ttl:int) -> None:
+        key, index = f'session:{session.id}', self._index_key(session.user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key) #a string session of an earlier release
+            pipe.hset(key, mapping=self.hash_codec.encode(session))
+            pipe.expire(key, ttl)
+            pipe.sadd(index, session.id)
+            pipe.expire(index, max(ttl, self.index_ttl))
+            await pipe.execute()
 
     async def delete(self, session_id: str) -> None:
-        await self.redis.delete(f'session:{session_id}')
+        key = f'session:{session_id}'
+        try:
+            user_id = await self.redis.hget(key, self.hash_codec.USER_FIELD)
+        except rexc.ResponseError as e:
+            if not _wrong_type(e):
+                raise
+            user_id = None
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if user_id is not None:
+                pipe.srem(self._index_key(int(user_id)), session_id)
+            await pipe.execute()
 
     async def get_session(self, session_id: str) -> m.RotatingTokenSession | None:
-        sess = await self.redis.get(f'session:{session_id}')
-        return m.RotatingTokenSession.model_validate_json(sess) if sess else None
+        key = f'session:{session_id}'
+        try:
+            fields = await codecs.hgetall_raw(self.redis, key)
+            return self.hash_codec.decode(session_id, fields) if fields else None
+        except rexc.ResponseError as e:
+            if not _wrong_type(e):
+                raise
+            return await self._get_legacy_session(session_id)
+        except codecs.CodecError as e:
+            logger.warning(f'[CACHE: SESSIONS] Unreadable session {session_id}, treated as logged out: {e}')
+            return None
+
+    async def _get_legacy_session(self, session_id: str) -> m.RotatingTokenSession | None:
+        sess = await codecs.get_raw(self.redis, f'session:{session_id}')
+        if not sess:
+            return None
+        try:
+            return self.codec.decode(sess)
+        except codecs.CodecError as e:
+            logger.warning(f'[CACHE: SESSIONS] Unreadable session {session_id}, treated as logged out: {e}')
+            return None
+
+    async def rotate(self, session_id: str, expected_hash: str, new_hash: str, ttl: int) -> m.RotationResult:
+        """One round trip: compare-and-swap of the token hash in session_rotate.lua"""
+        keys = [f'session:{session_id}']
+        args = [
+            self.hash_codec.encode_token_hash(expected_hash), self.hash_codec.encode_token_hash(new_hash),
+            ttl, max(ttl, self.index_ttl), self._index_key(''), session_id,
+        ]
+        try:
+            result = await self.redis.evalsha(ROTATE_SCRIPT_SHA, len(keys), *keys, *args)
+        except rexc.NoScriptError: #Redis restarted or flushed its scripts since the bootstrap loaded them
+            await load_session_scripts(self.redis)
+            result = await self.redis.evalsha(ROTATE_SCRIPT_SHA, len(keys), *keys, *args)
+
+        status = int(result[0])
+        if status == 1:
+            return m.RotationResult.ROTATED
+        if status == -1:
+            logger.warning(f'[CACHE: SESSIONS] Refresh token reuse on session {session_id} of user id={result[1]}, session revoked')
+            return m.RotationResult.REUSED
+        if status == -2:
+            return await self._rotate_legacy(session_id, expected_hash, new_hash, ttl)
+        return m.RotationResult.NOT_FOUND
+
+    async def _rotate_legacy(self, session_id: str, expected_hash: str, new_hash: str, ttl: int) -> m.RotationResult:
+        #string session of an earlier release, rewritten as a hash (not atomic: happens once per such session)
+        session = await self._get_legacy_session(session_id)
+        if session is None:
+            return m.RotationResult.NOT_FOUND
+        if not hmac.compare_digest(session.refresh_token_hash, expected_hash):
+            await self.delete(session_id)
+            return m.RotationResult.REUSED
+        session.refresh_token_hash = new_hash
+        await self.create(session, ttl)
+        return m.RotationResult.ROTATED
 
     async def refresh(self, session_id:str, ttl:int) -> None:
-        await self.redis.expire(f'session:{session_id}', ttl)
\ No newline at end of file
+        await self.redis.expire(f'session:{session_id}', ttl)
+
+    async def list_user_sessions(self, user_id: int) -> list[str]:
+        index = self._index_key(user_id)
+        session_ids = sorted(await self.redis.smembers(index))
+        if not session_ids:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.exists(f'session:{session_id}')
+            alive = await pipe.execute()
+        expired = [session_id for session_id, exists in zip(session_ids, alive) if not exists]
+        if expired:
+            await self.redis.srem(index, *expired)
+        return [session_id for session_id, exists in zip(session_ids, alive) if exists]
+
+    async def delete_user_sessions(self, user_id: int) -> int:
+        index = self._index_key(user_id)
+        session_ids = await self.redis.smembers(index)
+        if not session_ids:
+            return 0
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*(f'session:{session_id}' for session_id in session_ids))
+            pipe.srem(index, *session_ids) #only these: a session created meanwhile stays indexed
+            deleted, _ = await pipe.execute()
+        logger.info(f'[CACHE: SESSIONS] Revoked {deleted} sessions of user id={user_id}')
+        return deleted
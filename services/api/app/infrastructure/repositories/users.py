@@ -6,6 +6,7 @@ import app.domain.services as domsvc
 import app.infrastructure.models as db
 import app.infrastructure.interfaces as iabc
 from app.infrastructure.db import SQLAlchemyUnitOfWork
+import app.infrastructure.cache.codecs as codecs
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel.sql.expression import SelectOfScalar
@@ -13,7 +14,6 @@ import sqlalchemy.exc as sqlexc
 import sqlalchemy.orm.exc as ormexc
 import sqlmodel as sqlm
 import typing as t
-import pydantic as p
 
 from redis.asyncio import Redis
 import json, hashlib
@@ -27,6 +27,8 @@ DEFAULT_ADMIN_PASSWORD = Config.DEFAULT_ADMIN_PASSWORD
 
 logger = logging.getLogger('app')
 
+USER_CODEC = codecs.UserCodec(Config.CACHE_CODEC)
+
 
 class SQLAUserRepository(repo.IUserRepository):
     """Repository implementation for User model using MySQL via SQLAlchemy AsyncSession.
@@ -43,6 +45,11 @@ class SQLAUserRepository(repo.IUserRepository):
         """
         self.session = session
 
+    @staticmethod
+    def _to_domain(user: db.User) -> domain.User:
+        """Converts a row to the domain model without re-validating it (rows are written from validated users)."""
+        return domain.User.from_trusted(user.id, user.username, user.password_hash, user.role, user.status, user.version)
+
     def _handle_integrity_error(self, error: sqlexc.IntegrityError):
         """Handle SQLAlchemy IntegrityError and convert it into a domain exception.
 
@@ -86,7 +93,7 @@ class SQLAUserRepository(repo.IUserRepository):
             User | None: The user object if found, else None.
         """
         user = await self._get_by_id(user_id=user_id)
-        return domain.User.model_validate(user, from_attributes=True) if user is not None else None
+        return self._to_domain(user) if user is not None else None
         
 
     async def get_by_username(self, username: str) -> domain.User | None:
@@ -101,7 +108,7 @@ class SQLAUserRepository(repo.IUserRepository):
         user = (await self.session.scalars(
             sqlm.select(db.User).where(db.User.username == username)
         )).one_or_none()
-        return domain.User.model_validate(user, from_attributes=True) if user is not None else None
+        return self._to_domain(user) if user is not None else None
 
     async def list(self, limit: int = 100, offset: int = 0, filters: schemas.UserFilterSchema = None, filter_mode: t.Literal["and","or"] = "and") -> list[domain.User]:
         """Retrieve all users in the system.
@@ -114,7 +121,7 @@ class SQLAUserRepository(repo.IUserRepository):
             q = self._apply_filters(q, filters, filter_mode)
         q = q.limit(limit).offset(offset)
         users_db = (await self.session.scalars(q)).all()
-        return [domain.User.model_validate(u, from_attributes=True) for u in users_db]
+        return [self._to_domain(u) for u in users_db]
 
 
     async def create(self, user: domain.User) -> domain.User:
@@ -129,7 +136,7 @@ class SQLAUserRepository(repo.IUserRepository):
         try:
             self.session.add(user)
             await self.session.flush()
-            return domain.User.model_validate(user, from_attributes=True)
+            return self._to_domain(user)
         except sqlexc.IntegrityError as e:
             self._handle_integrity_error(e)
 
@@ -160,7 +167,7 @@ class SQLAUserRepository(repo.IUserRepository):
             )
 
         await self.session.refresh(user_to_update)
-        return domain.User.model_validate(user_to_update, from_attributes=True)
+        return self._to_domain(user_to_update)
         
     async def delete(self, user: domain.User):
         """Delete a user from database.
@@ -176,6 +183,15 @@ class SQLAUserRepository(repo.IUserRepository):
         await self.session.execute(sqlm.delete(db.User).where(db.User.id==user.id))
         await self.session.flush()
 
+    async def warm_up(self):
+        """Runs the hot read queries once with values that match nothing.
+        SQLAlchemy caches compiled statements per engine, so the first real requests skip compilation.
+        """
+        await self.get_by_id(-1)
+        await self.get_by_username('')
+        await self.list(limit=1)
+        await self.list(limit=1, filters=schemas.UserFilterSchema(role="admin"))
+
     async def ensure_admin_exists(self, hasher: domsvc.IPasswordHasherAsync):
         admins = await self.list(limit=1, filters=schemas.UserFilterSchema(role="admin"))
         if not admins:
@@ -190,10 +206,11 @@ class SQLAUserRepository(repo.IUserRepository):
     
 
 class RedisCacheUserRepository(repo.IUserRepository):
-    def __init__(self, user_db_repo: repo.IUserRepository, connection: Redis, uow: iabc.IUnitOfWork):
+    def __init__(self, user_db_repo: repo.IUserRepository, connection: Redis, uow: iabc.IUnitOfWork, codec: codecs.UserCodec | None = None):
         self._uow = uow
         self._user_db = user_db_repo
         self._redis = connection
+        self._codec = codec or USER_CODEC
         
 
     async def __clear_userlist_cache(self):
@@ -208,32 +225,37 @@ class RedisCacheUserRepository(repo.IUserRepository):
             
     async def __invalidate_cache(self, user_id: int):
         logger.info(f'[CACHE: USERS] Invalidating cache for user id={user_id}')
-        old = await self._redis.get(f'user:{user_id}')
-        old_user = domain.User.model_validate_json(old) if old else None
-        if old_user:
+        old = await codecs.get_raw(self._redis, f'user:{user_id}')
+        if old:
+            try:
+                old_user = self._codec.decode(old)
+            except codecs.CodecError:
+                old_user = None #username key unknown: it expires with its TTL
             async with self._redis.pipeline() as pipe:
-                pipe.delete(f'user:{old_user.id}')
-                pipe.delete(f'user:username:{old_user.username}')
+                pipe.delete(f'user:{user_id}')
+                if old_user:
+                    pipe.delete(f'user:username:{old_user.username}')
                 await pipe.execute()
             await self.__clear_userlist_cache()
 
     async def __cache(self, user:domain.User):
         async with self._redis.pipeline() as pipe:
             logger.info(f'[CACHE: USERS] Caching user id={user.id}, username={user.username}')
-            pipe.set(f'user:{user.id}', user.model_dump_json(), ex=USER_CACHE_TTL_SECONDS)
-            pipe.set(f'user:username:{user.username}', user.model_dump_json(), ex=USER_CACHE_TTL_SECONDS)
+            encoded = self._codec.encode(user)
+            pipe.set(f'user:{user.id}', encoded, ex=USER_CACHE_TTL_SECONDS)
+            pipe.set(f'user:username:{user.username}', encoded, ex=USER_CACHE_TTL_SECONDS)
             await pipe.execute()
 
 
 
     async def get_by_id(self, user_id: int) -> domain.User | None:
         key = f'user:{user_id}'
-        raw = await self._redis.get(key)
+        raw = await codecs.get_raw(self._redis, key)
         if raw:
             logger.debug(f'[CACHE: USERS] get_by_id => HIT id={user_id}')
             try:
-                return domain.User.model_validate_json(raw)
-            except p.ValidationError:
+                return self._codec.decode(raw)
+            except codecs.CodecError:
                 logger.debug(f'[CACHE: USERS] cache record for user id={user_id} contains corrupt data. Fallback - querying DB')
 
         user = await self._user_db.get_by_id(user_id)
@@ -244,12 +266,12 @@ class RedisCacheUserRepository(repo.IUserRepository):
 
     async def get_by_username(self, username: str) -> domain.User | None:
         key = f'user:username:{username}'
-        raw = await self._redis.get(key)
+        raw = await codecs.get_raw(self._redis, key)
         if raw:
             logger.debug(f'[CACHE: USERS] get_by_username => HIT username={username}')
             try:
-                return domain.User.model_validate_json(raw)
-            except p.ValidationError:
+                return self._codec.decode(raw)
+            except codecs.CodecError:
                 logger.debug(f'[CACHE: USERS] cache record for username={username} contains corrupt data. Fallback - querying DB')
 
         user = await self._user_db.get_by_username(username)
@@ -265,17 +287,16 @@ class RedisCacheUserRepository(repo.IUserRepository):
         full_hash = hashlib.sha256((pagination + filters_json).encode()).hexdigest()
         key = f'users:list:{full_hash}'
 
-        raw = await self._redis.get(key)
+        raw = await codecs.get_raw(self._redis, key)
         if raw:
             logger.debug(f'[CACHE: USERS] list => HIT {key}')
             try:
-                data = json.loads(raw)
-                return [domain.User.model_validate(item) for item in data]
-            except Exception:
+                return self._codec.decode_many(raw)
+            except codecs.CodecError:
                 logger.debug(f'[CACHE: USERS] cache record for user_list hash={full_hash} contains corrupt data. Fallback - querying DB')
         users = await self._user_db.list(limit=limit, offset=offset, filters=filters, filter_mode=filter_mode)
         logger.debug(f'[CACHE: USERS] list => MISS {key} - priming')
-        await self._redis.set(key, json.dumps([u.model_dump() for u in users]), ex=USER_CACHE_TTL_SECONDS)
+        await self._redis.set(key, self._codec.encode_many(users), ex=USER_CACHE_TTL_SECONDS)
         return users
     
     async def create(self, user: domain.User) -> domain.User:
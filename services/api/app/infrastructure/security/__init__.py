@@ -1,2 +1,3 @@
 from .auth_strategies import *
-from .passwords import *
\ No newline at end of file
+from .passwords import *
+from .refresh_tokens import *
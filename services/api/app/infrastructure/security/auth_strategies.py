@@ -10,6 +10,7 @@ import app.domain.services as domsvc
 
 
 from app.infrastructure.telemetry.traces import TracerType
+from app.infrastructure.security.refresh_tokens import hash_refresh_token
 from app.common.config import Config
 from app.presentation.schemas import TokenResponse
 
@@ -108,7 +109,7 @@ class StatefulOAuthStrategy(iapp.IAuthStrategy, iapp.ITokenMixin, iapp.IPassword
             id = session_id,
             user_id = user.id,
             roles = [user.role],
-            refresh_token=tokens.refresh_token
+            refresh_token_hash=hash_refresh_token(tokens.refresh_token)
         )
         await self.session_repo.create(session, ttl=self.access_expires_mins * 60)
         return tokens
@@ -119,6 +120,16 @@ class StatefulOAuthStrategy(iapp.IAuthStrategy, iapp.ITokenMixin, iapp.IPassword
             raise appexc.CredentialsException("Token is missing. Please provide a valid access token for this operation.")
         data = self.__exctract_token_data(token=token)
         await self.session_repo.delete(data["session_id"])
+
+    async def logout_everywhere(self, credentials: dict) -> int:
+        token = credentials.get('token')
+        if not token:
+            raise appexc.CredentialsException("Token is missing. Please provide a valid access token for this operation.")
+        data = self.__exctract_token_data(token=token)
+        session = await self.session_repo.get_session(data["session_id"])
+        if not session:
+            raise appexc.LoggedOutException("Token is valid, yet session does not exist!")
+        return await self.session_repo.delete_user_sessions(session.user_id)
     
     async def authenticate(self, credentials: dict) -> mdom.User:
         token = credentials.get('token')
@@ -137,19 +148,17 @@ class StatefulOAuthStrategy(iapp.IAuthStrategy, iapp.ITokenMixin, iapp.IPassword
         
     async def refresh(self, refresh_token: str) -> TokenResponse:
         data = self.__exctract_token_data(token=refresh_token, refresh=True)
-        session: mapp.RotatingTokenSession = await self.session_repo.get_session(data["session_id"])
-        if not session:
+        session_id = data["session_id"]
+        tokens = self.__create_a_pair_of_tokens(dict(session_id=session_id))
+        #compare and swap in one atomic step: of two concurrent refreshes with the same token only one wins
+        result = await self.session_repo.rotate(
+            session_id,
+            expected_hash=hash_refresh_token(refresh_token),
+            new_hash=hash_refresh_token(tokens.refresh_token),
+            ttl=self.refresh_expires_hours * 3600,
+        )
+        if result == mapp.RotationResult.NOT_FOUND:
             raise appexc.LoggedOutException("Token is valid, yet session does not exist!")
-        
-        if session.refresh_token != refresh_token:
-            raise appexc.TokenExpiredException("This token has been rotated already - it not valid anymore!")
-
-        tokens = self.__create_a_pair_of_tokens(dict(session_id=session.id))
-        session.refresh_token = tokens.refresh_token
-        await self.session_repo.create(session, self.refresh_expires_hours * 3600)
+        if result == mapp.RotationResult.REUSED:
+            raise appexc.TokenExpiredException("This token has been rotated already - it is not valid anymore! The session has been revoked, please log in again.")
         return tokens
-        
-
-
-
-        
\ No newline at end of file
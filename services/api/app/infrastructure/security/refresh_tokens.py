@@ -0,0 +1,9 @@
+"""Refresh tokens are never stored: sessions keep the sha256 of the current one,
+and rotation compares and swaps hashes (session_rotate.lua)."""
+import hashlib
+
+__all__ = ['hash_refresh_token']
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
@@ -1,43 +1,89 @@
 from opentelemetry import trace as otel_trace, metrics as otel_metrics
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.logging import LoggingInstrumentor
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider, SpanProcessor
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
-import os
+import os, logging
 from app.common.config import Config
 
+#Exporters, readers, instrumentors and the SDK (grpc, protobuf, prometheus: ~400ms together) are imported
+#inside setup_opentelemetry, and only the ones the config enables: importing this package stays cheap
+#for processes that never export (tests, celery, scripts).
 
+#Flush/close callbacks of what setup_opentelemetry started, run in reverse order on shutdown
+_shutdown_hooks: list = []
 
 
 def setup_opentelemetry(app):
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.metrics import MeterProvider, TraceBasedExemplarFilter
+
     resource = Resource.create({
         "service.name": Config.OTEL_SERVICE_NAME,
         "process.pid": os.getpid(),
         "service.instance.id": f"worker-{os.getpid()}",
         })
 
-    metric_exporter = OTLPMetricExporter(endpoint=Config.OTEL_GRPC_HOST, insecure=True)
+    if Config.METRICS_EXPORT == 'prometheus':
+        #pulled from :METRICS_PORT, aggregated across workers (no per-pid series); OpenMetrics scrapes get exemplars
+        from app.infrastructure.telemetry.prometheus import ExemplarPrometheusMetricReader
+        import app.common.libs.prom_multiproc as prom_mp
+        reader = ExemplarPrometheusMetricReader(disable_target_info=True)
+        dumper = prom_mp.start_worker_exporter(Config.METRICS_PORT, Config.METRICS_DUMP_INTERVAL_SECONDS)
+    else:
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        dumper = None
+        metric_exporter = OTLPMetricExporter(endpoint=Config.OTEL_GRPC_HOST, insecure=True)
+        reader = PeriodicExportingMetricReader(
+            exporter=metric_exporter, 
+            export_interval_millis=15000
+        )
+
+    #exemplars: measurements made inside a sampled span carry its trace id (OTLP, and OpenMetrics on the Prometheus path)
+    meter = MeterProvider(resource=resource, metric_readers=[reader], exemplar_filter=TraceBasedExemplarFilter())
+    otel_metrics.set_meter_provider(meter)
+    _shutdown_hooks.append(lambda timeout_millis: meter.shutdown(timeout_millis=timeout_millis)) #last export of the OTLP reader
+    if dumper is not None:
+        _shutdown_hooks.append(lambda timeout_millis: dumper.stop()) #final dump while the reader still collects
+
+    if not Config.TRACING_ENABLED: #no provider: every tracer stays a no-op proxy
+        return
+
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.logging import LoggingInstrumentor
+    from opentelemetry.sdk.trace import TracerProvider
+    import app.infrastructure.telemetry.traces.sampling as sampling
+
     span_exporter = OTLPSpanExporter(endpoint=Config.OTEL_GRPC_HOST, insecure=True)
-    default_span_processor = BatchSpanProcessor(span_exporter)
-    
-    reader = PeriodicExportingMetricReader(
-        exporter=metric_exporter, 
-        export_interval_millis=15000
+    default_span_processor = sampling.CountingBatchSpanProcessor(
+        span_exporter,
+        max_queue_size=Config.TRACES_BSP_MAX_QUEUE_SIZE,
+        max_export_batch_size=Config.TRACES_BSP_MAX_EXPORT_BATCH_SIZE,
+        schedule_delay_millis=Config.TRACES_BSP_SCHEDULE_DELAY_MILLIS,
     )
+    if Config.TRACES_TAIL_SAMPLING_ENABLED:
+        default_span_processor = sampling.TailSamplingSpanProcessor(
+            default_span_processor,
+            keep_ratio=Config.TRACES_TAIL_KEEP_RATIO,
+            slow_ms=Config.TRACES_TAIL_SLOW_MS,
+            max_traces=Config.TRACES_TAIL_MAX_TRACES,
+        )
 
-    tracer = TracerProvider(resource=resource)
-    meter = MeterProvider(resource=resource, metric_readers=[reader])
-    otel_metrics.set_meter_provider(meter)
+    tracer = TracerProvider(resource=resource, sampler=sampling.build_sampler(Config.TRACES_SAMPLER_RATIO))
     otel_trace.set_tracer_provider(tracer)
-
     tracer.add_span_processor(default_span_processor)
+    def _shutdown_tracing(timeout_millis):
+        tracer.force_flush(timeout_millis) #spans still queued in the batch processor
+        tracer.shutdown()
+    _shutdown_hooks.append(_shutdown_tracing)
 
     FastAPIInstrumentor.instrument_app(app, exclude_spans=['receive', 'send'])
     LoggingInstrumentor().instrument(set_logging_format=False)
 
-    
+
+def shutdown_opentelemetry(timeout_millis: float = 5000) -> None:
+    """Flushes spans and metrics that are not exported yet and stops the exporters. Blocking: run it in a thread"""
+    while _shutdown_hooks:
+        hook = _shutdown_hooks.pop()
+        try:
+            hook(timeout_millis)
+        except Exception:
+            logging.getLogger('app').exception('[OTEL] Failed to flush telemetry on shutdown')
@@ -1,8 +1,17 @@
-import logging, sys
-import os, pathlib
+import logging, sys, json, time
+import os, pathlib, copy, queue, atexit
+from logging.handlers import QueueHandler, QueueListener
 from pythonjsonlogger.json import JsonFormatter
 from app.common.config import Config
-from opentelemetry import trace
+from opentelemetry import trace, metrics
+import orjson
+
+meter = metrics.get_meter("app.metrics")
+
+logs_dropped_total = meter.create_counter(
+    "logs_dropped_total",
+    description="Log records dropped because the log queue was full",
+)
 
 class CustomJsonFormatter(JsonFormatter):
     def add_fields(self, log_record, record, message_dict):
@@ -24,22 +33,167 @@ class OTLPJsonFormatter(CustomJsonFormatter):
 
     def add_fields(self, log_record, record, message_dict):
         super().add_fields(log_record, record, message_dict)
+        if 'trace_id' in log_record: #captured on the emitting thread by BoundedQueueHandler
+            return
         span = self._trace_provider.get_current_span()
         if span.get_span_context().is_valid:
             log_record['trace_id'] = format(span.get_span_context().trace_id, '032x')
             log_record['span_id'] = format(span.get_span_context().span_id, '016x')
             
 
+
+#Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'trace_id', 'span_id'}
+
+def _dumps_stdlib(obj: dict) -> str:
+    return json.dumps(obj, default=str, ensure_ascii=False)
+
+def _dumps_orjson(obj: dict) -> str:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode() #non-str keys are coerced like in stdlib json
+
+_process_fields = {}
+
+def _refresh_process_fields():
+    _process_fields.update(pid=os.getpid(), service=Config.APP_NAME, env=Config.MODE)
+
+_refresh_process_fields()
+os.register_at_fork(after_in_child=_refresh_process_fields) #gunicorn/celery workers get their own pid
+
+
+class FastJsonFormatter(logging.Formatter):
+    """JSON formatter without pythonjsonlogger's per-record overhead.
+    - static fields (pid, service, env) are computed once per process (pid is refreshed after fork)
+    - asctime is rendered once per second, only the milliseconds change in between
+    - serialized with orjson (~5x faster dumps than stdlib json; use_orjson=False keeps stdlib for comparison)
+    - dict messages are merged into the fields without a stringified copy in `message`
+    - compact=True keeps only level/logger/message (+ trace ids and extras),
+      dropping asctime and the static fields that the log shipper's labels/timestamps already carry
+    For string messages the output keys match OTLPJsonFormatter (plus asctime), so existing log queries keep working;
+    dict messages (access logs) have no `message` key.
+    """
+
+    def __init__(self, compact: bool = False, trace_provider=None, use_orjson: bool = True):
+        super().__init__()
+        self.compact = compact
+        self._trace_provider = trace_provider or trace
+        self._dumps = _dumps_orjson if use_orjson else _dumps_stdlib
+        self._second = None
+        self._second_str = ''
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._second_str = time.strftime("%Y-%m-%d %H:%M:%S", self.converter(second))
+        return f"{self._second_str},{int(record.msecs):03d}"
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_record = {'level': record.levelname, 'logger': record.name}
+        if not self.compact:
+            log_record['asctime'] = self.formatTime(record)
+
+        msg = record.msg
+        if isinstance(msg, dict):
+            log_record.update(msg)
+        else:
+            log_record['message'] = msg if (not record.args and isinstance(msg, str)) else record.getMessage()
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                log_record[key] = value
+
+        trace_id = getattr(record, 'trace_id', None) #captured on the emitting thread by BoundedQueueHandler
+        if trace_id is not None:
+            log_record['trace_id'] = trace_id
+            log_record['span_id'] = record.span_id
+        else:
+            ctx = self._trace_provider.get_current_span().get_span_context()
+            if ctx.is_valid:
+                log_record['trace_id'] = ctx.trace_id.to_bytes(16, 'big').hex()
+                log_record['span_id'] = ctx.span_id.to_bytes(8, 'big').hex()
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_record['exc_info'] = record.exc_text
+        if record.stack_info:
+            log_record['stack_info'] = self.formatStack(record.stack_info)
+
+        if not self.compact:
+            log_record.update(_process_fields)
+        return self._dumps(log_record)
+
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records over to a QueueListener thread, which does formatting and the blocking write.
+    - block=False: a full queue drops the record (counted in logs_dropped_total), the caller never waits
+    - block=True: a full queue blocks the caller (backpressure) instead of losing records
+    """
+
+    def __init__(self, log_queue: queue.Queue, block: bool = False):
+        super().__init__(log_queue)
+        self.block = block
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        #Only what must happen on the emitting thread: freeze the message and capture the current span.
+        #Formatting (JSON, exc_info) stays on the listener thread.
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict): #dict messages are merged into JSON fields by the formatter
+            record.msg = record.getMessage()
+            record.args = None
+        ctx = trace.get_current_span().get_span_context()
+        if ctx.is_valid:
+            record.trace_id = format(ctx.trace_id, '032x')
+            record.span_id = format(ctx.span_id, '016x')
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logs_dropped_total.add(1, {"logger": record.name, "level": record.levelname})
+
+
+_listeners: dict[str, QueueListener] = {}
+
+def shutdown_loggers():
+    """Stops queue listeners: flushes every queued record to the underlying handlers.
+    Loggers are switched to writing synchronously, so records emitted after this point are not lost.
+    """
+    while _listeners:
+        name, listener = _listeners.popitem()
+        listener.stop()
+        logger = logging.getLogger(name)
+        for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+            logger.removeHandler(handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+
+atexit.register(shutdown_loggers)
+
        
 current_dir = pathlib.Path(__file__).parent
 
-def configure_logger(name: str, stream=sys.stdout):
+def configure_logger(name: str, stream=sys.stdout, queued: bool = False):
+    """Configures a logger writing to a stream.
+    With queued=True the logger only enqueues records (BoundedQueueHandler) and a QueueListener thread
+    formats and writes them, so slow stdout (promtail backpressure) never stalls the event loop.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
+    if name in _listeners:
+        _listeners.pop(name).stop()
     logger.handlers.clear()
     stream_handler = logging.StreamHandler(stream)
 
-    if Config.JSON_LOGS == 1:
+    if Config.JSON_LOGS == 1 and Config.LOG_JSON_FORMATTER == 'fast':
+        formatter = FastJsonFormatter(compact=Config.LOG_COMPACT)
+    elif Config.JSON_LOGS == 1:
         formatter = OTLPJsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s")
     else:
         formatter = logging.Formatter(
@@ -48,13 +202,21 @@ def configure_logger(name: str, stream=sys.stdout):
         )
 
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+
+    if queued:
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(BoundedQueueHandler(log_queue, block=Config.LOG_QUEUE_POLICY == 'block'))
+    else:
+        logger.addHandler(stream_handler)
 
     return logger
 
 def init_loggers():
     """Use this func to add or edit list of used loggers"""
-    applogger = configure_logger('app')                      
+    applogger = configure_logger('app', queued=Config.LOG_QUEUE_ENABLED)
     logging.getLogger("uvicorn.access").handlers = []
     logging.getLogger("uvicorn.access").propagate = False
 
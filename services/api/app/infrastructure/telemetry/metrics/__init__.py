@@ -1,9 +1,18 @@
 from .active_users import *
-from .on_http_request import requests_metric_middleware, AUTH_PATH
+from .on_http_request import AUTH_PATH
+from app.common.config import Config
+import app.application.dependencies as adep
+import app.common.libs.rqueue.queue as rqueue
+from app.common.libs.rqueue.leader import LeaderElection
 
 
-async def create_async_metrics_refresh_tasks():
-    asyncio.create_task(refresh_active_users_task())
-
-def register_middlewares(app):
-    app.middleware("http")(requests_metric_middleware)
\ No newline at end of file
+async def create_async_metrics_refresh_tasks(queue_mgr: rqueue.RedisQueueManager) -> list[asyncio.Task]:
+    """Starts the metric background tasks. Cancel the returned tasks on shutdown (the leader releases its lease)."""
+    leader = LeaderElection(queue_mgr, 'metrics:active_users', lease_seconds=Config.LEADER_LEASE_SECONDS)
+    tasks = [
+        asyncio.create_task(leader.run_periodic(publish_active_users_snapshot, ACTIVE_USERS_REFRESH_SECONDS)),
+        asyncio.create_task(refresh_active_users_task()),
+    ]
+    if adep.ActivityDebouncer is not None:
+        tasks.append(asyncio.create_task(flush_activity_task(Config.ACTIVE_USERS_FLUSH_INTERVAL_SECONDS)))
+    return tasks
@@ -1,5 +1,5 @@
 from opentelemetry import metrics
-import asyncio, typing as t, logging, datetime as dt
+import asyncio, typing as t, logging, datetime as dt, json
 import app.infrastructure.dependencies as idep
 import app.application.dependencies as adep
 
@@ -14,15 +14,57 @@ async def fetch_active_users_metric(timespan: dt.timedelta | int, cleanup: bool
         return count
 
 
+async def flush_activity() -> int:
+    """Writes the users queued by the activity debouncer in one batch"""
+    async with idep.CacheManager.connect() as conn:
+        repo = await idep.get_metric_active_users_repo(conn)
+        service = await adep.get_metric_active_users_service(repo)
+        return await service.flush()
+
+async def flush_activity_task(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_activity()
+        except Exception:
+            logger.exception('[METRICS: ACTIVE USERS] Failed to flush activity batch')
+
+
+#Computed by the leader (one process in the cluster), read by every worker's gauges
+ACTIVE_USERS_SNAPSHOT_KEY = 'metrics:active_users:snapshot'
+ACTIVE_USERS_REFRESH_SECONDS = 30
+
+async def publish_active_users_snapshot():
+    """Leader job: counts active users (and cleans the storage) once for the whole cluster"""
+    snapshot = {
+        'lasthour': await fetch_active_users_metric(timespan=dt.timedelta(hours=1)),
+        'daily': await fetch_active_users_metric(timespan=dt.timedelta(hours=24), cleanup=True),
+    }
+    async with idep.CacheManager.connect() as conn:
+        await conn.set(ACTIVE_USERS_SNAPSHOT_KEY, json.dumps(snapshot), ex=ACTIVE_USERS_REFRESH_SECONDS * 4)
+    return snapshot
+
+
 _active_users_lasthour = 0
 _active_users_daily = 0
 
-async def refresh_active_users_task():
+async def read_active_users_snapshot():
     global _active_users_lasthour, _active_users_daily
+    async with idep.CacheManager.connect() as conn:
+        raw = await conn.get(ACTIVE_USERS_SNAPSHOT_KEY)
+    if raw:
+        snapshot = json.loads(raw)
+        _active_users_lasthour = snapshot['lasthour']
+        _active_users_daily = snapshot['daily']
+
+async def refresh_active_users_task():
+    """Every worker: one GET of the leader's snapshot per refresh"""
     while True:
-        _active_users_lasthour = await fetch_active_users_metric(timespan=dt.timedelta(hours=1))
-        _active_users_daily = await fetch_active_users_metric(timespan=dt.timedelta(hours=24), cleanup=True)
-        await asyncio.sleep(30)
+        try:
+            await read_active_users_snapshot()
+        except Exception as e:
+            logger.warning(f'[METRICS: ACTIVE USERS] Failed to read snapshot: {e}')
+        await asyncio.sleep(ACTIVE_USERS_REFRESH_SECONDS)
 
 
 
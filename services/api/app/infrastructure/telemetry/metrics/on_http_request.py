@@ -1,6 +1,4 @@
 from opentelemetry import metrics
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.infrastructure.telemetry.traces import TracerType
 
 
 meter = metrics.get_meter("app.metrics")
@@ -12,27 +10,39 @@ http_requests_total = meter.create_counter(
     description="Total HTTP requests",
 )
 
+http_requests_in_flight = meter.create_up_down_counter(
+    "http_requests_in_flight",
+    description="HTTP requests currently being processed",
+)
+
 auth_logins_total = meter.create_counter(
     "auth_logins_total",
     description="Number of login attempts",
 )
 
 
+#Auth API: most requests are cache hits (ms), login/refresh are dominated by bcrypt (~0.2-0.3s)
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 2.5, 5.0]
+
+http_request_duration_seconds = meter.create_histogram(
+    "http_request_duration_seconds",
+    description="HTTP request latency by route template, method and status class",
+    explicit_bucket_boundaries_advisory=LATENCY_BUCKETS,
+)
 
-async def requests_metric_middleware(request, call_next):
-    response = await call_next(request)
-     
-    route_path = getattr(request.scope.get("route"), "path", request.url.path)
-    http_requests_total.add(
-        1,
-        {
-            "http_method": request.method,
-            "http_target": route_path,
-            "status_code": str(response.status_code),
-        },
-    )
-    if route_path == AUTH_PATH:
-        status = "success" if response.status_code == 200 else "failure"
-        auth_logins_total.add(1, {"status": status})
-
-    return response
\ No newline at end of file
+#Time spent per request in each dependency, recorded only for requests that used it
+http_request_redis_seconds = meter.create_histogram(
+    "http_request_redis_seconds",
+    description="Time spent in Redis commands per request",
+    explicit_bucket_boundaries_advisory=LATENCY_BUCKETS,
+)
+http_request_db_seconds = meter.create_histogram(
+    "http_request_db_seconds",
+    description="Time spent in SQL statements per request",
+    explicit_bucket_boundaries_advisory=LATENCY_BUCKETS,
+)
+http_request_bcrypt_seconds = meter.create_histogram(
+    "http_request_bcrypt_seconds",
+    description="Time spent hashing/verifying passwords per request",
+    explicit_bucket_boundaries_advisory=LATENCY_BUCKETS,
+)
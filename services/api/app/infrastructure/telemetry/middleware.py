@@ -0,0 +1,152 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from dataclasses import dataclass, field
+from app.common.config import Config
+from app.common.libs.drain import DrainCoordinator
+import app.infrastructure.telemetry.metrics.on_http_request as m
+import app.infrastructure.telemetry.timing as timing
+import logging, traceback, random, time
+
+logger = logging.getLogger('app')
+
+
+@dataclass
+class AccessLogPolicy:
+    """Decides which requests get an access log line.
+    - unhandled exceptions and 5xx are always logged (ERROR), even for excluded paths
+    - requests slower than slow_request_ms are always logged (WARNING)
+    - excluded paths (health probes, metrics scrapes) are not logged otherwise
+    - everything else is logged (INFO) with the route's sample rate, falling back to sample_rate
+    Paths are matched against the route template ('/users/{user_id}') and the path without root_path.
+    """
+    sample_rate: float = 1.0
+    route_sample_rates: dict[str, float] = field(default_factory=dict)
+    exclude_paths: frozenset[str] = frozenset()
+    slow_request_ms: float | None = None
+
+    @classmethod
+    def from_config(cls) -> 'AccessLogPolicy':
+        return cls(
+            sample_rate=Config.ACCESS_LOG_SAMPLE_RATE,
+            route_sample_rates=dict(Config.ACCESS_LOG_ROUTE_SAMPLE_RATES),
+            exclude_paths=frozenset(Config.ACCESS_LOG_EXCLUDE_PATHS),
+            slow_request_ms=Config.ACCESS_LOG_SLOW_REQUEST_MS,
+        )
+
+    def level_for(self, scope: Scope, status_code: int | None, duration_ms: float) -> int | None:
+        """Returns the level to log the request with, None to skip it"""
+        if status_code is None or status_code >= 500:
+            return logging.ERROR
+        if self.slow_request_ms is not None and duration_ms >= self.slow_request_ms:
+            return logging.WARNING
+        route_path = getattr(scope.get("route"), "path", None)
+        path = scope['path'].removeprefix(scope.get('root_path', ''))
+        if route_path in self.exclude_paths or path in self.exclude_paths:
+            return None
+        rate = self.route_sample_rates.get(route_path or path, self.sample_rate)
+        if rate >= 1.0 or random.random() < rate:
+            return logging.INFO
+        return None
+
+
+class TelemetryMiddleware:
+    """Pure ASGI middleware: access logging, request counting, in-flight tracking and login outcomes in one pass.
+    Replaces two BaseHTTPMiddleware layers (no extra task / stream wrapping per request, streaming responses stay intact).
+    Unhandled exceptions are logged and turned into a 500 response if the response has not started yet.
+    Which requests get an access log line is decided by AccessLogPolicy (metrics still count every request).
+    In-flight requests are reported to the DrainCoordinator, if given, which graceful shutdown waits on.
+    """
+
+    def __init__(self, app: ASGIApp, policy: AccessLogPolicy | None = None, drain: DrainCoordinator | None = None):
+        self.app = app
+        self.policy = policy or AccessLogPolicy.from_config()
+        self.drain = drain
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        if self.drain is not None:
+            self.drain.request_started()
+        m.http_requests_in_flight.add(1)
+        timings_token = timing.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.error({
+                "method": scope['method'],
+                "path": scope['path'],
+                "status": "exception",
+                "client": scope['client'][0] if scope.get('client') else None,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "exc_info": traceback.format_exc()
+            })
+            if status_code is not None: #response already started - nothing we can send anymore
+                raise
+            status_code = 500
+            response = JSONResponse(
+                status_code=500,
+                content={'successful':False,'detail':'Необработанная ошибка'}
+            )
+            await response(scope, receive, send)
+        else:
+            duration_ms = (time.perf_counter() - start) * 1000
+            level = self.policy.level_for(scope, status_code, duration_ms)
+            if level is not None:
+                logger.log(level, {
+                    "method": scope['method'],
+                    "path": scope['path'],
+                    "status": status_code,
+                    "client": scope['client'][0] if scope.get('client') else None,
+                    "duration_ms": round(duration_ms, 2),
+                })
+        finally:
+            duration = time.perf_counter() - start
+            timings = timing.finish(timings_token)
+            m.http_requests_in_flight.add(-1)
+            if status_code is not None:
+                self.record_request(scope, status_code, duration, timings)
+            if self.drain is not None:
+                await self.drain.request_finished()
+
+    @staticmethod
+    def record_request(scope: Scope, status_code: int, duration: float | None = None, timings: dict[str, float] | None = None) -> None:
+        """Recorded inside the server span (FastAPIInstrumentor wraps the whole stack),
+        so sampled requests leave trace-id exemplars on the latency histograms.
+        """
+        route_path = getattr(scope.get("route"), "path", scope['path'])
+        m.http_requests_total.add(
+            1,
+            {
+                "http_method": scope['method'],
+                "http_target": route_path,
+                "status_code": str(status_code),
+            },
+        )
+        if route_path == m.AUTH_PATH:
+            status = "success" if status_code == 200 else "failure"
+            m.auth_logins_total.add(1, {"status": status})
+        if duration is None:
+            return
+        #unmatched paths share one label value: raw paths would be unbounded cardinality
+        route = getattr(scope.get("route"), "path", "unmatched")
+        m.http_request_duration_seconds.record(duration, {
+            "http_route": route,
+            "http_method": scope['method'],
+            "status_class": f"{status_code // 100}xx",
+        })
+        attributes = {"http_route": route, "http_method": scope['method']}
+        for component, histogram in ((timing.REDIS, m.http_request_redis_seconds),
+                                     (timing.DB, m.http_request_db_seconds),
+                                     (timing.BCRYPT, m.http_request_bcrypt_seconds)):
+            if timings and component in timings:
+                histogram.record(timings[component], attributes)
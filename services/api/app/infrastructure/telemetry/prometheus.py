@@ -0,0 +1,104 @@
+"""PrometheusMetricReader with histogram exemplars.
+
+The OTEL Prometheus exporter drops exemplars when it translates to prometheus_client families.
+ExemplarPrometheusMetricReader keeps the latest exemplar (trace id/span id of a sampled request)
+per histogram bucket and attaches it to the `_bucket` sample. OpenMetrics exposition carries it
+(`... # {trace_id="..."} value timestamp`); the plain text format ignores it.
+Imported by setup_opentelemetry only when METRICS_EXPORT=prometheus.
+"""
+from opentelemetry.exporter.prometheus import PrometheusMetricReader
+from opentelemetry.sdk.metrics.export import MetricsData, Histogram
+from prometheus_client import REGISTRY
+from prometheus_client.samples import Exemplar
+import json, math, re, threading, typing as t
+
+__all__ = ['ExemplarPrometheusMetricReader']
+
+#(instrument name, labels without `le`, bucket upper bound) -> latest exemplar of that bucket
+ExemplarKey = tuple[str, tuple[tuple[str, str], ...], float]
+
+
+def _label_name(key: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', key)
+
+def _label_value(value: t.Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str) #as the exporter renders them
+
+
+class _ExemplarCollector:
+    """Wraps the exporter's collector: same families, with exemplars on bucket samples"""
+
+    def __init__(self, collector, reader: 'ExemplarPrometheusMetricReader'):
+        self.collector = collector
+        self.reader = reader
+
+    def describe(self):
+        return [] #registering must not collect: the reader is not attached to a MeterProvider yet
+
+    def collect(self):
+        for family in self.collector.collect():
+            if family.type == 'histogram':
+                self.reader.attach_exemplars(family)
+            yield family
+
+
+class ExemplarPrometheusMetricReader(PrometheusMetricReader):
+    def __init__(self, disable_target_info: bool = False) -> None:
+        super().__init__(disable_target_info=disable_target_info)
+        self._exemplars: dict[ExemplarKey, Exemplar] = {}
+        self._exemplars_lock = threading.Lock()
+        #the exporter registers its collector as _collector (opentelemetry-exporter-prometheus is pinned to 0.58.x,
+        #test_prometheus fails if that changes): serve it through the wrapper instead
+        self._exemplar_collector = _ExemplarCollector(self._collector, self)
+        REGISTRY.unregister(self._collector)
+        REGISTRY.register(self._exemplar_collector)
+
+    def _receive_metrics(self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs) -> None:
+        if metrics_data is not None:
+            self._keep_exemplars(metrics_data)
+        super()._receive_metrics(metrics_data, timeout_millis=timeout_millis, **kwargs)
+
+    def _keep_exemplars(self, metrics_data: MetricsData) -> None:
+        latest = {}
+        for resource_metrics in metrics_data.resource_metrics:
+            for scope_metrics in resource_metrics.scope_metrics:
+                for metric in scope_metrics.metrics:
+                    if not isinstance(metric.data, Histogram):
+                        continue
+                    for point in metric.data.data_points:
+                        if not point.exemplars:
+                            continue
+                        labels = tuple(sorted((_label_name(k), _label_value(v)) for k, v in point.attributes.items()))
+                        for exemplar in point.exemplars:
+                            if not exemplar.trace_id:
+                                continue
+                            #OTEL buckets are (previous bound, bound]: the first bound >= value is the bucket's `le`
+                            le = next((bound for bound in point.explicit_bounds if exemplar.value <= bound), math.inf)
+                            latest[(metric.name, labels, float(le))] = Exemplar(
+                                labels={
+                                    'trace_id': format(exemplar.trace_id, '032x'),
+                                    'span_id': format(exemplar.span_id or 0, '016x'),
+                                },
+                                value=exemplar.value,
+                                timestamp=exemplar.time_unix_nano / 1e9,
+                            )
+        if latest:
+            with self._exemplars_lock:
+                self._exemplars.update(latest)
+
+    def attach_exemplars(self, family) -> None:
+        #the exporter appends the unit to the family name when the instrument has one
+        name = family.name[:-len(family.unit) - 1] if family.unit and family.name.endswith(f'_{family.unit}') else family.name
+        with self._exemplars_lock:
+            if not self._exemplars:
+                return
+            for i, sample in enumerate(family.samples):
+                if not sample.name.endswith('_bucket'):
+                    continue
+                labels = tuple(sorted((k, v) for k, v in sample.labels.items() if k != 'le'))
+                exemplar = self._exemplars.get((name, labels, float(sample.labels['le'])))
+                if exemplar is not None:
+                    family.samples[i] = sample._replace(exemplar=exemplar)
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        REGISTRY.unregister(self._exemplar_collector)
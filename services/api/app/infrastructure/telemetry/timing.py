@@ -0,0 +1,77 @@
+"""Per-request time spent in dependencies (redis, db, bcrypt).
+
+TelemetryMiddleware opens an accumulator for each request; Redis commands, SQL statements and
+password hashing add their durations to it. The dict lives in a ContextVar, so tasks spawned by
+the request (asyncio.gather, to_thread, SQLAlchemy's greenlets) add to the same accumulator.
+Outside of a request nothing is recorded.
+"""
+from contextvars import ContextVar, Token
+import contextlib, time, typing as t
+import wrapt
+
+REDIS = 'redis'
+DB = 'db'
+BCRYPT = 'bcrypt'
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar('request_timings', default=None)
+
+
+def start() -> Token:
+    return _timings.set({})
+
+def finish(token: Token) -> dict[str, float]:
+    timings = _timings.get() or {}
+    _timings.reset(token)
+    return timings
+
+def add(component: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+@contextlib.contextmanager
+def timed(component: str) -> t.Iterator[None]:
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(component, time.perf_counter() - start_time)
+
+
+async def _timed_redis_call(wrapped, instance, args, kwargs):
+    start_time = time.perf_counter()
+    try:
+        return await wrapped(*args, **kwargs)
+    finally:
+        add(REDIS, time.perf_counter() - start_time)
+
+_redis_instrumented = False
+
+def instrument_redis() -> None:
+    """Wraps redis.asyncio commands and pipelines (the same entry points as the OTEL redis instrumentor)"""
+    global _redis_instrumented
+    if _redis_instrumented:
+        return
+    wrapt.wrap_function_wrapper('redis.asyncio.client', 'Redis.execute_command', _timed_redis_call)
+    wrapt.wrap_function_wrapper('redis.asyncio.client', 'Pipeline.execute', _timed_redis_call)
+    wrapt.wrap_function_wrapper('redis.asyncio.client', 'Pipeline.immediate_execute_command', _timed_redis_call)
+    _redis_instrumented = True
+
+
+def instrument_sqlalchemy(sync_engine) -> None:
+    """Cursor execution time from engine events (runs inside SQLAlchemy's greenlet, which shares the request context)"""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('request_timing_start', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        add(DB, time.perf_counter() - conn.info['request_timing_start'].pop())
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('request_timing_start'):
+            add(DB, time.perf_counter() - conn.info['request_timing_start'].pop())
@@ -1,4 +1,5 @@
 from .otel_tracer import *
+from .sampling import *
 from app.common.config import Config
 
 TracerType = OTELTracer
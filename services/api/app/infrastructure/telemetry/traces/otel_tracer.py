@@ -1,20 +1,43 @@
 from opentelemetry import trace
+from app.common.config import Config
 import app.infrastructure.interfaces as iabc
 import contextlib, typing as t, functools, inspect
 
 F = t.TypeVar("F", bound=t.Callable[..., t.Any])
 
+_tracers: dict[str, trace.Tracer] = {}
+
+def _get_tracer(name: str) -> trace.Tracer:
+    """trace.get_tracer builds a new tracer (and scope) on every call, so tracers are cached per name.
+    Cached ProxyTracers keep working: they delegate to the real provider once it is set.
+    """
+    tracer = _tracers.get(name)
+    if tracer is None:
+        tracer = _tracers[name] = trace.get_tracer(name)
+    return tracer
+
+def _parent_not_sampled() -> bool:
+    """A child of an unsampled span would be non-recording anyway, so no span needs to be created"""
+    ctx = trace.get_current_span().get_span_context()
+    return ctx.is_valid and not ctx.trace_flags.sampled
+
+
 class OTELTracer(iabc.ITracer):
+    """Tracer facade. With Config.TRACING_ENABLED off, `traced` returns the function itself
+    (decided at import time) and `start_span` yields a non-recording span.
+    """
     def __init__(self, tracer_name: str):
-        self._tracer = trace.get_tracer(tracer_name)
+        self._tracer = _get_tracer(tracer_name)
 
 
 
     @contextlib.contextmanager
     @staticmethod
     def start_span(name: str):
-        tracer = trace.get_tracer(__name__)
-        with tracer.start_as_current_span(name) as span:
+        if not Config.TRACING_ENABLED or _parent_not_sampled():
+            yield trace.INVALID_SPAN
+            return
+        with _get_tracer(__name__).start_as_current_span(name) as span:
             yield span
 
 
@@ -27,11 +50,15 @@ class OTELTracer(iabc.ITracer):
 
     @staticmethod
     def traced(func):
-        tracer = trace.get_tracer(func.__module__)
+        if not Config.TRACING_ENABLED:
+            return func
+        tracer = _get_tracer(func.__module__)
 
         if inspect.iscoroutinefunction(func):
             @functools.wraps(func)
             async def async_wrapper(*args, **kwargs):
+                if _parent_not_sampled():
+                    return await func(*args, **kwargs)
                 with tracer.start_as_current_span(func.__qualname__) as span:
                     try:
                         return await func(*args, **kwargs)
@@ -42,6 +69,8 @@ class OTELTracer(iabc.ITracer):
 
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
+            if _parent_not_sampled():
+                return func(*args, **kwargs)
             with tracer.start_as_current_span(func.__qualname__) as span:
                 try:
                     return func(*args, **kwargs)
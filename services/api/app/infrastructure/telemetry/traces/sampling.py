@@ -0,0 +1,155 @@
+from opentelemetry import metrics
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import SpanProcessor, ReadableSpan, Span
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.environment_variables import OTEL_BSP_MAX_QUEUE_SIZE
+from opentelemetry.sdk.trace.sampling import Sampler, ParentBased, TraceIdRatioBased, ALWAYS_ON
+from opentelemetry.trace import StatusCode
+from collections import OrderedDict
+import threading, os, typing as t
+
+meter = metrics.get_meter("app.metrics")
+
+spans_dropped_total = meter.create_counter(
+    "spans_dropped_total",
+    description="Ended spans that were not exported (reason: tail_sampled | buffer_full | queue_full)",
+)
+traces_tail_decisions_total = meter.create_counter(
+    "traces_tail_decisions_total",
+    description="Tail sampling decisions per local trace (decision: error | slow | ratio | dropped)",
+)
+
+_TRACE_ID_LIMIT = (1 << 64) - 1
+
+
+def build_sampler(ratio: float) -> Sampler:
+    """Head sampler: follows the parent's decision, samples new traces by trace id ratio"""
+    if ratio >= 1.0:
+        return ParentBased(ALWAYS_ON)
+    return ParentBased(TraceIdRatioBased(ratio))
+
+
+class _ExportCountingExporter(SpanExporter):
+    """Reports how many spans the batch processor hands over, before exporting them"""
+
+    def __init__(self, exporter: SpanExporter, on_export: t.Callable[[int], None]):
+        self.exporter = exporter
+        self._on_export = on_export
+
+    def export(self, spans: t.Sequence[ReadableSpan]) -> SpanExportResult:
+        self._on_export(len(spans))
+        return self.exporter.export(spans)
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+class CountingBatchSpanProcessor(BatchSpanProcessor):
+    """BatchSpanProcessor that counts the spans dropped because its queue is full (the SDK drops them silently).
+    Spans queued = spans accepted - spans handed to the exporter, counted on the public side (on_end / export),
+    so a span arriving at a full queue is dropped and counted here and the SDK queue itself never overflows.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, max_queue_size: int | None = None, **kwargs):
+        self.max_queue_size = max_queue_size or int(os.getenv(OTEL_BSP_MAX_QUEUE_SIZE, "2048"))
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+        super().__init__(_ExportCountingExporter(span_exporter, self._on_export), max_queue_size=self.max_queue_size, **kwargs)
+        os.register_at_fork(after_in_child=self._reset_queued) #the SDK empties its queue in the child
+
+    def _on_export(self, count: int) -> None:
+        with self._queued_lock:
+            self._queued = max(self._queued - count, 0)
+
+    def _reset_queued(self) -> None:
+        self._queued_lock = threading.Lock()
+        self._queued = 0
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context.trace_flags.sampled:
+            with self._queued_lock:
+                full = self._queued >= self.max_queue_size
+                if not full:
+                    self._queued += 1
+            if full:
+                spans_dropped_total.add(1, {"reason": "queue_full"})
+                return
+        super().on_end(span)
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """In-process tail sampling in front of an exporting processor.
+    Ended spans are buffered per trace until the local root span (no parent or a remote parent) ends,
+    then the whole local trace is either forwarded to `delegate` or dropped:
+    - kept if any span has an ERROR status
+    - kept if the local root took at least slow_ms
+    - otherwise kept for keep_ratio of traces (by trace id, so the decision is stable across processes)
+    At most max_traces traces are buffered: the oldest unfinished one is dropped when the buffer is full.
+    Spans ending after their local root (fire-and-forget tasks) start a new buffer that is never flushed.
+    Only head-sampled spans reach this processor, so combine it with a head ratio of 1.0.
+    """
+
+    def __init__(self, delegate: SpanProcessor, keep_ratio: float = 0.1, slow_ms: float = 500,
+                 max_traces: int = 2048, max_spans_per_trace: int = 512):
+        self.delegate = delegate
+        self.keep_ratio = keep_ratio
+        self.slow_ns = int(slow_ms * 1_000_000)
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._keep_bound = round(keep_ratio * (_TRACE_ID_LIMIT + 1))
+        self._traces: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        if span.parent is not None and not span.parent.is_remote:
+            self._buffer(trace_id, span)
+            return
+        with self._lock:
+            spans = self._traces.pop(trace_id, [])
+        spans.append(span)
+
+        decision = self._decide(span, spans)
+        traces_tail_decisions_total.add(1, {"decision": decision})
+        if decision == "dropped":
+            spans_dropped_total.add(len(spans), {"reason": "tail_sampled"})
+            return
+        for buffered in spans:
+            self.delegate.on_end(buffered)
+
+    def _buffer(self, trace_id: int, span: ReadableSpan) -> None:
+        evicted = 0
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    _, oldest = self._traces.popitem(last=False)
+                    evicted += len(oldest)
+            if len(spans) < self.max_spans_per_trace:
+                spans.append(span)
+            else:
+                evicted += 1
+        if evicted:
+            spans_dropped_total.add(evicted, {"reason": "buffer_full"})
+
+    def _decide(self, root: ReadableSpan, spans: list[ReadableSpan]) -> str:
+        if any(s.status.status_code is StatusCode.ERROR for s in spans):
+            return "error"
+        if root.end_time is not None and root.start_time is not None and root.end_time - root.start_time >= self.slow_ns:
+            return "slow"
+        if root.context.trace_id & _TRACE_ID_LIMIT < self._keep_bound:
+            return "ratio"
+        return "dropped"
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
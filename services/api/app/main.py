@@ -6,21 +6,25 @@ from contextlib import asynccontextmanager
 
 #Project files
 from app.common.config import Config
+import app.bootstrap as bootstrap
 import app.infrastructure.telemetry.logs as logs
 import app.infrastructure.dependencies as idep
 import app.infrastructure.telemetry as tel
 import app.infrastructure.telemetry.metrics as metrics
+import app.infrastructure.telemetry.middleware as tel_mw
 import app.application.dependencies as adep
 import app.presentation.routers as routers
 import app.presentation.schemas as schemas
+import app.presentation.responses as responses
 import app.presentation.exception_handlers as exch
+import app.common.libs.rqueue.queue as rqueue
+import app.common.libs.rqueue.middleware as rqueue_mw
+import app.common.libs.drain as drain
 #Misc
 import datetime
-import tzlocal # type: ignore
-import os
 
 #Logging/Tracing/Metrics
-import logging, traceback
+import logging
 
 
 
@@ -31,39 +35,75 @@ import logging, traceback
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info(f'[APP: Startup] Startup began...')
+    app.state.ready = False
+    #SIGTERM/SIGINT: fail readiness, wait for in-flight requests, then let uvicorn stop and run the shutdown below
+    drain_coordinator.install_signal_handlers()
+    timer = bootstrap.BootTimer('worker')
 
-    #Cache
-    await idep.CacheManager.wait_for_startup()
-    await idep.CacheManager.initialize_data_structures()
+    #Tables, Lua scripts, default admin: once per deployment (gunicorn master or the first worker)
+    with timer.phase('bootstrap'):
+        await bootstrap.ensure_bootstrapped(idep.CacheManager, idep.DatabaseManager)
 
-    #Database
-    await idep.DatabaseManager.wait_for_startup(attempts=Config.DB_WAIT_MAX_RETRIES, interval_sec=Config.DB_WAIT_INTERVAL_SECONDS)
-    await idep.DatabaseManager.initialize_data_structures()
-    
-    #Default_admin
-    async with idep.DatabaseManager.session() as session:
+    #Redis queue: a manager shared by decorators and rate limited outbound clients
+    with timer.phase('rqueue'):
         async with idep.CacheManager.connect() as cache:
-            db = idep.UserDB(session)
-            uow = idep.UnitOfWork(session)
-            repo = idep.UserRepository(connection=cache, user_db_repo=db, uow=uow)
-            logger.info('[APP: Startup] Ensuring admin exists ... ')
-            await repo.ensure_admin_exists(idep.PasswordHasherType())
-            await session.commit()
+            app.state.rqueue = rqueue.RedisQueueManager(cache, Config.RQUEUE_CLASS_SHARES)
+            await app.state.rqueue.init_scripts()
+        rqueue_sampler = asyncio.create_task(app.state.rqueue.sample_metrics_task(Config.RQUEUE_METRICS_SAMPLE_INTERVAL_SECONDS))
+
+    #Outbound HTTP clients
+    with timer.phase('http_clients'):
+        await idep.HttpClients.start(app.state.rqueue)
 
     #Setting up
-    logger.info('[APP: Startup] Setting up metrics refreshing tasks')
-    await metrics.create_async_metrics_refresh_tasks()
+    with timer.phase('background_tasks'):
+        metric_tasks = await metrics.create_async_metrics_refresh_tasks(app.state.rqueue)
 
+    #Pools and compiled queries: the first requests routed here don't pay for connects and SQL compilation
+    with timer.phase('warmup'):
+        await warm_up()
+
+    timer.finish()
+    app.state.ready = True
     logger.info(f'[APP: Startup] Startup finished!')
     yield
-    await idep.CacheManager.close()
-    await idep.DatabaseManager.close()
+    logger.info(f'[APP: Shutdown] Shutdown began...')
+    app.state.ready = False
+    background = [rqueue_sampler, *metric_tasks]
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True) #the metrics leader releases its lease
+    #Every step runs even if a previous one failed: a broken Redis must not keep the DB pool or spans from closing
+    await shutdown_step('activity flush', metrics.flush_activity()) #last batch queued by the activity debouncer
+    await shutdown_step('http clients', idep.HttpClients.close())
+    await shutdown_step('cache pool', idep.CacheManager.close())
+    await shutdown_step('db pool', idep.DatabaseManager.close())
+    await shutdown_step('telemetry', asyncio.to_thread(tel.shutdown_opentelemetry, Config.SHUTDOWN_CLEANUP_SECONDS * 1000 / 2))
+    drain_coordinator.restore_signal_handlers()
+    logger.info(f'[APP: Shutdown] Shutdown finished!')
+    logs.shutdown_loggers()
+
+
+async def shutdown_step(name: str, aw):
+    try:
+        await aw
+    except Exception:
+        logger.exception(f'[APP: Shutdown] {name} failed')
+
+
+async def warm_up():
+    await idep.CacheManager.warm_up(Config.WARMUP_REDIS_CONNECTIONS)
+    await idep.DatabaseManager.warm_up(Config.WARMUP_DB_CONNECTIONS)
+    async with idep.DatabaseManager.session() as session:
+        await idep.UserDB(session).warm_up()
     
     
 
 logs.init_loggers()
 logger = logging.getLogger('app')
 
+drain_coordinator = drain.DrainCoordinator(timeout=Config.DRAIN_TIMEOUT_SECONDS, readiness_grace=Config.DRAIN_READINESS_GRACE_SECONDS)
+
 
 app = FastAPI(
     title = f'{Config.APP_NAME} commit {Config.GIT_COMMIT}',
@@ -74,6 +114,7 @@ app = FastAPI(
         "displayRequestDuration":True
     },
     lifespan=lifespan, 
+    default_response_class=responses.DefaultResponse, #orjson
     root_path=f"/{Config.APP_NAME}"
 )
 
@@ -82,10 +123,11 @@ app = FastAPI(
 app.include_router(routers.AuthRouter)
 app.include_router(routers.UserRouter)
 exch.register_exception_handlers(app)
+app.add_middleware(rqueue_mw.ConcurrencyLimitMiddleware)
+app.add_middleware(tel_mw.TelemetryMiddleware, drain=drain_coordinator) #access logs + request metrics; outermost of ours, so it sees shed 503s too
 
 #OTEL: middleware must be below routers!!!
 if Config.MODE != "test":
-    metrics.register_middlewares(app)
     telemetry_exporter = tel.setup_opentelemetry(app)
 
 
@@ -93,9 +135,9 @@ if Config.MODE != "test":
 #        GETTING USER PROFILE          #
 ########################################
 
-@app.get("/me")
-async def whoami(current_user:adep.CurrentUserDependency) -> schemas.UserDTO:
-    return current_user
+@app.get("/me", response_model=schemas.UserDTO)
+async def whoami(current_user:adep.CurrentUserDependency) -> Response:
+    return responses.UserSerializer.response(current_user)
 
 
 ########################
@@ -103,83 +145,25 @@ async def whoami(current_user:adep.CurrentUserDependency) -> schemas.UserDTO:
 ########################
 
 
-# система завершения работы
-active_requests = 0
-shutdown_event = asyncio.Event()
-
 @app.get("/")
 @app.get("/health",include_in_schema=False)
 async def read_root():
-    """Indicates if the server is alive"""
-    
-    if shutdown_event.is_set():
-        return JSONResponse(status_code=500,content={})
-    else:
-        return
-
-def handle_shutdown_signal():
-    asyncio.ensure_future(initiate_shutdown())
-
-async def initiate_shutdown():
-    global shutdown_event
-    shutdown_event.clear()
-    shutdown_event.set()
-
-    async def _wait_for_requests():
-        while active_requests > 0:
-            await asyncio.sleep(0.1)
-
-    async def wait_for_requests_to_finish():
-        try:
-            await asyncio.wait_for(_wait_for_requests(), timeout=10*60)
-        except asyncio.TimeoutError:
-            print("Выключаемся")
-        finally:
-            os._exit(0)
-    
-    await wait_for_requests_to_finish()
-
-import signal
-signal.signal(signal.SIGINT, lambda sig, frame: handle_shutdown_signal())
-signal.signal(signal.SIGTERM, lambda sig, frame: handle_shutdown_signal())
-
-@app.middleware("http")
-async def add_logging_middleware(request: Request, call_next):
-    try:
-        global active_requests
-        active_requests += 1
-
-        response = await call_next(request)
-        logger.info({
-            "method": request.method,
-            "path":request.url.path,
-            "status": response.status_code,
-            "client": request.client.host
-
-        })
-        return response
-        
-    except Exception as e:
-        logger.error({
-            "method": request.method,
-            "path":request.url.path,
-            "status": "exception",
-            "client": request.client.host,
-            "exc_info": traceback.format_exc()
-
-        })
-        return JSONResponse(
-            status_code=500,
-            content={'successful':False,'detail':'Необработанная ошибка'}
-        )
-    finally:
-        active_requests -= 1
+    """Liveness: the process is up and serving (stays OK while draining)"""
+    return
 
+@app.get("/ready",include_in_schema=False)
+async def ready(request: Request):
+    """Indicates if the worker should receive traffic: startup and warm-up are done and it is not draining"""
 
+    if drain_coordinator.draining or not getattr(request.app.state, 'ready', False):
+        return JSONResponse(status_code=503,content={})
+    else:
+        return
 
 @app.get("/check")
 def check(request: Request):
     """Shows how the request is seen by the server + some time info"""
+    import tzlocal # type: ignore
 
     tz = tzlocal.get_localzone()
     server_dt = datetime.datetime.now(tz)
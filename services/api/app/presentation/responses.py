@@ -0,0 +1,36 @@
+"""JSON responses without FastAPI's response-model round trip.
+
+A route returning a pydantic model through its response_model is dumped to a dict, validated
+back into the model, dumped again in json mode and only then encoded with stdlib json.
+Routes whose services already return the response models (UserDTO, TokenResponse) build the
+body straight from a pre-built TypeAdapter (pydantic-core writes the JSON bytes) instead.
+response_model stays on the route for the OpenAPI schema; a returned Response bypasses it.
+"""
+from fastapi.responses import Response, ORJSONResponse
+import app.presentation.schemas as schemas
+import pydantic as p, typing as t
+import orjson #ORJSONResponse only asserts it on the first render: a missing install fails here, at startup
+
+#Everything that still goes through FastAPI's serialization (dicts, handlers returning content)
+DefaultResponse = ORJSONResponse
+
+T = t.TypeVar('T')
+
+
+class ModelSerializer(t.Generic[T]):
+    """Serializes already validated instances of `type_` straight to a JSON response (no validation)"""
+
+    def __init__(self, type_: type[T]):
+        self.adapter = p.TypeAdapter(type_)
+
+    def dump_json(self, content: T) -> bytes:
+        return self.adapter.dump_json(content)
+
+    def response(self, content: T, status_code: int = 200, headers: dict[str, str] | None = None) -> Response:
+        return Response(self.dump_json(content), status_code=status_code, headers=headers, media_type='application/json')
+
+
+#Built once at import: a TypeAdapter compiles the model's serializer
+UserSerializer = ModelSerializer(schemas.UserDTO)
+UserListSerializer = ModelSerializer(list[schemas.UserDTO])
+TokenSerializer = ModelSerializer(schemas.TokenResponse)
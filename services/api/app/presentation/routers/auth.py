@@ -1,11 +1,14 @@
 #Fastapi
 from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 #Project files
 import app.presentation.schemas as schemas
+import app.presentation.responses as responses
 import app.application.dependencies as appdeps
 import app.domain.exceptions as domexc, app.application.exceptions as appexc, app.common.exceptions as exc
+from app.common.libs.rqueue.middleware import concurrency_limit
+from app.common.config import Config
 
 #Pydantic/Typing
 import typing as t
@@ -24,15 +27,17 @@ router = APIRouter(
 @router.post("/login", responses={
     401: {"description":"Bad credentials"},
     422: {"description":"Form data has bad format (PydanticValidation)"},
-    },
+    503: {"description":"Too many logins in flight, retry after Retry-After seconds"},
+    }, response_model=schemas.TokenResponse,
     description='If credentials are valid - returns a pair of tokens, each can be used in Authorization header as "Bearer [token]"')
-async def login(auth_service: appdeps.OAuthServiceDependency, form_data: appdeps.OAuthFormData) -> schemas.TokenResponse:
+@concurrency_limit(Config.LOGIN_CONCURRENCY_LIMIT, local_limit=Config.LOGIN_CONCURRENCY_LOCAL_LIMIT)
+async def login(auth_service: appdeps.OAuthServiceDependency, form_data: appdeps.OAuthFormData) -> Response:
     credentials = {"username": form_data.username, "password": form_data.password}
     try:
         tokens = await auth_service.login(credentials)
     except appexc.CredentialsException as e:
         raise e    
-    return tokens
+    return responses.TokenSerializer.response(tokens)
         
 
 
@@ -43,9 +48,16 @@ async def logout(auth_service: appdeps.OAuthServiceDependency, token: appdeps.OA
     return JSONResponse({"msg":"Logged out successfully!"})
 
 
-@router.get("/refresh", responses={401: {"description":"Logged out or expired/wrong token"}},description='Send refresh token in Authorization header as "Bearer [token]"')
-async def refresh(auth_service: appdeps.OAuthServiceDependency, token: appdeps.OAuthToken) -> schemas.TokenResponse:
+@router.get("/logout/all", responses={401: {"description":"Expired/wrong token"}, 403: {"description":"Already logged out"}}, description='Invalidates every session of your account, on all devices')
+async def logout_everywhere(auth_service: appdeps.OAuthServiceDependency, token: appdeps.OAuthToken) -> JSONResponse:
+    credentials = {"token": token}
+    revoked = await auth_service.logout_everywhere(credentials)
+    return JSONResponse({"msg":"Logged out on all devices!", "sessions": revoked})
+
+
+@router.get("/refresh", responses={401: {"description":"Logged out or expired/wrong token"}}, response_model=schemas.TokenResponse, description='Send refresh token in Authorization header as "Bearer [token]"')
+async def refresh(auth_service: appdeps.OAuthServiceDependency, token: appdeps.OAuthToken) -> Response:
     tokens = await auth_service.refresh(refresh_token=token)
-    return tokens
+    return responses.TokenSerializer.response(tokens)
 
 
@@ -1,12 +1,15 @@
 #Fastapi
 from fastapi import APIRouter, HTTPException, Query, Path, Body, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 #Project files
 import app.application.dependencies as deps
 import app.presentation.schemas as schemas
+import app.presentation.responses as responses
 import app.domain.exceptions as domexc
 import app.domain.models as dmod
+from app.common.libs.rqueue.middleware import concurrency_limit
+from app.common.config import Config
 #Pydantic/Typing
 import typing as t
 import pydantic as p
@@ -31,17 +34,18 @@ logger = logging.getLogger('app')
 ########################################
 
 
-@router.get('/{user_id}')
+@router.get('/{user_id}', response_model=schemas.UserDTO | None)
 async def get_user(
         user_service: deps.UserServiceDependency,
         user_id = t.Annotated[int, Path(description='Specifies user to return')]
-    ) -> schemas.UserDTO | None:
+    ) -> Response:
     '''Returns a user specified by user_id'''  
     if user:=await user_service.get_user(user_id):
-        return user
+        return responses.UserSerializer.response(user)
     raise domexc.UserDoesNotExist('Requested user does not exist!')
     
-@router.get('')
+@router.get('', response_model=list[schemas.UserDTO], responses={503: {"description":"Too many list requests in flight, retry after Retry-After seconds"}})
+@concurrency_limit(Config.USERS_LIST_CONCURRENCY_LIMIT, local_limit=Config.USERS_LIST_CONCURRENCY_LOCAL_LIMIT)
 async def get_users(
         user_service: deps.UserServiceDependency,
         limit: t.Annotated[int, Query(le=100)] = 100,
@@ -50,23 +54,24 @@ async def get_users(
         username: str | None = Query(None),
         role: dmod.Role | None = Query(None),
         status: dmod.Status | None = Query(None)
-    ) -> list[schemas.UserDTO]:
+    ) -> Response:
     filters = schemas.UserFilterSchema.model_validate(dict(username=username, role=role, status=status))
-    return await user_service.list(limit,offset,filters,filter_mode)
+    return responses.UserListSerializer.response(await user_service.list(limit,offset,filters,filter_mode))
 
 @router.post("", responses= {
         201: {"description":"Created successfully"},
         409: {"description":"User already exists"},
         403: {"description":"Returned when NON-Admin accesses this endpoint"},
-    },status_code=status.HTTP_201_CREATED,
+    },status_code=status.HTTP_201_CREATED, response_model=schemas.UserDTO,
 )
 async def create_user_for_admins(
         user_service: deps.UserServiceDependency,
         current_user: deps.CurrentUserDependency,
         new_user_data: schemas.PrivateUserCreationModel,
-    ) -> schemas.UserDTO:
+    ) -> Response:
 
-    return await user_service.admin_create(current_user, new_user_data)
+    user = await user_service.admin_create(current_user, new_user_data)
+    return responses.UserSerializer.response(user, status_code=status.HTTP_201_CREATED)
 
 
 
@@ -75,24 +80,25 @@ async def create_user_for_admins(
     403: {"description":"Invalid token"},
     403: {"description":"Returned when a regular user tries to access admin-only editable fields."},
     409: {"description":"Account with this username exists"},
-    })
+    }, response_model=schemas.UserDTO)
 async def update_user(
     user_service: deps.UserServiceDependency,
     current_user: deps.CurrentUserDependency,
     new_user_data: t.Annotated[schemas.PrivateUserUpdateModel | schemas.PublicUserUpdateModel, Body(description="Private schema is used only when ADMINS edit OTHER users. Else, use Public schema.")],
     user_id: t.Annotated[int, Path(description='id of a user to edit')],
-    ) -> schemas.UserDTO:
+    ) -> Response:
     
     data = new_user_data.model_dump(exclude_unset=True)
     try:
         if not current_user.is_admin:
             model = schemas.PublicUserUpdateModel.model_validate(data)
-            return await user_service.update(current_user, model)
+            user = await user_service.update(current_user, model)
         else:
             model = schemas.PrivateUserUpdateModel.model_validate(data)
-            return await user_service.admin_update(current_user, user_id, model)
+            user = await user_service.admin_update(current_user, user_id, model)
     except p.ValidationError as e:
         raise RequestValidationError(e.errors())
+    return responses.UserSerializer.response(user)
 
 
 @router.delete('/{user_id}', responses= {
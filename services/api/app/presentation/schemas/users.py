@@ -1,12 +1,19 @@
 import typing as t
 import pydantic as p
-from app.domain.models import Role, Status
+from app.domain.models import Role, Status, User
+from app.common.common import construct_trusted
 
 class UserDTO(p.BaseModel):
     id: int
     username: str
     role: Role
     status: Status
+
+    @classmethod
+    def from_user(cls, user: User) -> 'UserDTO':
+        'Direct conversion from a domain user: its fields are validated already'
+        return construct_trusted(cls, dict(id=user.id, username=user.username, role=user.role, status=user.status))
+
     @property
     def is_admin(self):
         return self.role == 'admin'    
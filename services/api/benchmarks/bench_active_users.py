@@ -0,0 +1,80 @@
+"""ZSET vs HyperLogLog active-user storage at 1M users.
+
+Loads N distinct users spread over the last 24h into both storages (pipelined, same commands the
+storages issue), then reports Redis memory and the latency of the 1h/24h counts the metrics task runs.
+Needs a real Redis (MEMORY USAGE, PFCOUNT), the database is flushed:
+    BENCH_REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_active_users [users]
+"""
+from redis.asyncio import Redis
+import asyncio, os, sys, time
+
+from app.infrastructure.repositories import RedisMetricActiveUserStorage, RedisHLLMetricActiveUserStorage
+
+DAY = 24 * 3600
+CHUNK = 10_000
+
+
+async def load(redis: Redis, zset: RedisMetricActiveUserStorage, hll: RedisHLLMetricActiveUserStorage, users: int) -> None:
+    now = time.time()
+    for start in range(0, users, CHUNK):
+        ids = range(start, min(start + CHUNK, users))
+        seen_at = {user_id: now - (user_id * 7919 % DAY) for user_id in ids} #spread over the day
+        buckets: dict[int, list[int]] = {}
+        for user_id, ts in seen_at.items():
+            buckets.setdefault(int(ts // hll.bucket_sec), []).append(user_id)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(zset.zset_key, seen_at)
+            for bucket, members in buckets.items():
+                pipe.pfadd(hll.bucket_key(bucket), *members)
+                pipe.expire(hll.bucket_key(bucket), hll.retention_sec, nx=True)
+            await pipe.execute()
+
+
+async def memory(redis: Redis, pattern: str) -> int:
+    total = 0
+    async for key in redis.scan_iter(match=pattern, count=1000):
+        total += await redis.memory_usage(key) or 0
+    return total
+
+
+async def timed(coro_factory, repeat: int = 5) -> tuple[float, int]:
+    best, value = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = await coro_factory()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, value
+
+
+async def main(users: int):
+    redis = Redis.from_url(os.getenv('BENCH_REDIS_URL', 'redis://localhost:6379/15'), decode_responses=True)
+    await redis.flushdb()
+    zset = RedisMetricActiveUserStorage(redis, zset_key='bench:dau')
+    hll = RedisHLLMetricActiveUserStorage(redis, key_prefix='bench:hll')
+
+    start = time.perf_counter()
+    await load(redis, zset, hll, users)
+    print(f"loaded {users:,} users in {time.perf_counter() - start:.1f}s\n")
+
+    print(f"{'storage':<6} {'memory':>10} {'1h count':>16} {'24h count':>18}")
+    for name, storage, pattern in (('zset', zset, 'bench:dau'), ('hll', hll, 'bench:hll:*')):
+        if name == 'hll':
+            await storage.get_active_count(DAY) #first call builds the hourly roll-ups
+        hour_ms, hour = await timed(lambda: storage.get_active_count(3600))
+        day_ms, day = await timed(lambda: storage.get_active_count(DAY))
+        mem = await memory(redis, pattern)
+        print(f"{name:<6} {mem / 2**20:>8.1f}MB {hour:>9,} {hour_ms:>5.1f}ms {day:>11,} {day_ms:>5.1f}ms")
+
+    register_ms = {}
+    for name, storage in (('zset', zset), ('hll', hll)):
+        start = time.perf_counter()
+        for user_id in range(1000):
+            await storage.register_activity(users + user_id)
+        register_ms[name] = (time.perf_counter() - start)
+    print(f"\nregister_activity x1000: zset {register_ms['zset'] * 1000:.0f}ms, hll {register_ms['hll'] * 1000:.0f}ms")
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,127 @@
+"""CPU per authenticated request on the auth path, cache hits only (no network).
+
+AuthService.authenticate with StatefulOAuthStrategy: decode the access token, read the session,
+read the user, convert it to UserDTO. Redis is replaced by an in-memory dict behind the same
+`execute_command` call the repositories use, so only our CPU is measured.
+- legacy: the pre-codec path (model_validate_json of the cached JSON, UserDTO.model_validate(from_attributes=True))
+- json / struct / msgpack: the repositories with CACHE_CODEC set to that codec (users; sessions are hashes)
+Run from services/api:  python -m benchmarks.bench_auth_path [requests]
+"""
+import asyncio, sys, time, jwt
+
+import app.infrastructure.cache.codecs as codecs
+import app.infrastructure.repositories.sessions as srepo
+import app.infrastructure.repositories.users as urepo
+import app.infrastructure.security as isec
+import app.application.services as appsvc
+import app.application.models as mapp
+import app.domain.models as domain
+import app.presentation.schemas as schemas
+
+SECRET = 'bench-secret'
+USER = domain.User(
+    id=12345, username='someusername', password_hash='$argon2id$v=19$m=65536,t=3,p=4$' + 'x' * 22 + '$' + 'y' * 43,
+    role=domain.Role.USER, status=domain.Status.ACTIVE, version=7,
+)
+SESSION = mapp.RotatingTokenSession(id='3f1c1f9e-8a44-4a53-a4f6-1a8c6f1f0c11', user_id=USER.id, roles=['user'], refresh_token_hash=isec.hash_refresh_token('r' * 180))
+TOKEN = jwt.encode({'session_id': SESSION.id, 'exp': time.time() + 3600}, SECRET, algorithm='HS256')
+
+
+class MemoryRedis:
+    def __init__(self, data: dict[str, bytes | dict[bytes, bytes]]):
+        self.data = data
+
+    async def execute_command(self, command: str, key: str, **options):
+        return self.data.get(key)
+
+
+def build_service(fmt: str) -> appsvc.AuthService:
+    redis = MemoryRedis({
+        f'session:{SESSION.id}': {
+            field.encode(): value if isinstance(value, bytes) else str(value).encode()
+            for field, value in codecs.SessionHashCodec().encode(SESSION).items()
+        },
+        f'user:{USER.id}': codecs.UserCodec(fmt).encode(USER),
+    })
+    strategy = isec.StatefulOAuthStrategy(
+        session_repo=srepo.RedisSessionRepository(redis),
+        user_repo=urepo.RedisCacheUserRepository(None, redis, None, codecs.UserCodec(fmt)),
+        password_hasher=None,
+        access_secret=SECRET, refresh_secret=SECRET, algorithm='HS256',
+    )
+    return appsvc.AuthService(strategy)
+
+
+class LegacySession(mapp.UserSession):
+    refresh_token: str #the session model before codecs
+
+
+class LegacySessionRepository(srepo.RedisSessionRepository):
+    async def get_session(self, session_id: str) -> LegacySession | None:
+        sess = await self.redis.execute_command('GET', f'session:{session_id}')
+        return LegacySession.model_validate_json(sess) if sess else None
+
+
+class LegacyUserRepository(urepo.RedisCacheUserRepository):
+    async def get_by_id(self, user_id: int) -> domain.User | None:
+        raw = await self._redis.execute_command('GET', f'user:{user_id}')
+        urepo.logger.debug(f'[CACHE: USERS] get_by_id => HIT id={user_id}')
+        return domain.User.model_validate_json(raw)
+
+
+class LegacyAuthService(appsvc.AuthService):
+    async def authenticate(self, credentials: dict) -> schemas.UserDTO:
+        user = await self.auth_strategy.authenticate(credentials)
+        return schemas.UserDTO.model_validate(user, from_attributes=True)
+
+
+def build_legacy_service() -> appsvc.AuthService:
+    #the read path before codecs: validated JSON records (plain refresh token), DTO re-validated from attributes
+    redis = MemoryRedis({
+        f'session:{SESSION.id}': SESSION.model_dump_json(exclude={'refresh_token_hash'})[:-1] + f', "refresh_token": "{"r" * 180}"}}',
+        f'user:{USER.id}': USER.model_dump_json(),
+    })
+    strategy = isec.StatefulOAuthStrategy(
+        session_repo=LegacySessionRepository(redis),
+        user_repo=LegacyUserRepository(None, redis, None),
+        password_hasher=None,
+        access_secret=SECRET, refresh_secret=SECRET, algorithm='HS256',
+    )
+    return LegacyAuthService(strategy)
+
+
+async def timed(authenticate, n: int) -> float:
+    credentials = {'token': TOKEN}
+    start = time.perf_counter()
+    for _ in range(n):
+        await authenticate(credentials)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def jwt_only(credentials: dict):
+    jwt.decode(credentials['token'], SECRET, algorithms=['HS256'])
+
+
+async def main(n: int, rounds: int = 20):
+    expected = schemas.UserDTO.model_validate(USER, from_attributes=True)
+    variants = {'jwt only': jwt_only, 'legacy': build_legacy_service().authenticate}
+    for fmt in (codecs.JSON, codecs.STRUCT, codecs.MSGPACK):
+        variants[fmt] = build_service(fmt).authenticate
+    for name, authenticate in variants.items():
+        if name != 'jwt only':
+            assert await authenticate({'token': TOKEN}) == expected, name
+        await timed(authenticate, 500) #warm-up
+    #rounds interleave the variants and the best round counts: CPU noise hits all of them alike
+    best = dict.fromkeys(variants, float('inf'))
+    for _ in range(rounds):
+        for name, authenticate in variants.items():
+            best[name] = min(best[name], await timed(authenticate, max(n // rounds, 1)))
+    jwt_us = best.pop('jwt only')
+    base = best['legacy'] - jwt_us
+    print(f'jwt.decode alone: {jwt_us:.2f} us')
+    for name, us in best.items():
+        print(f'{name:>8}: {us:6.2f} us/request  (records + DTO: {us - jwt_us:6.2f} us, x{base / (us - jwt_us):.2f})')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
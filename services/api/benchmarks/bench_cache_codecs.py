@@ -0,0 +1,62 @@
+"""Size and encode/decode cost of cached records per cache codec (CACHE_CODEC).
+
+Records: one user (user:{id}, read on every authenticated request), a page of 100 users
+(users:list:*) and a refresh session (session:{id}, read on every refresh).
+legacy is what the repositories stored before codecs: pydantic JSON, refresh token in plain text.
+Run from services/api:  python -m benchmarks.bench_cache_codecs [iterations]
+"""
+import sys, timeit, typing as t
+
+import app.infrastructure.cache.codecs as codecs
+import app.domain.models as domain
+import app.application.models as mapp
+from app.infrastructure.security.refresh_tokens import hash_refresh_token
+
+USER = domain.User(
+    id=12345, username='someusername', password_hash='$argon2id$v=19$m=65536,t=3,p=4$' + 'x' * 22 + '$' + 'y' * 43,
+    role=domain.Role.USER, status=domain.Status.ACTIVE, version=7,
+)
+USERS = [USER.model_copy(update={'id': i, 'username': f'user{i:04d}'}) for i in range(100)]
+SESSION = mapp.RotatingTokenSession(user_id=12345, roles=['user'], refresh_token_hash=hash_refresh_token('r' * 180))
+LEGACY_SESSION = SESSION.model_dump_json(exclude={'refresh_token_hash'})[:-1] + f', "refresh_token": "{"r" * 180}"}}'
+
+
+class LegacySession(mapp.UserSession):
+    refresh_token: str #the session model before codecs
+
+
+def formats() -> list[str]:
+    return [codecs.JSON, codecs.STRUCT, codecs.MSGPACK]
+
+
+def measure(n: int, encode: t.Callable[[], bytes | str], decode: t.Callable[[bytes | str], t.Any]) -> tuple[int, float, float]:
+    data = encode()
+    enc = min(timeit.repeat(encode, number=n, repeat=5)) / n * 1e6
+    dec = min(timeit.repeat(lambda: decode(data), number=n, repeat=5)) / n * 1e6
+    return len(data), enc, dec
+
+
+def main(n: int):
+    cases = {
+        'user': {
+            'legacy': (USER.model_dump_json, domain.User.model_validate_json),
+            **{fmt: (lambda c=codecs.UserCodec(fmt): c.encode(USER), codecs.UserCodec(fmt).decode) for fmt in formats()},
+        },
+        'users x100': {
+            **{fmt: (lambda c=codecs.UserCodec(fmt): c.encode_many(USERS), codecs.UserCodec(fmt).decode_many) for fmt in formats()},
+        },
+        'session': {
+            'legacy': (lambda: LEGACY_SESSION, LegacySession.model_validate_json),
+            **{fmt: (lambda c=codecs.SessionCodec(fmt): c.encode(SESSION), codecs.SessionCodec(fmt).decode) for fmt in formats()},
+        },
+    }
+    for record, variants in cases.items():
+        print(record)
+        results = {name: measure(n if record != 'users x100' else max(n // 100, 10), *fns) for name, fns in variants.items()}
+        base_size, _, base_dec = results.get('legacy', results[codecs.JSON])
+        for name, (size, enc, dec) in results.items():
+            print(f'  {name:>8}: {size:6d} bytes ({size / base_size:4.0%})  encode {enc:8.2f} us  decode {dec:8.2f} us (x{base_dec / dec:.2f})')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,78 @@
+"""Per-request overhead of the HTTP telemetry middlewares.
+
+Compares the legacy pair of BaseHTTPMiddleware layers (access log + request metrics)
+with the pure ASGI TelemetryMiddleware, on a minimal FastAPI app called directly via ASGI.
+Run from services/api:  python -m benchmarks.bench_http_middleware [requests]
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import asyncio, logging, sys, time, traceback
+
+import app.infrastructure.telemetry.metrics.on_http_request as m
+from app.infrastructure.telemetry.middleware import TelemetryMiddleware
+
+logging.getLogger('app').disabled = True #measure middleware, not the log sink
+logger = logging.getLogger('app')
+
+
+def build_app(mode: str) -> FastAPI:
+    api = FastAPI()
+
+    @api.get('/users/{user_id}')
+    async def get_user(user_id: int):
+        return {'id': user_id}
+
+    if mode == 'legacy':
+        #copies of the replaced app.middleware("http") functions
+        async def requests_metric_middleware(request, call_next):
+            response = await call_next(request)
+            route_path = getattr(request.scope.get("route"), "path", request.url.path)
+            m.http_requests_total.add(1, {"http_method": request.method, "http_target": route_path, "status_code": str(response.status_code)})
+            return response
+
+        async def add_logging_middleware(request: Request, call_next):
+            try:
+                response = await call_next(request)
+                logger.info({"method": request.method, "path": request.url.path, "status": response.status_code, "client": request.client.host})
+                return response
+            except Exception:
+                logger.error({"exc_info": traceback.format_exc()})
+                return JSONResponse(status_code=500, content={})
+
+        api.middleware("http")(requests_metric_middleware)
+        api.middleware("http")(add_logging_middleware)
+    elif mode == 'asgi':
+        api.add_middleware(TelemetryMiddleware)
+    return api
+
+
+async def run(api: FastAPI, n: int) -> float:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': '/users/1', 'raw_path': b'/users/1', 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'bench')], 'client': ('127.0.0.1', 1), 'server': ('bench', 80),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200): #warm-up
+        await api(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await api(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(n: int):
+    results = {mode: await run(build_app(mode), n) for mode in ('none', 'legacy', 'asgi')}
+    baseline = results['none']
+    for mode, us in results.items():
+        print(f'{mode:>7}: {us:8.1f} us/request  (overhead {us - baseline:+7.1f} us)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,49 @@
+"""Records/sec of the JSON log formatters.
+
+Compares the pythonjsonlogger based OTLPJsonFormatter with FastJsonFormatter (full and compact field sets,
+orjson and stdlib json) on a string message, a dict message (access log) and a record with extras.
+Run from services/api:  python -m benchmarks.bench_log_formatter [records]
+"""
+import logging, sys, time
+
+import app.infrastructure.telemetry.logs as logs
+
+
+def records() -> dict[str, logging.LogRecord]:
+    text = logging.LogRecord('app', logging.INFO, __file__, 1, 'user %s logged in', ('admin',), None)
+    access = logging.LogRecord('app', logging.INFO, __file__, 1, {"method": "GET", "path": "/api/users", "status": 200, "client": "10.0.0.1"}, None, None)
+    extra = logging.LogRecord('app', logging.INFO, __file__, 1, 'cache miss', None, None)
+    extra.key, extra.ttl = 'user:42', 300
+    return {'text': text, 'access': access, 'extra': extra}
+
+
+def formatters() -> dict[str, logging.Formatter]:
+    return {
+        'pythonjsonlogger': logs.OTLPJsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"),
+        'fast[json]': logs.FastJsonFormatter(use_orjson=False),
+        'fast[orjson]': logs.FastJsonFormatter(),
+        'fast[orjson,compact]': logs.FastJsonFormatter(compact=True),
+    }
+
+
+def bench(formatter: logging.Formatter, record: logging.LogRecord, n: int) -> float:
+    for _ in range(1000):
+        formatter.format(record)
+    start = time.perf_counter()
+    for _ in range(n):
+        formatter.format(record)
+    return n / (time.perf_counter() - start)
+
+
+def main(n: int):
+    for record_name, record in records().items():
+        print(f"\n{record_name} record, {n} formats")
+        baseline = None
+        for name, formatter in formatters().items():
+            rate = bench(formatter, record, n)
+            baseline = baseline or rate
+            print(f"  {name:<22} {rate:>10,.0f} rec/s  x{rate / baseline:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,75 @@
+"""Serialization throughput of GET /users?limit=100 (100 UserDTOs, no database).
+
+Compares, on a minimal FastAPI app called directly via ASGI:
+- legacy:     `-> list[UserDTO]` response model, stdlib JSONResponse (dump -> validate -> dump -> json.dumps)
+- orjson:     the same route with ORJSONResponse as the default response class
+- serializer: response_model only for the docs, body from the pre-built TypeAdapter (UserListSerializer)
+Run from services/api:  python -m benchmarks.bench_response_serialization [requests]
+"""
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse, Response
+import asyncio, sys, time, typing as t
+
+import app.presentation.schemas as schemas
+import app.presentation.responses as responses
+
+USERS = [
+    schemas.UserDTO(id=i, username=f'user_{i:04d}', role='admin' if i % 10 == 0 else 'user', status='active')
+    for i in range(100)
+]
+
+async def list_users(limit: int) -> list[schemas.UserDTO]:
+    return USERS[:limit]
+
+
+def build_app(mode: str) -> FastAPI:
+    if mode == 'serializer':
+        api = FastAPI(default_response_class=responses.DefaultResponse)
+
+        @api.get('/users', response_model=list[schemas.UserDTO])
+        async def get_users(limit: t.Annotated[int, Query(le=100)] = 100) -> Response:
+            return responses.UserListSerializer.response(await list_users(limit))
+        return api
+
+    api = FastAPI(default_response_class=responses.DefaultResponse if mode == 'orjson' else JSONResponse)
+
+    @api.get('/users')
+    async def get_users(limit: t.Annotated[int, Query(le=100)] = 100) -> list[schemas.UserDTO]:
+        return await list_users(limit)
+    return api
+
+
+async def run(api: FastAPI, n: int) -> tuple[float, bytes]:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': '/users', 'raw_path': b'/users', 'root_path': '', 'query_string': b'limit=100',
+        'headers': [(b'host', b'bench')], 'client': ('127.0.0.1', 1), 'server': ('bench', 80),
+    }
+    body = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            body.append(message['body'])
+
+    for _ in range(200): #warm-up
+        await api(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await api(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n * 1e6, body[-1]
+
+
+async def main(n: int):
+    results = {mode: await run(build_app(mode), n) for mode in ('legacy', 'orjson', 'serializer')}
+    import json
+    assert len({json.dumps(json.loads(body)) for _, body in results.values()}) == 1, 'responses differ'
+    baseline = results['legacy'][0]
+    for mode, (us, body) in results.items():
+        print(f'{mode:>10}: {us:8.1f} us/request  {1e6 / us:8.0f} req/s  (x{baseline / us:.2f}, {len(body)} bytes)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000))
@@ -0,0 +1,67 @@
+"""Per-call overhead of OTELTracer.traced / start_span.
+
+Measures a trivial wrapped function: raw call, the previous implementation (get_tracer per start_span),
+traced with a real SDK provider (sampled, spans go to a no-op processor), traced under an unsampled
+parent, and the disabled mode where the decorator returns the raw function.
+Run from services/api:  python -m benchmarks.bench_tracing [calls]
+"""
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+import contextlib, sys, time
+
+from app.common.config import Config
+from app.infrastructure.telemetry.traces.otel_tracer import OTELTracer
+
+
+def work(x):
+    return x + 1
+
+
+@contextlib.contextmanager
+def legacy_start_span(name: str):
+    tracer = trace.get_tracer(__name__)
+    with tracer.start_as_current_span(name) as span:
+        yield span
+
+
+def bench(label: str, fn, n: int, baseline: float | None = None) -> float:
+    for _ in range(1000):
+        fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    per_call = (time.perf_counter() - start) / n * 1e9
+    overhead = f"  {per_call - baseline:+,.0f} ns" if baseline is not None else ""
+    print(f"  {label:<34} {per_call:>9,.0f} ns/call{overhead}")
+    return per_call
+
+
+def main(n: int):
+    trace.set_tracer_provider(TracerProvider())
+    print(f"{n} calls")
+    raw = bench('raw function', lambda: work(1), n)
+
+    Config.TRACING_ENABLED = False
+    disabled = OTELTracer.traced(work)
+    bench('traced, TRACING_ENABLED=0', lambda: disabled(1), n, raw)
+
+    Config.TRACING_ENABLED = True
+    traced = OTELTracer.traced(work)
+    bench('traced, sampled', lambda: traced(1), n, raw)
+
+    unsampled = trace.NonRecordingSpan(trace.SpanContext(1, 1, is_remote=False, trace_flags=trace.TraceFlags(0)))
+    with trace.use_span(unsampled):
+        bench('traced, unsampled parent', lambda: traced(1), n, raw)
+
+    def legacy():
+        with legacy_start_span('x'):
+            work(1)
+    def cached():
+        with OTELTracer.start_span('x'):
+            work(1)
+    bench('start_span, get_tracer per call', legacy, n, raw)
+    bench('start_span, cached tracer', cached, n, raw)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
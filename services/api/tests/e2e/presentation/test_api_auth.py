@@ -4,7 +4,7 @@ import app.infrastructure.dependencies as ideps
 import app.presentation.schemas as schemas
 import app.application.models as amod
 import app.infrastructure.security as security
-from tests.helpers.tokens import OAuthTokenizer
+from tests.helpers.tokens import OAuthTokenizer, refresh_token_matches
 import pytest
 from tests.helpers.users import build_sess_repo,build_user_repo
 
@@ -33,7 +33,7 @@ async def test_logout(async_client, cache_client):
     session = amod.RotatingTokenSession(
         user_id=1,
         roles=['user'],
-        refresh_token='sometoken'
+        refresh_token_hash=security.hash_refresh_token('sometoken')
     )
 
     sess_repo = await build_sess_repo(cache_client)
@@ -68,7 +68,7 @@ async def test_refresh(async_client, cache_client):
     session = amod.RotatingTokenSession(
         user_id=1,
         roles=['user'],
-        refresh_token='this_value_is_replaced_below'
+        refresh_token_hash='this_value_is_replaced_below'
     )
 
     sess_repo = await build_sess_repo(cache_client)
@@ -83,7 +83,7 @@ async def test_refresh(async_client, cache_client):
         refresh_expires_hours=strat.refresh_expires_hours,
     )
     tokens = tokenizer.create_a_pair_of_tokens(payload={'session_id': session.id})
-    session.refresh_token = tokens.refresh_token
+    session.refresh_token_hash = security.hash_refresh_token(tokens.refresh_token)
 
     await sess_repo.create(session, 3600)
     stored_session = await sess_repo.get_session(session.id)
@@ -94,8 +94,45 @@ async def test_refresh(async_client, cache_client):
     response = await async_client.get(url='/auth/refresh' ,headers={'Authorization':f'Bearer {tokens.refresh_token}'})
     assert response.status_code == 200
 
-    tokens = schemas.TokenResponse.model_validate(response.json())
+    new_tokens = schemas.TokenResponse.model_validate(response.json())
     sess_after = await sess_repo.get_session(session.id)
-    assert sess_after.refresh_token == tokens.refresh_token
+    assert refresh_token_matches(sess_after.refresh_token_hash, new_tokens.refresh_token)
 
+    #the rotated token is reused: the session is revoked, so the token issued last dies as well
+    response = await async_client.get(url='/auth/refresh' ,headers={'Authorization':f'Bearer {tokens.refresh_token}'})
+    assert response.status_code == 401
+    assert await sess_repo.get_session(session.id) is None
+    response = await async_client.get(url='/auth/refresh' ,headers={'Authorization':f'Bearer {new_tokens.refresh_token}'})
+    assert response.status_code == 403
+
+
+
+
+@pytest.mark.asyncio
+async def test_logout_everywhere(async_client, cache_client):
+    sess_repo = await build_sess_repo(cache_client)
+    sessions = [amod.RotatingTokenSession(user_id=7, roles=['user'], refresh_token_hash=security.hash_refresh_token(f'token{i}')) for i in range(3)]
+    other_user_session = amod.RotatingTokenSession(user_id=8, roles=['user'], refresh_token_hash=security.hash_refresh_token('token'))
+    for session in [*sessions, other_user_session]:
+        await sess_repo.create(session, 3600)
+
+    hasher = ideps.PasswordHasherType()
+    strat = ideps.AuthStrategyType(session_repo=None, user_repo=None, password_hasher=hasher)
+    tokenizer = OAuthTokenizer(
+        refresh_secret=strat.refresh_secret,
+        access_secret=strat.access_secret,
+        algorithm=strat.algorithm,
+        access_expires_mins=strat.access_expires_mins,
+        refresh_expires_hours=strat.refresh_expires_hours,
+    )
+    tokens = tokenizer.create_a_pair_of_tokens(payload={'session_id': sessions[0].id})
+
+    response = await async_client.get(url='/auth/logout/all', headers={'Authorization':f'Bearer {tokens.access_token}'})
+    assert response.status_code == 200
+    assert response.json()['sessions'] == 3
+    for session in sessions:
+        assert await sess_repo.get_session(session.id) is None
+    assert await sess_repo.get_session(other_user_session.id) is not None
 
+    response = await async_client.get(url='/auth/logout/all', headers={'Authorization':f'Bearer {tokens.access_token}'})
+    assert response.status_code == 403
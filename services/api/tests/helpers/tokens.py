@@ -1,9 +1,11 @@
 
 import jwt
+import hmac
 import datetime as dt
 import typing as t
 import app.application.exceptions as appexc
 import app.presentation.schemas as schemas
+from app.infrastructure.security.refresh_tokens import hash_refresh_token
 
 
 class OAuthTokenizer:
@@ -52,3 +54,7 @@ class OAuthTokenizer:
             access_expires=access_expires,
             refresh_expires=refresh_expires,
         )
+
+
+def refresh_token_matches(token_hash: str, token: str) -> bool:
+    return hmac.compare_digest(token_hash, hash_refresh_token(token))
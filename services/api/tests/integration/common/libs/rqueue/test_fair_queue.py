@@ -0,0 +1,107 @@
+import pytest, asyncio
+import pytest_asyncio as pytestaio
+import app.common.libs.rqueue.queue as rqueue
+
+
+@pytestaio.fixture
+async def queue_mgr(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    return mgr
+
+
+async def enqueue(queue_mgr: rqueue.RedisQueueManager, task: str, priority: str, tenant: str = '-') -> float:
+    keys = queue_mgr.queue_keys('llm')
+    finish = await queue_mgr.run_script(
+        'fair_enqueue.lua',
+        keys=[keys['waiting'], queue_mgr.flows_key('llm', priority), keys['vtime'], rqueue.REDIS_RESOURCES_KEY],
+        args=[task, tenant, queue_mgr.class_shares[priority], rqueue.FLOW_STATE_TTL, 'llm'],
+    )
+    return float(finish)
+
+async def serve(queue_mgr: rqueue.RedisQueueManager, n: int) -> list[str]:
+    """Dequeues n tasks one slot at a time, in the order fair_acquire.lua admits them"""
+    keys = queue_mgr.queue_keys('llm')
+    served = []
+    for _ in range(n):
+        head = (await queue_mgr.redis.zrange(keys['waiting'], 0, 0))[0]
+        assert await queue_mgr.run_script('fair_acquire.lua', keys=[keys['waiting'], keys['active'], keys['vtime']], args=[head, 1])
+        await queue_mgr.redis.decr(keys['active'])
+        served.append(head)
+    return served
+
+
+@pytest.mark.asyncio
+async def test_flow_advances_by_inverse_weight(queue_mgr):
+    assert [await enqueue(queue_mgr, f'i{n}', 'interactive') for n in range(3)] == [0.125, 0.25, 0.375]
+    assert [await enqueue(queue_mgr, f'b{n}', 'batch') for n in range(2)] == [1.0, 2.0]
+    assert await serve(queue_mgr, 5) == ['i0', 'i1', 'i2', 'b0', 'b1']
+
+
+@pytest.mark.asyncio
+async def test_idle_flow_cannot_bank_credit(queue_mgr):
+    for n in range(4):
+        await enqueue(queue_mgr, f'busy{n}', 'default', 'busy')
+    await serve(queue_mgr, 2) #virtual time moves to 0.5
+
+    #a flow that was idle until now starts at the current virtual time, not at 0
+    assert await enqueue(queue_mgr, 'late0', 'default', 'late') == pytest.approx(0.5 + 2 / 4)
+    assert await serve(queue_mgr, 3) == ['busy2', 'busy3', 'late0']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('tenants', [1, 2, 4])
+async def test_class_share_does_not_grow_with_tenants(queue_mgr, tenants):
+    #interactive (8) vs default (4) with a single tenant: 2:1 however many interactive tenants are backlogged
+    for n in range(12):
+        for tenant in range(tenants):
+            await enqueue(queue_mgr, f'interactive:{tenant}:{n}', 'interactive', str(tenant))
+        await enqueue(queue_mgr, f'default:-:{n}', 'default')
+
+    served = await serve(queue_mgr, 12)
+    assert sum(task.startswith('interactive') for task in served) == 8
+    assert sum(task.startswith('default') for task in served) == 4
+
+    #tenants of one class split its share evenly
+    per_tenant = [sum(task.startswith(f'interactive:{tenant}:') for task in served) for tenant in range(tenants)]
+    assert max(per_tenant) - min(per_tenant) <= 1
+
+
+@pytest.mark.asyncio
+async def test_wait_for_slot_serves_classes_by_weight(queue_mgr):
+    keys = queue_mgr.queue_keys('llm')
+    await queue_mgr.redis.set(keys['active'], 1) #the only slot is busy while everyone enqueues
+    served = []
+
+    async def worker(priority: str, tenant: str, n: int):
+        await queue_mgr.wait_for_slot('llm', f'{priority}:{tenant}:{n}', limit=1, timeout=10, check_interval=0.01, priority=priority, tenant=tenant)
+        served.append(priority)
+        await queue_mgr.redis.decr(keys['active'])
+
+    workers = [asyncio.create_task(worker(priority, tenant, n))
+               for n in range(6)
+               for priority, tenant in (('interactive', 'a'), ('interactive', 'b'), ('interactive', 'c'), ('batch', '-'))]
+    await asyncio.sleep(0.1)
+    await queue_mgr.redis.decr(keys['active'])
+    await asyncio.gather(*workers)
+
+    #interactive:batch = 8:1 over the first 9 slots, even with 3 interactive tenants
+    assert served[:9].count('interactive') == 8
+    assert served[:9].count('batch') == 1
+
+
+@pytest.mark.asyncio
+async def test_class_shares_are_configurable(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    queue_mgr = rqueue.RedisQueueManager(cache_client, {'interactive': 1.0, 'default': 1.0, 'batch': 1.0})
+    await queue_mgr.init_scripts()
+    for n in range(4):
+        await enqueue(queue_mgr, f'interactive{n}', 'interactive')
+        await enqueue(queue_mgr, f'batch{n}', 'batch')
+    #equal shares: the classes alternate instead of interactive taking 8 slots out of 9
+    served = await serve(queue_mgr, 4)
+    assert sorted(task.rstrip('0123456789') for task in served) == ['batch', 'batch', 'interactive', 'interactive']
+
+    with pytest.raises(ValueError):
+        rqueue.RedisQueueManager(cache_client, {'interactive': 8.0, 'batch': 0})
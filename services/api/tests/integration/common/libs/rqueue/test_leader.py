@@ -0,0 +1,51 @@
+import pytest, asyncio
+import pytest_asyncio as pytestaio
+import app.common.libs.rqueue.queue as rqueue
+from app.common.libs.rqueue.leader import LeaderElection
+
+
+@pytestaio.fixture
+async def queue_mgr(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    return mgr
+
+
+@pytest.mark.asyncio
+async def test_single_leader_and_failover(queue_mgr):
+    first = LeaderElection(queue_mgr, 'test', lease_seconds=0.3)
+    second = LeaderElection(queue_mgr, 'test', lease_seconds=0.3)
+
+    assert await first.acquire_or_renew()
+    assert not await second.acquire_or_renew()
+    assert await first.acquire_or_renew() #renewal keeps the lease
+
+    await asyncio.sleep(0.4) #leader died: the lease expires
+    assert await second.acquire_or_renew()
+    assert not await first.acquire_or_renew() #the old leader notices it lost the lease
+
+    await second.release()
+    assert await first.acquire_or_renew()
+
+
+@pytest.mark.asyncio
+async def test_run_periodic_runs_job_on_leader_only(queue_mgr):
+    runs = []
+    async def job():
+        runs.append(1)
+
+    leader = LeaderElection(queue_mgr, 'test', lease_seconds=0.3)
+    follower = LeaderElection(queue_mgr, 'test', lease_seconds=0.3)
+    tasks = [asyncio.create_task(leader.run_periodic(job, interval=10))]
+    await asyncio.sleep(0.05)
+    tasks.append(asyncio.create_task(follower.run_periodic(job, interval=10)))
+    await asyncio.sleep(0.2)
+    assert runs == [1] and leader.is_leader and not follower.is_leader
+
+    tasks[0].cancel() #shutdown releases the lease, the follower takes over on its next renew
+    await asyncio.gather(tasks[0], return_exceptions=True)
+    await asyncio.sleep(0.2)
+    assert follower.is_leader and runs == [1, 1]
+    tasks[1].cancel()
+    await asyncio.gather(tasks[1], return_exceptions=True)
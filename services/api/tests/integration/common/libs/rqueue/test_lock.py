@@ -0,0 +1,110 @@
+import pytest, asyncio, time
+import pytest_asyncio as pytestaio
+import app.common.libs.rqueue.queue as rqueue
+
+
+@pytestaio.fixture
+async def queue_mgr(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    return mgr
+
+
+@pytest.mark.asyncio
+async def test_release_is_owner_only(queue_mgr):
+    key = 'queue:vote:1'
+    await queue_mgr.redis.set(key, 'theirs')
+
+    assert not await queue_mgr.run_script('lock_release.lua', keys=[key], args=['ours', f'{key}:released'])
+    assert await queue_mgr.redis.get(key) == 'theirs'
+
+    assert await queue_mgr.run_script('lock_release.lua', keys=[key], args=['theirs', f'{key}:released'])
+    assert await queue_mgr.redis.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_same_user_is_rejected_and_lock_is_freed(queue_mgr):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id')
+    async def vote(user_id: int):
+        entered.set()
+        await leave.wait()
+        return user_id
+
+    first = asyncio.create_task(vote(user_id=1))
+    await entered.wait()
+    with pytest.raises(rqueue.RedisQueueResourceIsAlreadyUsed):
+        await vote(user_id=1)
+    assert await queue_mgr.redis.exists('queue:vote:1')
+
+    leave.set()
+    assert await first == 1
+    assert not await queue_mgr.redis.exists('queue:vote:1')
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_is_taken_over_and_not_released_by_old_holder(queue_mgr):
+    entered = asyncio.Event()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', lock_ttl=0.2)
+    async def slow_vote(user_id: int):
+        entered.set()
+        await asyncio.sleep(0.4) #outlives its lock
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', lock_ttl=5)
+    async def vote(user_id: int):
+        token = await queue_mgr.redis.get('queue:vote:1')
+        await slow #the old holder tries to release meanwhile
+        return token, await queue_mgr.redis.get('queue:vote:1')
+
+    slow = asyncio.create_task(slow_vote(user_id=1))
+    await entered.wait()
+    await asyncio.sleep(0.3) #the old holder's lock expired
+
+    token, after_old_release = await vote(user_id=1)
+    assert token is not None and after_old_release == token
+    assert not await queue_mgr.redis.exists('queue:vote:1')
+
+
+@pytest.mark.asyncio
+async def test_waiter_is_woken_by_release(queue_mgr):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', wait_timeout=5, check_interval=5)
+    async def vote(user_id: int):
+        entered.set()
+        await leave.wait()
+
+    first = asyncio.create_task(vote(user_id=1))
+    await entered.wait()
+    entered.clear()
+    waiter = asyncio.create_task(vote(user_id=1))
+    await asyncio.sleep(0.1)
+    assert not entered.is_set()
+
+    #check_interval is 5s: only the PUBLISH from lock_release.lua can wake the waiter this fast
+    released_at = time.perf_counter()
+    leave.set()
+    await first
+    await asyncio.wait_for(entered.wait(), timeout=1)
+    assert time.perf_counter() - released_at < 1
+    await waiter
+
+
+@pytest.mark.asyncio
+async def test_waiter_times_out(queue_mgr):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', wait_timeout=0.2, check_interval=0.05)
+    async def vote(user_id: int):
+        entered.set()
+        await leave.wait()
+
+    first = asyncio.create_task(vote(user_id=1))
+    await entered.wait()
+    with pytest.raises(rqueue.RedisQueueTimeoutError):
+        await vote(user_id=1)
+    leave.set()
+    await first
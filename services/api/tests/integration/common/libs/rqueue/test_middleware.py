@@ -0,0 +1,159 @@
+import pytest, asyncio, httpx
+import pytest_asyncio as pytestaio
+import redis.exceptions as rexc
+from fastapi import FastAPI
+import app.common.libs.rqueue.queue as rqueue
+from app.common.libs.rqueue.middleware import ConcurrencyLimitMiddleware, concurrency_limit
+
+
+@pytestaio.fixture
+async def queue_mgr(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    return mgr
+
+
+def make_app(queue_mgr: rqueue.RedisQueueManager | None, gate: asyncio.Event, limit: int = 1, local_limit: int | None = None, lease_seconds: float = 5) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/slow')
+    @concurrency_limit(limit, local_limit=local_limit, resource='slow', lease_seconds=lease_seconds, retry_after=2)
+    async def slow():
+        await gate.wait()
+        return {'ok': True}
+
+    @app.get('/boom')
+    @concurrency_limit(1, resource='boom')
+    async def boom():
+        raise RuntimeError('boom')
+
+    @app.get('/free')
+    async def free():
+        return {'ok': True}
+
+    app.add_middleware(ConcurrencyLimitMiddleware)
+    app.state.rqueue = queue_mgr
+    return app
+
+def client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://app')
+
+async def occupy(queue_mgr: rqueue.RedisQueueManager, resource: str, n: int, lease: float = 5):
+    """Slots held by other workers of the cluster"""
+    for i in range(n):
+        acquired, *_ = await queue_mgr.run_script('semaphore_acquire.lua', keys=[f'semaphore:{resource}', f'semaphore:{resource}:shed'], args=[f'other{i}', n, lease, 1])
+        assert acquired
+
+
+@pytest.mark.asyncio
+async def test_admits_and_releases(queue_mgr):
+    gate = asyncio.Event()
+    gate.set()
+    async with client(make_app(queue_mgr, gate, limit=2)) as c:
+        responses = await asyncio.gather(c.get('/slow'), c.get('/slow'), c.get('/free'))
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert await queue_mgr.redis.zcard('semaphore:slow') == 0
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_cluster_is_full(queue_mgr):
+    await occupy(queue_mgr, 'slow', 1)
+    async with client(make_app(queue_mgr, asyncio.Event(), limit=1)) as c:
+        first, second, third = [await c.get('/slow') for _ in range(3)]
+
+    assert first.status_code == 503
+    assert first.headers['Retry-After'] == '2'
+    assert first.headers['X-Queue-Position'] == '1'
+    assert first.json() == {'detail': 'Server is busy, retry later', 'limit': 1, 'in_flight': 1, 'queue_position': 1}
+    #callers already told to retry are ahead: positions grow, and so does Retry-After (one limit's worth per retry_after)
+    assert (second.headers['X-Queue-Position'], second.headers['Retry-After']) == ('2', '4')
+    assert (third.headers['X-Queue-Position'], third.headers['Retry-After']) == ('3', '6')
+    assert await queue_mgr.redis.zcard('semaphore:slow') == 1
+
+
+@pytest.mark.asyncio
+async def test_sheds_locally_without_asking_redis(queue_mgr):
+    gate = asyncio.Event()
+    async with client(make_app(queue_mgr, gate, limit=10, local_limit=1)) as c:
+        running = asyncio.create_task(c.get('/slow'))
+        await asyncio.sleep(0.05)
+        shed = await c.get('/slow')
+        assert await queue_mgr.redis.zcard('semaphore:slow') == 1
+        gate.set()
+        assert (await running).status_code == 200
+
+    assert shed.status_code == 503
+    assert (shed.headers['X-Queue-Position'], shed.headers['Retry-After']) == ('1', '2')
+    assert not await queue_mgr.redis.exists('semaphore:slow:shed')
+    assert await queue_mgr.redis.zcard('semaphore:slow') == 0
+
+
+@pytest.mark.asyncio
+async def test_releases_slot_when_endpoint_raises(queue_mgr):
+    async with client(make_app(queue_mgr, asyncio.Event())) as c:
+        for _ in range(2): #the second call would be shed if the first leaked its slot
+            with pytest.raises(RuntimeError):
+                await c.get('/boom')
+    assert await queue_mgr.redis.zcard('semaphore:boom') == 0
+
+
+@pytest.mark.asyncio
+async def test_fails_open_when_redis_is_unavailable(queue_mgr, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise rexc.ConnectionError('Redis is down')
+    monkeypatch.setattr(queue_mgr, 'run_script', broken)
+    gate = asyncio.Event()
+    gate.set()
+    async with client(make_app(queue_mgr, gate)) as c:
+        responses = await asyncio.gather(c.get('/slow'), c.get('/slow'))
+    assert [r.status_code for r in responses] == [200, 200]
+
+
+@pytest.mark.asyncio
+async def test_semaphore_lease_of_crashed_holder_expires(queue_mgr):
+    await occupy(queue_mgr, 'slow', 1, lease=0.1)
+    keys = ['semaphore:slow', 'semaphore:slow:shed']
+    acquired, in_flight, position, _ = await queue_mgr.run_script('semaphore_acquire.lua', keys=keys, args=['mine', 1, 5, 1])
+    assert (acquired, in_flight, position) == (0, 1, 1)
+
+    await asyncio.sleep(0.2) #the holder never released: its lease runs out
+    acquired, in_flight, *_ = await queue_mgr.run_script('semaphore_acquire.lua', keys=keys, args=['mine', 1, 5, 1])
+    assert (acquired, in_flight) == (1, 1)
+    assert await queue_mgr.redis.zrange('semaphore:slow', 0, -1) == ['mine']
+
+
+@pytest.mark.asyncio
+async def test_request_outliving_its_lease_keeps_the_slot(queue_mgr):
+    gate = asyncio.Event()
+    keys = ['semaphore:slow', 'semaphore:slow:shed']
+    async with client(make_app(queue_mgr, gate, limit=1, lease_seconds=0.3)) as c:
+        running = asyncio.create_task(c.get('/slow'))
+        await asyncio.sleep(1) #several leases: without renewal the slot would have been freed
+        acquired, in_flight, *_ = await queue_mgr.run_script('semaphore_acquire.lua', keys=keys, args=['other', 1, 5, 1])
+        assert (acquired, in_flight) == (0, 1)
+        gate.set()
+        assert (await running).status_code == 200
+    assert await queue_mgr.redis.zcard('semaphore:slow') == 0
+
+
+@pytest.mark.asyncio
+async def test_semaphore_renewal_is_owner_only(queue_mgr):
+    await occupy(queue_mgr, 'slow', 1, lease=0.1)
+    assert not await queue_mgr.run_script('semaphore_renew.lua', keys=['semaphore:slow'], args=['mine', 5])
+    assert await queue_mgr.run_script('semaphore_renew.lua', keys=['semaphore:slow'], args=['other0', 5])
+    await asyncio.sleep(0.2)
+    acquired, *_ = await queue_mgr.run_script('semaphore_acquire.lua', keys=['semaphore:slow', 'semaphore:slow:shed'], args=['mine', 1, 5, 1])
+    assert not acquired
+
+
+@pytest.mark.asyncio
+async def test_lease_renewal_is_owner_only(queue_mgr):
+    await queue_mgr.redis.set('leader:test', 'mine', px=200)
+    assert not await queue_mgr.run_script('lease_renew.lua', keys=['leader:test'], args=['theirs', 5000])
+    assert await queue_mgr.redis.pttl('leader:test') <= 200
+
+    assert await queue_mgr.run_script('lease_renew.lua', keys=['leader:test'], args=['mine', 5000])
+    assert await queue_mgr.redis.pttl('leader:test') > 200
+    await asyncio.sleep(0.3)
+    assert await queue_mgr.redis.get('leader:test') == 'mine'
@@ -0,0 +1,129 @@
+import pytest, asyncio
+import pytest_asyncio as pytestaio
+import app.common.libs.rqueue.queue as rqueue
+
+
+@pytestaio.fixture
+async def queue_mgr(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    return mgr
+
+@pytest.fixture
+def instruments(mocker, monkeypatch):
+    names = ('user_lock_hold_seconds', 'user_lock_wait_seconds', 'user_lock_contention_total',
+             'queue_wait_seconds', 'queue_timeouts_total', 'queue_rejections_total')
+    mocks = {name: mocker.MagicMock() for name in names}
+    for name, mock in mocks.items():
+        monkeypatch.setattr(rqueue, name, mock)
+    return mocks
+
+
+@pytest.mark.asyncio
+async def test_sampler_sees_resources_queued_by_other_processes(queue_mgr):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    @queue_mgr.use_queue_for_resource('llm', limit=1, exec_timeout=5, timeout=5, check_interval=0.01)
+    async def generate():
+        entered.set()
+        await leave.wait()
+
+    running = asyncio.create_task(generate())
+    await entered.wait()
+    waiting = asyncio.create_task(generate())
+    await asyncio.sleep(0.05)
+
+    #a process that never decorated 'llm' (e.g. another worker running only the sampler)
+    sampler = rqueue.RedisQueueManager(queue_mgr.redis)
+    assert await sampler.sample_queue_stats() == {'llm': (1, 1)}
+
+    leave.set()
+    await asyncio.gather(running, waiting)
+    assert await sampler.sample_queue_stats() == {'llm': (0, 0)}
+
+
+@pytest.mark.asyncio
+async def test_sampler_drops_idle_resources(queue_mgr):
+    await queue_mgr.wait_for_slot('llm', 'task', limit=1, timeout=1)
+    await queue_mgr.redis.decr(queue_mgr.queue_keys('llm')['active'])
+    sampler = rqueue.RedisQueueManager(queue_mgr.redis)
+    assert await sampler.sample_queue_stats() == {'llm': (0, 0)}
+
+    await queue_mgr.redis.delete(queue_mgr.flows_key('llm', 'default')) #FLOW_STATE_TTL elapsed
+    assert await sampler.sample_queue_stats() == {'llm': (0, 0)}
+    assert not await queue_mgr.redis.sismember(rqueue.REDIS_RESOURCES_KEY, 'llm')
+    assert await sampler.sample_queue_stats() == {}
+
+
+class OtelMetricsMock:
+    @staticmethod
+    def Observation(value, attributes):
+        return value, attributes
+
+@pytest.mark.asyncio
+async def test_sample_metrics_task_feeds_gauges(queue_mgr, monkeypatch):
+    monkeypatch.setattr(rqueue, 'metrics', OtelMetricsMock)
+    monkeypatch.setattr(rqueue, '_queue_stats', {})
+    await queue_mgr.wait_for_slot('llm', 'first', limit=1, timeout=1)
+    waiter = asyncio.create_task(queue_mgr.wait_for_slot('llm', 'second', limit=1, timeout=5, check_interval=0.01))
+    await asyncio.sleep(0.05)
+
+    task = asyncio.create_task(queue_mgr.sample_metrics_task(interval=10))
+    await asyncio.sleep(0.05)
+    for t in (task, waiter):
+        t.cancel()
+    await asyncio.gather(task, waiter, return_exceptions=True)
+
+    assert rqueue.observe_queue_length() == [(1, {'resource': 'llm'})]
+    assert rqueue.observe_active_slots() == [(1, {'resource': 'llm'})]
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_and_timeout_metrics(queue_mgr, instruments):
+    await queue_mgr.wait_for_slot('llm', 'first', limit=1, timeout=1, priority='batch')
+    instruments['queue_wait_seconds'].record.assert_called_once()
+    assert instruments['queue_wait_seconds'].record.call_args.args[1] == {'resource': 'llm', 'priority': 'batch'}
+
+    with pytest.raises(rqueue.RedisQueueTimeoutError):
+        await queue_mgr.wait_for_slot('llm', 'second', limit=1, timeout=0.05, check_interval=0.01, priority='batch')
+    instruments['queue_timeouts_total'].add.assert_called_once_with(1, {'resource': 'llm', 'priority': 'batch'})
+    assert await queue_mgr.redis.zcard(queue_mgr.queue_keys('llm')['waiting']) == 0
+
+
+@pytest.mark.asyncio
+async def test_lock_metrics(queue_mgr, instruments):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id')
+    async def vote(user_id: int):
+        entered.set()
+        await leave.wait()
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', wait_timeout=1, check_interval=0.01)
+    async def patient_vote(user_id: int):
+        pass
+
+    @queue_mgr.lock_for_same_user('vote', 'user_id', wait_timeout=0.05, check_interval=0.01)
+    async def impatient_vote(user_id: int):
+        pass
+
+    first = asyncio.create_task(vote(user_id=1))
+    await entered.wait()
+    with pytest.raises(rqueue.RedisQueueResourceIsAlreadyUsed):
+        await vote(user_id=1)
+    with pytest.raises(rqueue.RedisQueueTimeoutError):
+        await impatient_vote(user_id=1)
+    patient = asyncio.create_task(patient_vote(user_id=1))
+    await asyncio.sleep(0.05)
+    leave.set()
+    await asyncio.gather(first, patient)
+
+    outcomes = [c.args for c in instruments['user_lock_contention_total'].add.call_args_list]
+    assert outcomes == [
+        (1, {'resource': 'vote', 'outcome': 'rejected'}),
+        (1, {'resource': 'vote', 'outcome': 'timeout'}),
+        (1, {'resource': 'vote', 'outcome': 'waited'}),
+    ]
+    assert instruments['user_lock_wait_seconds'].record.call_count == 2
+    assert instruments['user_lock_hold_seconds'].record.call_count == 2 #first and patient; rejected ones never held it
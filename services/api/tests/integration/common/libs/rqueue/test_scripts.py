@@ -0,0 +1,37 @@
+import pytest
+import app.common.libs.rqueue.queue as rqueue
+
+
+@pytest.mark.asyncio
+async def test_init_scripts_reloads_missing_registry(cache_client):
+    #done-marker survived a Redis restart, or allkeys-lru evicted the registry: workers must not crash-loop
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    assert 'lock_release.lua' in mgr.scripts
+    assert await cache_client.hgetall(rqueue.REDIS_SCRIPTS_KEY) == mgr.scripts
+
+    await cache_client.hdel(rqueue.REDIS_SCRIPTS_KEY, 'lock_release.lua')
+    other = rqueue.RedisQueueManager(cache_client)
+    await other.init_scripts()
+    assert other.scripts == mgr.scripts
+
+
+@pytest.mark.asyncio
+async def test_run_script_reloads_on_noscript(cache_client):
+    await rqueue.load_scripts_to_redis(cache_client)
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+
+    await cache_client.script_flush() #Redis restarted: the registry is there, the script cache is not
+    await cache_client.set('queue:vote:1', 'token')
+    assert await mgr.run_script('lock_release.lua', keys=['queue:vote:1'], args=['token', 'queue:vote:1:released']) == 1
+    assert not await cache_client.exists('queue:vote:1')
+    assert await mgr.run_script('lease_renew.lua', keys=['leader:test'], args=['token', 1000]) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_script_unknown_name(cache_client):
+    mgr = rqueue.RedisQueueManager(cache_client)
+    await mgr.init_scripts()
+    with pytest.raises(KeyError):
+        await mgr.run_script('missing.lua', keys=[])
@@ -56,5 +56,13 @@ async def test_redis_flush(mgr: ideps.RedisConnectionManager):
 
     with pytest.raises(iexc.StorageNotInitialzied):
         await mgr.flush_data()
-    
 
+
+@pytest.mark.asyncio
+async def test_redis_warm_up(mgr: ideps.RedisConnectionManager):
+    await mgr.warm_up(3)
+    #connections are opened and returned to the pool, ready for the first requests
+    assert len(mgr._pool._available_connections) >= 3
+    assert all(conn.is_connected for conn in mgr._pool._available_connections)
+    await mgr.warm_up(0)
+    await mgr.close()
@@ -12,8 +12,28 @@ async def test_metric_active_users_repo_redis(cache_client):
     assert await repo.redis.zscore(repo.zset_key, 123) is not None
     await repo.remove_old(0)
     assert await repo.get_active_count(100) == 0
+    await repo.register_many([1, 2, 3])
+    await repo.register_many([])
+    assert await repo.get_active_count(100) == 3
 
 
+@pytest.mark.asyncio
+async def test_metric_active_users_repo_hll(cache_client):
+    import app.infrastructure.repositories as repos
+    import datetime as dt
+    repo = repos.RedisHLLMetricActiveUserStorage(cache_client, key_prefix='test:hll', bucket_sec=60, rollup_sec=600)
+    assert await repo.get_active_count(3600) == 0
+    await repo.register_activity(1)
+    await repo.register_activity(1)
+    await repo.register_many([2, 4])
+    assert await repo.get_active_count(3600) == 3
 
-
-    
\ No newline at end of file
+    #users seen in older buckets are counted through a roll-up of their (completed) period
+    current = int(dt.datetime.now().timestamp() // 60)
+    old_bucket = (current // 10 - 2) * 10
+    await cache_client.pfadd(repo.bucket_key(old_bucket), 2, 3)
+    assert await repo.get_active_count(3600) == 4
+    assert await cache_client.exists(repo.rollup_key(old_bucket // 10))
+    assert 0 < await cache_client.ttl(repo.bucket_key(current)) <= repo.retention_sec
+    await repo.remove_old(0) #no-op: keys expire
+    assert await repo.get_active_count(3600) == 4
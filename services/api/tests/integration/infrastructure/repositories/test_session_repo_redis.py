@@ -0,0 +1,88 @@
+import app.infrastructure.dependencies as ideps
+import app.infrastructure.cache.codecs as codecs
+import app.application.models as amod
+from app.infrastructure.security.refresh_tokens import hash_refresh_token as hash_of
+from tests.helpers.tokens import refresh_token_matches
+import pytest, json, asyncio
+
+
+def make_session(user_id: int = 1, token: str = 'token') -> amod.RotatingTokenSession:
+    return amod.RotatingTokenSession(user_id=user_id, roles=['user'], refresh_token_hash=hash_of(token))
+
+
+@pytest.mark.asyncio
+async def test_session_repo_hash_roundtrip_and_rotation(cache_client):
+    repo = ideps.SessionRepository(cache_client)
+    session = make_session()
+    await repo.create(session, 60)
+    assert await cache_client.type(f'session:{session.id}') == 'hash'
+    assert await repo.get_session(session.id) == session
+
+    assert await repo.rotate(session.id, hash_of('token'), hash_of('rotated'), 120) == amod.RotationResult.ROTATED
+    stored = await repo.get_session(session.id)
+    assert refresh_token_matches(stored.refresh_token_hash, 'rotated') and not refresh_token_matches(stored.refresh_token_hash, 'token')
+    assert 60 < await cache_client.ttl(f'session:{session.id}') <= 120
+
+    await repo.delete(session.id)
+    assert await repo.get_session(session.id) is None
+    assert await repo.list_user_sessions(session.user_id) == []
+    assert await repo.rotate(session.id, hash_of('rotated'), hash_of('again'), 120) == amod.RotationResult.NOT_FOUND
+    assert not await cache_client.exists(f'session:{session.id}')
+
+
+@pytest.mark.asyncio
+async def test_session_repo_revokes_all_sessions_of_a_user(cache_client):
+    repo = ideps.SessionRepository(cache_client)
+    sessions = [make_session(user_id=1) for _ in range(3)]
+    other = make_session(user_id=2)
+    for session in [*sessions, other]:
+        await repo.create(session, 60)
+    await cache_client.delete(f'session:{sessions[0].id}') #expired: pruned from the index
+
+    assert await repo.list_user_sessions(1) == sorted(s.id for s in sessions[1:])
+    assert await repo.delete_user_sessions(1) == 2
+    assert all([await repo.get_session(s.id) is None for s in sessions])
+    assert await repo.get_session(other.id) == other
+    assert await repo.delete_user_sessions(1) == 0
+
+
+@pytest.mark.asyncio
+async def test_session_repo_reads_and_upgrades_string_sessions(cache_client):
+    repo = ideps.SessionRepository(cache_client)
+    legacy = {'id': 'legacy-session', 'user_id': 5, 'roles': ['user'], 'refresh_token': 'old'}
+    await cache_client.set('session:legacy-session', json.dumps(legacy), ex=60)
+    session = await repo.get_session('legacy-session')
+    assert refresh_token_matches(session.refresh_token_hash, 'old')
+
+    assert await repo.rotate('legacy-session', hash_of('old'), hash_of('new'), 60) == amod.RotationResult.ROTATED
+    assert await cache_client.type('session:legacy-session') == 'hash'
+    assert refresh_token_matches((await repo.get_session('legacy-session')).refresh_token_hash, 'new')
+    assert await repo.list_user_sessions(5) == ['legacy-session']
+
+    await cache_client.set('session:struct-session', codecs.SessionCodec().encode(make_session(user_id=6)), ex=60)
+    await repo.delete('struct-session')
+    assert not await cache_client.exists('session:struct-session')
+
+
+@pytest.mark.asyncio
+async def test_session_repo_rotation_is_atomic_and_detects_reuse(cache_client):
+    repo = ideps.SessionRepository(cache_client)
+    session, sibling = make_session(user_id=3), make_session(user_id=3)
+    await repo.create(session, 60)
+    await repo.create(sibling, 60)
+
+    #two refreshes racing with the same token: exactly one wins, the other one is a reuse
+    results = await asyncio.gather(*(repo.rotate(session.id, hash_of('token'), hash_of(f'new{i}'), 60) for i in range(2)))
+    assert sorted(results) == sorted([amod.RotationResult.ROTATED, amod.RotationResult.REUSED])
+    #reuse revokes the session (the whole token family), not the user's other sessions
+    assert await repo.get_session(session.id) is None
+    assert await repo.list_user_sessions(3) == [sibling.id]
+
+
+@pytest.mark.asyncio
+async def test_session_repo_rotation_reloads_flushed_script(cache_client):
+    repo = ideps.SessionRepository(cache_client)
+    session = make_session()
+    await repo.create(session, 60)
+    await cache_client.script_flush()
+    assert await repo.rotate(session.id, hash_of('token'), hash_of('new'), 60) == amod.RotationResult.ROTATED
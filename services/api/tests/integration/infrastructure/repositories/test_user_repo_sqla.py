@@ -141,3 +141,12 @@ async def test_ensure_admin_exists(uow):
     admin = await db.get_by_username(DEFAULT_ADMIN_USERNAME)
     assert admin.role == dmod.Role.ADMIN.value
 
+
+@pytest.mark.asyncio
+async def test_user_repo_warm_up(uow):
+    db = ideps.UserDB(uow.session)
+    cache_size = len(uow.session.bind.sync_engine._compiled_cache or {})
+    await db.warm_up()
+    #hot queries are compiled and cached, nothing is written
+    assert len(uow.session.bind.sync_engine._compiled_cache) > cache_size
+    assert not uow.session.new and not uow.session.dirty
@@ -18,6 +18,7 @@ async def test_refresh_active_users_task(cache_client):
     import app.infrastructure.telemetry.metrics.active_users as m
     m._active_users_daily = 0
     m._active_users_lasthour = 0
+    assert await m.publish_active_users_snapshot() == {'lasthour': 1, 'daily': 1} #leader job
     task = asyncio.create_task(m.refresh_active_users_task())
     await asyncio.sleep(0.1)
     task.cancel()
@@ -0,0 +1,15 @@
+import pytest
+import app.bootstrap as bootstrap
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_runs_once_per_deployment(cache_manager, database_manager, cache_client, mocker, monkeypatch):
+    monkeypatch.delenv(bootstrap.BOOTSTRAP_DONE_ENV, raising=False)
+    run = mocker.spy(bootstrap, 'run_bootstrap')
+
+    await bootstrap.ensure_bootstrapped(cache_manager, database_manager)
+    await bootstrap.ensure_bootstrapped(cache_manager, database_manager) #another worker: done-marker found
+    assert run.call_count == 1
+    assert await cache_client.exists(bootstrap.BOOTSTRAP_DONE_KEY)
+    assert not await cache_client.exists(bootstrap.BOOTSTRAP_LOCK_KEY)
+    assert await cache_client.hgetall('rqueue:scripts')
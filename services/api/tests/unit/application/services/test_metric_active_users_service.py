@@ -18,3 +18,59 @@ async def test_metric_active_users_service(mocker):
     assert await service.register_activity(1) is None
     assert await service.count_activity(timespan=dt.timedelta(hours=1), cleanup=True) == 1
 
+
+
+def test_activity_debouncer():
+    debouncer = svc.ActivityDebouncer(window_sec=10)
+    assert debouncer.mark(1, now=0)
+    assert not debouncer.mark(1, now=5) #same user within the window
+    assert debouncer.mark(2, now=5)
+    assert sorted(debouncer.drain(now=6)) == [1, 2]
+    assert debouncer.drain(now=6) == []
+
+    assert not debouncer.mark(1, now=9)
+    debouncer.drain(now=12) #forgets user 1 (window passed), keeps user 2
+    assert debouncer.mark(1, now=12)
+    assert not debouncer.mark(2, now=12)
+
+
+@pytest.mark.asyncio
+async def test_metric_active_users_service_debounced(mocker):
+    mock_repo = mocker.AsyncMock()
+    service = svc.MetricActiveUsersService(mock_repo, svc.ActivityDebouncer(window_sec=60))
+    for _ in range(3):
+        await service.register_activity(1)
+    await service.register_activity(2)
+    mock_repo.register_activity.assert_not_called()
+
+    assert await service.flush() == 2
+    assert sorted(mock_repo.register_many.call_args.args[0]) == [1, 2]
+    assert await service.flush() == 0
+    mock_repo.register_many.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_metric_active_users_service_requeues_failed_batch(mocker):
+    mock_repo = mocker.AsyncMock()
+    mock_repo.register_many.side_effect = [ConnectionError('Redis is down'), None]
+    service = svc.MetricActiveUsersService(mock_repo, svc.ActivityDebouncer(window_sec=60))
+    await service.register_activity(1)
+    await service.register_activity(2)
+
+    with pytest.raises(ConnectionError):
+        await service.flush()
+    await service.register_activity(3)
+
+    assert await service.flush() == 3 #the failed batch is written with the next one
+    assert sorted(mock_repo.register_many.call_args.args[0]) == [1, 2, 3]
+
+
+def test_activity_debouncer_max_pending():
+    debouncer = svc.ActivityDebouncer(window_sec=10, max_pending=2)
+    assert debouncer.mark(1, now=0) and debouncer.mark(2, now=0)
+    assert not debouncer.mark(3, now=0) #full: dropped, and not debounced either
+    batch = debouncer.drain(now=1)
+
+    assert debouncer.mark(3, now=1)
+    assert debouncer.requeue(batch) == 1 #only one of the failed batch fits back
+    assert len(debouncer.drain(now=2)) == 2
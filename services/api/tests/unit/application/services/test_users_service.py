@@ -292,4 +292,46 @@ async def test_user_service_admin_update(
 
 
 
- 
\ No newline at end of file
+ 
+
+
+@pytest.mark.parametrize("edited_status, revoked", [
+    (dmod.Status.DEACTIVATED, True),
+    (dmod.Status.ACTIVE, False),
+    (None, False),
+])
+@pytest.mark.asyncio
+async def test_user_service_admin_deactivation_revokes_sessions(mocker: MockerFixture, hasher, user_data, edited_status, revoked):
+    mock_user_repo = mocker.AsyncMock()
+    mock_session_repo = mocker.AsyncMock()
+    hooks = []
+    mock_uow = mocker.Mock()
+    mock_uow.add_post_commit_hook.side_effect = hooks.append
+    target_user = dmod.User(**user_data, password_hash='somehash', version=1)
+    mock_user_repo.get_by_id.return_value = target_user
+    mock_user_repo.update.return_value = target_user
+    admin = schemas.UserDTO(id=99, username='admin', role=dmod.Role.ADMIN, status=dmod.Status.ACTIVE)
+
+    service = svc.UserService(mock_user_repo, hasher, mock_session_repo, mock_uow)
+    await service.admin_update(admin, target_user.id, schemas.PrivateUserUpdateModel(status=edited_status))
+    #nothing is revoked before the commit: the update may still be rolled back
+    mock_session_repo.delete_user_sessions.assert_not_awaited()
+    assert len(hooks) == (1 if revoked else 0)
+
+    for hook in hooks: #what the unit of work runs after a successful commit
+        await hook()
+    if revoked:
+        mock_session_repo.delete_user_sessions.assert_awaited_once_with(target_user.id)
+    else:
+        mock_session_repo.delete_user_sessions.assert_not_awaited()
+
+
+@pytest.mark.parametrize("with_session_repo, with_uow", [(True, False), (False, True)])
+def test_user_service_requires_session_repo_and_uow_together(mocker: MockerFixture, hasher, with_session_repo, with_uow):
+    with pytest.raises(ValueError):
+        svc.UserService(
+            mocker.AsyncMock(),
+            hasher,
+            mocker.AsyncMock() if with_session_repo else None,
+            mocker.Mock() if with_uow else None,
+        )
@@ -0,0 +1,69 @@
+import pytest, asyncio, signal, os
+from app.common.libs.drain import DrainCoordinator
+
+
+@pytest.fixture
+def previous_handler():
+    """Stands in for uvicorn's handler: records the signals handed over to it"""
+    received = []
+    original = signal.signal(signal.SIGTERM, lambda sig, frame: received.append(sig))
+    yield received
+    signal.signal(signal.SIGTERM, original)
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_wakes_up_when_last_request_finishes():
+    drain = DrainCoordinator()
+    drain.request_started()
+    drain.request_started()
+    drain.draining = True
+    waiter = asyncio.create_task(drain.wait_idle(timeout=1))
+    await drain.request_finished()
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    await drain.request_finished()
+    assert await waiter is True
+    assert drain.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_is_bounded():
+    drain = DrainCoordinator()
+    drain.request_started()
+    assert await drain.wait_idle(timeout=0.05) is False
+    assert await DrainCoordinator().wait_idle(timeout=0.05) is True
+
+
+@pytest.mark.asyncio
+async def test_signal_drains_then_hands_over(previous_handler):
+    drain = DrainCoordinator(timeout=1)
+    drain.install_signal_handlers()
+    try:
+        drain.request_started()
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(0.05)
+        #readiness fails at once, the server keeps running until the request is done
+        assert drain.draining
+        assert previous_handler == []
+        await drain.request_finished()
+        await asyncio.sleep(0.01)
+        assert previous_handler == [signal.SIGTERM]
+    finally:
+        drain.restore_signal_handlers()
+
+
+@pytest.mark.asyncio
+async def test_drain_timeout_and_second_signal(previous_handler):
+    drain = DrainCoordinator(timeout=0.05)
+    drain.install_signal_handlers()
+    try:
+        drain.request_started() #never finishes
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(0.2)
+        assert previous_handler == [signal.SIGTERM]
+        #a repeated signal is handed over without waiting
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(0)
+        assert previous_handler == [signal.SIGTERM, signal.SIGTERM]
+    finally:
+        drain.restore_signal_handlers()
@@ -0,0 +1,77 @@
+import pytest
+from prometheus_client.openmetrics.parser import text_string_to_metric_families
+import app.common.libs.prom_multiproc as prom_mp
+
+
+def worker_dump(requests: float, in_flight: float, active: float, bucket: float, exemplar: str = '') -> str:
+    return f'''# HELP http_requests Total number of HTTP requests
+# TYPE http_requests counter
+http_requests_total{{http_method="GET",status_code="200"}} {requests}
+http_requests_created{{http_method="GET",status_code="200"}} 1.7e9
+# HELP http_requests_in_flight In-flight requests
+# TYPE http_requests_in_flight gauge
+http_requests_in_flight {in_flight}
+# HELP users_active_now Active users
+# TYPE users_active_now gauge
+users_active_now {active}
+# HELP latency_seconds Latency
+# TYPE latency_seconds histogram
+latency_seconds_bucket{{le="0.1"}} {bucket}{exemplar}
+latency_seconds_bucket{{le="+Inf"}} {bucket}
+latency_seconds_count {bucket}
+latency_seconds_sum {bucket / 10}
+# EOF
+'''
+
+def samples(data: bytes) -> dict:
+    return {
+        (s.name, tuple(sorted(s.labels.items()))): s.value
+        for family in text_string_to_metric_families(data.decode())
+        for s in family.samples
+    }
+
+
+def test_aggregate_sums_counters_and_maxes_gauges():
+    families = prom_mp.aggregate(
+        [worker_dump(3, 1, 40, 2), worker_dump(5, 2, 42, 4)],
+        sum_gauges={'http_requests_in_flight'},
+    )
+    values = samples(prom_mp.render(families))
+    assert values[('http_requests_total', (('http_method', 'GET'), ('status_code', '200')))] == 8
+    assert values[('http_requests_in_flight', ())] == 3
+    assert values[('users_active_now', ())] == 42
+    assert values[('latency_seconds_bucket', (('le', '0.1'),))] == 6
+    assert values[('latency_seconds_sum', ())] == pytest.approx(0.6)
+    assert not any(name.endswith('_created') for name, _ in values)
+
+
+def test_archive_keeps_exited_worker_counters(tmp_path, monkeypatch):
+    monkeypatch.setenv(prom_mp.DIRECTORY_ENV, str(tmp_path)) #restored after the test
+    prom_mp.prepare_directory(str(tmp_path))
+    (tmp_path / '100.prom').write_text(worker_dump(3, 1, 40, 2))
+    (tmp_path / '101.prom').write_text(worker_dump(5, 2, 42, 4))
+
+    prom_mp.archive_worker(str(tmp_path), 100)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['101.prom', prom_mp.ARCHIVE_FILE]
+
+    values = samples(prom_mp.render(prom_mp.MultiprocessCollector(str(tmp_path), {'http_requests_in_flight'}).collect()))
+    assert values[('http_requests_total', (('http_method', 'GET'), ('status_code', '200')))] == 8 #exited worker still counted
+    assert values[('http_requests_in_flight', ())] == 2 #gauges of exited workers are gone
+
+
+def test_aggregate_keeps_newest_exemplar():
+    families = prom_mp.aggregate([
+        worker_dump(1, 0, 0, 2, ' # {trace_id="aaaa"} 0.05 1700000000.0'),
+        worker_dump(1, 0, 0, 4, ' # {trace_id="bbbb"} 0.07 1700000005.0'),
+        worker_dump(1, 0, 0, 1),
+    ])
+    rendered = prom_mp.render(families)
+    [bucket] = [
+        sample
+        for family in text_string_to_metric_families(rendered.decode())
+        for sample in family.samples
+        if sample.name == 'latency_seconds_bucket' and sample.labels['le'] == '0.1'
+    ]
+    assert bucket.value == 7
+    assert bucket.exemplar.labels == {'trace_id': 'bbbb'}
+    assert bucket.exemplar.value == 0.07
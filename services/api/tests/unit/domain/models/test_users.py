@@ -138,4 +138,22 @@ async def test_password_change(valid_user: dmod.User, hasher: AsyncHasherAdapter
         await valid_user.change_password(old, new, hasher)
         assert await hasher.verify(password=new, hashed=valid_user.password_hash)
 
-    
\ No newline at end of file
+    
+
+@pytest.mark.models
+@pytest.mark.parametrize("role, status", [(dmod.Role.ADMIN, dmod.Status.ACTIVE), ('user', 'deactivated')])
+def test_from_trusted_matches_validated_user(role, status):
+    data = dict(id=1, username='test', password_hash='somehash', role=role, status=status, version=2)
+    trusted = dmod.User.from_trusted(**data)
+    assert trusted == dmod.User(**data)
+    assert isinstance(trusted.role, dmod.Role) and isinstance(trusted.status, dmod.Status)
+    assert trusted.model_dump() == dmod.User(**data).model_dump()
+
+
+@pytest.mark.models
+def test_from_trusted_user_still_validates_assignment():
+    user = dmod.User.from_trusted(1, 'test', 'somehash', 'user', 'active', 0)
+    with pytest.raises(domexc.UserValueError, match='only numbers and letters'):
+        user.username = 'not valid!'
+    user.username = 'valid'
+    assert user.username == 'valid'
@@ -0,0 +1,96 @@
+import pytest, json
+import app.infrastructure.cache.codecs as codecs
+import app.domain.models as dmod
+import app.application.models as amod
+from app.infrastructure.security.refresh_tokens import hash_refresh_token
+from tests.helpers.tokens import refresh_token_matches
+
+FORMATS = [
+    codecs.STRUCT,
+    codecs.JSON,
+    codecs.MSGPACK,
+]
+
+
+def make_user(id: int | None = 1, version: int | None = 3) -> dmod.User:
+    return dmod.User(id=id, username=f'user{id}', password_hash='$argon2id$v=19$hash', role=dmod.Role.ADMIN, status=dmod.Status.DEACTIVATED, version=version)
+
+
+def make_session() -> amod.RotatingTokenSession:
+    return amod.RotatingTokenSession(user_id=7, roles=['admin', 'user'], refresh_token_hash=hash_refresh_token('refresh-token'))
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('user', [make_user(), make_user(id=None, version=None)])
+def test_user_roundtrip(fmt, user):
+    codec = codecs.UserCodec(fmt)
+    assert codec.decode(codec.encode(user)) == user
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_user_list_roundtrip(fmt):
+    codec = codecs.UserCodec(fmt)
+    users = [make_user(i) for i in range(1, 4)]
+    assert codec.decode_many(codec.encode_many(users)) == users
+    assert codec.decode_many(codec.encode_many([])) == []
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_session_roundtrip(fmt):
+    codec = codecs.SessionCodec(fmt)
+    session = make_session()
+    decoded = codec.decode(codec.encode(session))
+    assert decoded == session
+    assert refresh_token_matches(decoded.refresh_token_hash, 'refresh-token')
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_every_format_is_readable_by_every_codec(fmt):
+    #rolling deploys: workers writing different formats share the cache
+    user = make_user()
+    encoded = codecs.UserCodec(fmt).encode(user)
+    for reader in FORMATS:
+        assert codecs.UserCodec(reader).decode(encoded) == user
+
+
+def test_struct_is_smaller_than_json():
+    user, session = make_user(), make_session()
+    assert len(codecs.UserCodec(codecs.STRUCT).encode(user)) < len(user.model_dump_json())
+    assert len(codecs.SessionCodec(codecs.STRUCT).encode(session)) < len(session.model_dump_json())
+
+
+def test_legacy_json_records_are_readable():
+    user = make_user()
+    assert codecs.UserCodec().decode(user.model_dump_json()) == user
+    assert codecs.UserCodec().decode_many(json.dumps([user.model_dump()])) == [user]
+
+
+def test_legacy_session_with_plain_refresh_token_is_hashed():
+    legacy = json.dumps({'id': 'abc', 'user_id': 1, 'roles': ['user'], 'refresh_token': 'secret'})
+    session = codecs.SessionCodec().decode(legacy)
+    assert session.refresh_token_hash == hash_refresh_token('secret')
+    assert refresh_token_matches(session.refresh_token_hash, 'secret')
+    assert not refresh_token_matches(session.refresh_token_hash, 'other')
+
+
+@pytest.mark.parametrize('data', [
+    b'\x7fwritten-by-a-newer-release',
+    b'\x01\x00\x01',
+    b'{not json',
+    b'',
+])
+def test_unknown_or_corrupt_records_raise_codec_error(data):
+    with pytest.raises(codecs.CodecError):
+        codecs.UserCodec().decode(data)
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_trailing_bytes_are_rejected(fmt):
+    codec = codecs.UserCodec(fmt)
+    with pytest.raises(codecs.CodecError):
+        codec.decode(codec.encode(make_user()) + b'\x00')
+
+
+def test_unknown_codec_name():
+    with pytest.raises(ValueError):
+        codecs.UserCodec('pickle')
@@ -0,0 +1,47 @@
+import pytest, httpx
+import app.infrastructure.http as http
+
+
+@pytest.mark.asyncio
+async def test_registry_builds_chain_and_shares_pools():
+    registry = http.OutboundClientRegistry(
+        pools={'default': {}},
+        clients={
+            'a': dict(base_url='http://a.local', retries=2, max_connections_per_host=5),
+            'b': dict(base_url='http://b.local'),
+        },
+    )
+    await registry.start()
+    a, b = registry.get('a'), registry.get('b')
+    assert isinstance(a._transport, http.RetryTransport)
+    assert isinstance(a._transport.base_transport, http.HostLimitedTransport)
+    assert isinstance(b._transport, http.InstrumentedTransport)
+    #both clients sit on the same keep-alive pool
+    assert a._transport.base_transport.base_transport.base_transport is b._transport.base_transport
+
+    with pytest.raises(KeyError):
+        registry.get('missing')
+
+    await registry.close()
+    with pytest.raises(KeyError):
+        registry.get('a')
+
+
+@pytest.mark.asyncio
+async def test_registry_config_errors():
+    registry = http.OutboundClientRegistry(pools={'default': {}}, clients={'a': dict(pool='other')})
+    with pytest.raises(KeyError):
+        await registry.start()
+    await registry.close()
+
+    registry = http.OutboundClientRegistry(pools={'default': {}}, clients={'a': dict(rate_limit={'burst_capacity': 1})})
+    with pytest.raises(ValueError):
+        await registry.start()
+    await registry.close()
+
+
+def test_http2_pool_requires_h2(monkeypatch):
+    monkeypatch.setattr(http.clients.importlib.util, 'find_spec', lambda name: None)
+    with pytest.raises(ValueError, match='h2'):
+        http.OutboundClientRegistry(pools={'default': dict(http2=True)})
+    http.OutboundClientRegistry(pools={'default': dict(http2=False)})
@@ -0,0 +1,86 @@
+import pytest, httpx, asyncio
+import app.infrastructure.http.transports as tr
+
+
+def make_mock(statuses: list[int | Exception]):
+    calls = []
+    def handler(request: httpx.Request):
+        calls.append(request)
+        result = statuses[min(len(calls), len(statuses)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return httpx.Response(result, content=b'ok')
+    return httpx.MockTransport(handler), calls
+
+
+@pytest.mark.asyncio
+async def test_retry_transport_retries_statuses_and_errors(monkeypatch):
+    monkeypatch.setattr(tr.RetryTransport, 'backoff', lambda self, attempt: 0)
+    base, calls = make_mock([httpx.ConnectError('boom'), 503, 200])
+    async with httpx.AsyncClient(transport=tr.RetryTransport(base, 'test', retries=2)) as client:
+        response = await client.get('http://example.com/')
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+    base, calls = make_mock([503])
+    async with httpx.AsyncClient(transport=tr.RetryTransport(base, 'test', retries=1)) as client:
+        response = await client.get('http://example.com/')
+    assert response.status_code == 503
+    assert len(calls) == 2
+
+    base, calls = make_mock([httpx.ConnectError('boom')])
+    async with httpx.AsyncClient(transport=tr.RetryTransport(base, 'test', retries=1)) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.get('http://example.com/')
+
+
+@pytest.mark.asyncio
+async def test_retry_transport_skips_non_idempotent():
+    base, calls = make_mock([503, 200])
+    async with httpx.AsyncClient(transport=tr.RetryTransport(base, 'test', retries=3)) as client:
+        response = await client.post('http://example.com/', content=b'x')
+    assert response.status_code == 503
+    assert len(calls) == 1
+
+
+def test_retry_backoff_is_bounded():
+    transport = tr.RetryTransport(None, 'test', backoff_base=0.1, backoff_max=0.5)
+    for attempt in range(10):
+        assert 0 <= transport.backoff(attempt) <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_host_limited_transport_releases_on_close():
+    base, _ = make_mock([200])
+    transport = tr.HostLimitedTransport(base, max_connections_per_host=1)
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream('GET', 'http://example.com/') as response:
+            assert transport._semaphore('example.com').locked()
+            #second request to the same host must wait while the first body is open
+            second = asyncio.create_task(client.get('http://example.com/'))
+            await asyncio.sleep(0.01)
+            assert not second.done()
+            await response.aread()
+        assert (await second).status_code == 200
+        assert not transport._semaphore('example.com').locked()
+
+
+@pytest.mark.asyncio
+async def test_instrumented_transport_records(mocker, monkeypatch):
+    duration = mocker.MagicMock()
+    connections = mocker.MagicMock()
+    monkeypatch.setattr(tr, 'http_client_request_duration', duration)
+    monkeypatch.setattr(tr, 'http_client_connections_total', connections)
+
+    base, _ = make_mock([201])
+    async with httpx.AsyncClient(transport=tr.InstrumentedTransport(base, 'test')) as client:
+        await client.get('http://example.com/')
+    duration.record.assert_called_once()
+    assert duration.record.call_args.args[1] == {'client': 'test', 'host': 'example.com', 'status_class': '2xx'}
+    connections.add.assert_called_once_with(1, {'client': 'test', 'host': 'example.com', 'reused': 'true'})
+
+    base, _ = make_mock([httpx.ConnectError('boom')])
+    async with httpx.AsyncClient(transport=tr.InstrumentedTransport(base, 'test')) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.get('http://example.com/')
+    assert duration.record.call_args.args[1]['status_class'] == 'error'
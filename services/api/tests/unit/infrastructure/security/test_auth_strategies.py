@@ -216,31 +216,55 @@ async def test_SOAuth_authenticate(get_full_oauth_setup, get_valid_token_pair, c
 
 
 @pytest.mark.parametrize(
-    'get_full_oauth_setup, get_valid_token_pair, tokens_match, session_exists, exc',
+    'get_full_oauth_setup, get_valid_token_pair, rotation, exc',
     [
-        #NOTE: 'valid' in credentials creates a real pair of tokens with session_id="1"
-        ('get_full_oauth_setup', 'get_valid_token_pair', True, False, appexc.LoggedOutException),
-        ('get_full_oauth_setup', 'get_valid_token_pair', False, True, appexc.TokenExpiredException),
-        ('get_full_oauth_setup', 'get_valid_token_pair', True, True, None)
+        ('get_full_oauth_setup', 'get_valid_token_pair', amod.RotationResult.NOT_FOUND, appexc.LoggedOutException),
+        ('get_full_oauth_setup', 'get_valid_token_pair', amod.RotationResult.REUSED, appexc.TokenExpiredException),
+        ('get_full_oauth_setup', 'get_valid_token_pair', amod.RotationResult.ROTATED, None)
     ],
     indirect=['get_full_oauth_setup','get_valid_token_pair']
 )
 @pytest.mark.asyncio
-async def test_SOAuth_refresh(get_full_oauth_setup, get_valid_token_pair, tokens_match: bool, session_exists:bool, exc):
+async def test_SOAuth_refresh(get_full_oauth_setup, get_valid_token_pair, rotation, exc):
     suite: SOAuthTestSuite = get_full_oauth_setup(True)
     payload = {'session_id':'some_uuid'}
     tokens:schemas.TokenResponse = get_valid_token_pair(payload)
+    suite.mock_sess_repo.rotate.return_value = rotation
+    if exc:
+        with pytest.raises(exc):
+            await suite.strat.refresh(tokens.refresh_token)
+    else:
+        new_tokens = await suite.strat.refresh(tokens.refresh_token)
+        assert isinstance(new_tokens, schemas.TokenResponse)
+        suite.mock_sess_repo.rotate.assert_awaited_once_with(
+            'some_uuid',
+            expected_hash=isec.hash_refresh_token(tokens.refresh_token),
+            new_hash=isec.hash_refresh_token(new_tokens.refresh_token),
+            ttl=suite.strat.refresh_expires_hours * 3600,
+        )
+    #one atomic call: the strategy neither reads nor rewrites the session itself
+    suite.mock_sess_repo.get_session.assert_not_awaited()
+    suite.mock_sess_repo.create.assert_not_awaited()
 
-    session = amod.RotatingTokenSession(
-        id='1',
-        user_id=1,
-        roles=['abc'],
-        refresh_token=tokens.refresh_token if tokens_match else 'some other non matching token'
-    )
+
+@pytest.mark.parametrize('get_full_oauth_setup, get_valid_token_pair, session_exists, exc', [
+    ('get_full_oauth_setup', 'get_valid_token_pair', True, None),
+    ('get_full_oauth_setup', 'get_valid_token_pair', False, appexc.LoggedOutException),
+], indirect=['get_full_oauth_setup','get_valid_token_pair'])
+@pytest.mark.asyncio
+async def test_SOAuth_logout_everywhere(get_full_oauth_setup, get_valid_token_pair, session_exists: bool, exc):
+    suite: SOAuthTestSuite = get_full_oauth_setup(True)
+    tokens: schemas.TokenResponse = get_valid_token_pair({'session_id':'some_uuid'})
+    session = amod.RotatingTokenSession(id='some_uuid', user_id=42, roles=['user'], refresh_token_hash=isec.hash_refresh_token(tokens.refresh_token))
     suite.mock_sess_repo.get_session.return_value = session if session_exists else None
+    suite.mock_sess_repo.delete_user_sessions.return_value = 3
+
+    with pytest.raises(appexc.CredentialsException):
+        await suite.strat.logout_everywhere({})
     if exc:
         with pytest.raises(exc):
-            await suite.strat.refresh(tokens.refresh_token)
+            await suite.strat.logout_everywhere({'token': tokens.access_token})
+        suite.mock_sess_repo.delete_user_sessions.assert_not_awaited()
     else:
-        tokens = await suite.strat.refresh(tokens.refresh_token)
-        assert isinstance(tokens, schemas.TokenResponse)
+        assert await suite.strat.logout_everywhere({'token': tokens.access_token}) == 3
+        suite.mock_sess_repo.delete_user_sessions.assert_awaited_once_with(42)
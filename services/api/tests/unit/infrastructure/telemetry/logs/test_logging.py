@@ -1,11 +1,14 @@
-import pytest, logging, io, json
+import pytest, logging, io, json, importlib
 import app.infrastructure.telemetry.logs as logs
 from app.common.config import Config
 import tests.mocks as m
 
-def test_logger_configuring(): #missing lines only
+def test_logger_configuring(monkeypatch): #missing lines only
     Config.JSON_LOGS = 1
     logger = logs.configure_logger('123')
+    assert isinstance(logger.handlers[0].formatter, logs.FastJsonFormatter)
+    monkeypatch.setattr(Config, 'LOG_JSON_FORMATTER', 'legacy')
+    logger = logs.configure_logger('123')
     assert isinstance(logger.handlers[0].formatter, logs.OTLPJsonFormatter)
     Config.JSON_LOGS = 0
     logger = logs.configure_logger('123')
@@ -34,3 +37,85 @@ def test_otlp_span_context(monkeypatch):
     assert span_id == f"{'0'*15}f"
 
 
+
+
+def test_queued_logger_flushes_on_shutdown(monkeypatch):
+    Config.JSON_LOGS = 1
+    log_stream = io.StringIO()
+    logger = logs.configure_logger('queued', log_stream, queued=True)
+    assert isinstance(logger.handlers[0], logs.BoundedQueueHandler)
+
+    logger.info({"method": "GET", "status": 200})
+    logger.info("%s-%s", "a", "b")
+    logs.shutdown_loggers()
+
+    lines = [json.loads(line) for line in log_stream.getvalue().splitlines()]
+    assert lines[0]['status'] == 200
+    assert lines[1]['message'] == 'a-b'
+
+    #after shutdown the logger writes synchronously
+    logger.info("late")
+    assert json.loads(log_stream.getvalue().splitlines()[-1])['message'] == 'late'
+
+
+def test_queue_handler_drops_when_full(mocker, monkeypatch):
+    dropped = mocker.MagicMock()
+    logmod = importlib.import_module('app.infrastructure.telemetry.logs.logging') #package attr `logging` is the stdlib module
+    monkeypatch.setattr(logmod, 'logs_dropped_total', dropped)
+
+    handler = logs.BoundedQueueHandler(logs.queue.Queue(maxsize=1))
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'msg', None, None)
+    handler.emit(record)
+    handler.emit(record)
+    assert handler.queue.qsize() == 1
+    dropped.add.assert_called_once_with(1, {"logger": "x", "level": "INFO"})
+
+
+def test_queue_handler_captures_span_on_emitting_thread(monkeypatch):
+    logmod = importlib.import_module('app.infrastructure.telemetry.logs.logging') #package attr `logging` is the stdlib module
+    monkeypatch.setattr(logmod, 'trace', m.DummyTraceProvider())
+    handler = logs.BoundedQueueHandler(logs.queue.Queue())
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'hello %s', ('world',), None)
+    prepared = handler.prepare(record)
+    assert prepared.msg == 'hello world' and prepared.args is None
+    assert prepared.trace_id == f"{'0'*31}f"
+    assert prepared.span_id == f"{'0'*15}f"
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_fast_formatter_matches_legacy_keys(use_orjson):
+    record = logging.LogRecord('app', logging.WARNING, __file__, 1, 'hello %s', ('world',), None)
+    record.request_id = 'abc' #extra=
+    legacy = json.loads(logs.OTLPJsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s", trace_provider=m.DummyTraceProvider()).format(record))
+    fast = json.loads(logs.FastJsonFormatter(trace_provider=m.DummyTraceProvider(), use_orjson=use_orjson).format(record))
+    assert fast.pop('asctime')
+    assert fast == legacy
+
+
+def test_fast_formatter_compact_and_dict_message():
+    formatter = logs.FastJsonFormatter(compact=True, trace_provider=m.DummyTraceProvider())
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, {"method": "GET", "status": 200}, None, None)
+    value = json.loads(formatter.format(record))
+    assert set(value) == {'level', 'logger', 'method', 'status', 'trace_id', 'span_id'}
+    assert value['status'] == 200
+
+
+def test_fast_formatter_exc_info():
+    formatter = logs.FastJsonFormatter(compact=True)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        import sys
+        record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'failed', None, sys.exc_info())
+    value = json.loads(formatter.format(record))
+    assert 'ValueError: boom' in value['exc_info']
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_fast_formatter_non_str_keys(use_orjson):
+    formatter = logs.FastJsonFormatter(compact=True, trace_provider=m.DummyTraceProvider(), use_orjson=use_orjson)
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, {1: 'one', 'status': 200}, None, None)
+    record.counts = {404: 3, None: 1} #extra=
+    value = json.loads(formatter.format(record))
+    assert value['1'] == 'one'
+    assert value['counts'] == {'404': 3, 'null': 1}
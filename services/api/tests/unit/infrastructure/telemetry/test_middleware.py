@@ -0,0 +1,145 @@
+import pytest, logging
+import app.infrastructure.telemetry.metrics.on_http_request as m
+from app.infrastructure.telemetry.middleware import TelemetryMiddleware, AccessLogPolicy
+from app.common.libs.drain import DrainCoordinator
+
+
+class MockRoute:
+    def __init__(self, url='/some/url'):
+        self.path = url
+
+def make_scope(method='GET', path='/users', route: str | None = None):
+    scope = {'type': 'http', 'method': method, 'path': path, 'client': ('127.0.0.1', 5000)}
+    if route:
+        scope['route'] = MockRoute(route)
+    return scope
+
+def make_app(status=200, exc: Exception | None = None, fail_after_start=False):
+    async def app(scope, receive, send):
+        if exc and not fail_after_start:
+            raise exc
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        if exc:
+            raise exc
+        await send({'type': 'http.response.body', 'body': b''})
+    return app
+
+async def receive():
+    return {'type': 'http.request', 'body': b''}
+
+@pytest.fixture
+def instruments(mocker, monkeypatch):
+    names = ('http_requests_total', 'http_requests_in_flight', 'auth_logins_total', 'http_request_duration_seconds',
+             'http_request_redis_seconds', 'http_request_db_seconds', 'http_request_bcrypt_seconds')
+    mocks = {name: mocker.MagicMock() for name in names}
+    for name, mock in mocks.items():
+        monkeypatch.setattr(m, name, mock)
+    return mocks
+
+
+@pytest.mark.asyncio
+async def test_telemetry_middleware_records_request(instruments):
+    sent = []
+    async def send(message):
+        sent.append(message)
+
+    drain = DrainCoordinator()
+    mw = TelemetryMiddleware(make_app(status=401), drain=drain)
+    await mw(make_scope('POST', '/api/auth/login', route='/auth/login'), receive, send)
+
+    assert sent[0]['status'] == 401
+    instruments['http_requests_total'].add.assert_called_once_with(1, {
+        "http_method": 'POST',
+        "http_target": '/auth/login',
+        "status_code": '401',
+    })
+    instruments['auth_logins_total'].add.assert_called_once_with(1, {'status': 'failure'})
+    assert [c.args[0] for c in instruments['http_requests_in_flight'].add.call_args_list] == [1, -1]
+    assert drain.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_telemetry_middleware_exception_becomes_500(instruments):
+    sent = []
+    async def send(message):
+        sent.append(message)
+
+    mw = TelemetryMiddleware(make_app(exc=RuntimeError('boom')))
+    await mw(make_scope(path='/unrouted'), receive, send)
+    assert sent[0]['status'] == 500
+    instruments['http_requests_total'].add.assert_called_once_with(1, {
+        "http_method": 'GET',
+        "http_target": '/unrouted',
+        "status_code": '500',
+    })
+    instruments['auth_logins_total'].add.assert_not_called()
+
+    #once the response has started, the exception must propagate
+    drain = DrainCoordinator()
+    mw = TelemetryMiddleware(make_app(exc=RuntimeError('boom'), fail_after_start=True), drain=drain)
+    with pytest.raises(RuntimeError):
+        await mw(make_scope(), receive, send)
+    assert drain.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_telemetry_middleware_passes_non_http(instruments):
+    called = []
+    async def app(scope, receive, send):
+        called.append(scope['type'])
+    await TelemetryMiddleware(app)({'type': 'lifespan'}, receive, None)
+    assert called == ['lifespan']
+    instruments['http_requests_total'].add.assert_not_called()
+
+
+@pytest.mark.parametrize('scope,status,duration_ms,expected', [
+    (make_scope(path='/api/health', route='/health'), 200, 1, None),
+    ({**make_scope(path='/api/metrics'), 'root_path': '/api'}, 200, 1, None),
+    (make_scope(path='/api/health', route='/health'), 503, 1, logging.ERROR),
+    (make_scope(path='/api/users/me', route='/users/me'), 200, 1, None), #sampled out
+    (make_scope(path='/api/users/me', route='/users/me'), 200, 900, logging.WARNING),
+    (make_scope(path='/api/users', route='/users'), 404, 1, logging.INFO),
+    (make_scope(path='/api/users', route='/users'), None, 1, logging.ERROR),
+])
+def test_access_log_policy(scope, status, duration_ms, expected):
+    policy = AccessLogPolicy(
+        route_sample_rates={'/users/me': 0.0},
+        exclude_paths=frozenset({'/health', '/metrics'}),
+        slow_request_ms=500,
+    )
+    assert policy.level_for(scope, status, duration_ms) == expected
+
+
+@pytest.mark.asyncio
+async def test_telemetry_middleware_applies_access_log_policy(instruments, caplog):
+    async def send(message):
+        pass
+    mw = TelemetryMiddleware(make_app(), policy=AccessLogPolicy(exclude_paths=frozenset({'/health'})))
+    with caplog.at_level(logging.INFO, logger='app'):
+        await mw(make_scope(path='/health', route='/health'), receive, send)
+        await mw(make_scope(path='/users', route='/users'), receive, send)
+    assert [r.msg['path'] for r in caplog.records] == ['/users']
+    assert 'duration_ms' in caplog.records[0].msg
+    assert instruments['http_requests_total'].add.call_count == 2 #metrics still count excluded paths
+
+
+@pytest.mark.asyncio
+async def test_telemetry_middleware_records_latency_histograms(instruments):
+    import app.infrastructure.telemetry.timing as timing
+    async def app(scope, receive, send):
+        timing.add(timing.BCRYPT, 0.25)
+        await send({'type': 'http.response.start', 'status': 201, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    async def send(message):
+        pass
+
+    await TelemetryMiddleware(app)(make_scope('POST', '/api/auth/login', route='/auth/login'), receive, send)
+    await TelemetryMiddleware(make_app(status=404))(make_scope(path='/nope'), receive, send)
+
+    calls = instruments['http_request_duration_seconds'].record.call_args_list
+    assert [c.args[1] for c in calls] == [
+        {'http_route': '/auth/login', 'http_method': 'POST', 'status_class': '2xx'},
+        {'http_route': 'unmatched', 'http_method': 'GET', 'status_class': '4xx'},
+    ]
+    instruments['http_request_bcrypt_seconds'].record.assert_called_once_with(0.25, {'http_route': '/auth/login', 'http_method': 'POST'})
+    instruments['http_request_redis_seconds'].record.assert_not_called()
@@ -0,0 +1,49 @@
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider, TraceBasedExemplarFilter
+from opentelemetry.sdk.trace import TracerProvider
+from prometheus_client import REGISTRY, generate_latest as generate_text
+from prometheus_client.openmetrics.exposition import generate_latest
+from prometheus_client.openmetrics.parser import text_string_to_metric_families
+from app.infrastructure.telemetry.prometheus import ExemplarPrometheusMetricReader
+import app.common.libs.prom_multiproc as prom_mp
+
+
+@pytest.fixture
+def reader():
+    reader = ExemplarPrometheusMetricReader(disable_target_info=True)
+    provider = MeterProvider(metric_readers=[reader], exemplar_filter=TraceBasedExemplarFilter())
+    yield reader, provider.get_meter('test')
+    provider.shutdown() #unregisters the collector from the global REGISTRY
+
+def buckets(text: str, name: str) -> dict[str, object]:
+    return {
+        sample.labels['le']: sample
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+        if sample.name == f'{name}_bucket'
+    }
+
+
+def test_sampled_measurement_exports_trace_id_exemplar(reader):
+    _, meter = reader
+    histogram = meter.create_histogram('test_exemplar_seconds', explicit_bucket_boundaries_advisory=[0.1, 1.0])
+    tracer = TracerProvider().get_tracer('test')
+
+    histogram.record(0.05, {'http.route': '/users'}) #outside a span: no exemplar
+    with tracer.start_as_current_span('request') as span:
+        histogram.record(0.5, {'http.route': '/users'})
+    trace_id = format(span.get_span_context().trace_id, '032x')
+
+    dump = generate_latest(REGISTRY).decode() #what a worker writes
+    samples = buckets(dump, 'test_exemplar_seconds')
+    assert samples['0.1'].exemplar is None
+    assert samples['1.0'].exemplar.labels['trace_id'] == trace_id
+    assert samples['1.0'].exemplar.value == 0.5
+    assert samples['1.0'].labels['http_route'] == '/users'
+
+    #the master's merge keeps it
+    merged = prom_mp.render(prom_mp.aggregate([dump, dump]))
+    assert buckets(merged.decode(), 'test_exemplar_seconds')['1.0'].exemplar.labels['trace_id'] == trace_id
+
+    #text format scrapes are unaffected
+    assert 'test_exemplar_seconds_bucket{http_route="/users",le="1.0"} 2.0' in generate_text(REGISTRY).decode()
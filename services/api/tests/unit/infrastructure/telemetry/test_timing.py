@@ -0,0 +1,37 @@
+import pytest, asyncio
+import app.infrastructure.telemetry.timing as timing
+
+
+@pytest.mark.asyncio
+async def test_timings_accumulate_across_request_tasks():
+    async def query():
+        with timing.timed(timing.DB):
+            await asyncio.sleep(0.01)
+
+    token = timing.start()
+    await asyncio.gather(query(), query())
+    with timing.timed(timing.REDIS):
+        pass
+    timings = timing.finish(token)
+
+    assert timings[timing.DB] >= 0.02
+    assert set(timings) == {timing.DB, timing.REDIS}
+
+
+def test_timings_outside_request_are_ignored():
+    timing.add(timing.BCRYPT, 1.0) #no accumulator: no error, nothing recorded
+    token = timing.start()
+    assert timing.finish(token) == {}
+
+
+def test_sqlalchemy_statements_are_timed():
+    from sqlalchemy import create_engine, text
+    engine = create_engine('sqlite://')
+    timing.instrument_sqlalchemy(engine)
+    token = timing.start()
+    with engine.connect() as conn:
+        conn.execute(text('select 1'))
+        with pytest.raises(Exception):
+            conn.execute(text('select * from missing_table'))
+    timings = timing.finish(token)
+    assert timings[timing.DB] > 0
@@ -6,6 +6,7 @@ def get_otel_tracer(monkeypatch):
     import app.infrastructure.telemetry.traces.otel_tracer as m
     
     monkeypatch.setattr(m.trace, 'get_tracer', mocks.DummyTraceProvider)
+    monkeypatch.setattr(m, '_tracers', {})
     return m.OTELTracer #here we return the class, since most of methods are static
 
 def test_otel_start_span_and_get_id(get_otel_tracer):
@@ -42,4 +43,36 @@ async def test_otel_traced_decorator(get_otel_tracer):
     wrapped_bar = tracer_cls.traced(bar)
     assert wrapped_bar(x) == x*3
     with pytest.raises(ValueError):
-        wrapped_bar(x, err=True)
\ No newline at end of file
+        wrapped_bar(x, err=True)
+
+
+def test_otel_tracer_caches_tracers(get_otel_tracer):
+    tracer_cls = get_otel_tracer
+    assert tracer_cls('abc')._tracer is tracer_cls('abc')._tracer
+
+
+def test_otel_disabled_mode(get_otel_tracer, monkeypatch):
+    from app.common.config import Config
+    from opentelemetry import trace
+    monkeypatch.setattr(Config, 'TRACING_ENABLED', False)
+    tracer_cls = get_otel_tracer
+
+    def bar(arg: int):
+        return arg * 3
+    assert tracer_cls.traced(bar) is bar
+    with tracer_cls.start_span('123') as span:
+        assert span is trace.INVALID_SPAN
+
+
+def test_otel_traced_skips_unsampled_parent(get_otel_tracer, mocker):
+    from opentelemetry import trace
+    tracer_cls = get_otel_tracer
+    wrapped = tracer_cls.traced(lambda: 1)
+    start = mocker.spy(mocks.DummyTraceProvider, 'start_as_current_span')
+
+    unsampled = trace.NonRecordingSpan(trace.SpanContext(1, 1, is_remote=False, trace_flags=trace.TraceFlags(0)))
+    with trace.use_span(unsampled):
+        assert wrapped() == 1
+    start.assert_not_called()
+    assert wrapped() == 1
+    start.assert_called_once()
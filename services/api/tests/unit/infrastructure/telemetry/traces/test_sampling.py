@@ -0,0 +1,104 @@
+import pytest, time, threading
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+import app.infrastructure.telemetry.traces.sampling as sampling
+
+
+@pytest.fixture
+def counters(mocker, monkeypatch):
+    mocks = {name: mocker.MagicMock() for name in ('spans_dropped_total', 'traces_tail_decisions_total')}
+    for name, mock in mocks.items():
+        monkeypatch.setattr(sampling, name, mock)
+    return mocks
+
+def make_tracer(**kwargs):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(sampling.TailSamplingSpanProcessor(SimpleSpanProcessor(exporter), **kwargs))
+    return provider.get_tracer('test'), exporter
+
+
+def test_tail_sampling_keeps_error_and_slow_traces(counters):
+    tracer, exporter = make_tracer(keep_ratio=0.0, slow_ms=20)
+
+    with tracer.start_as_current_span('fast'):
+        with tracer.start_as_current_span('child'):
+            pass
+    assert exporter.get_finished_spans() == ()
+    counters['spans_dropped_total'].add.assert_called_once_with(2, {'reason': 'tail_sampled'})
+
+    with tracer.start_as_current_span('failed'):
+        with tracer.start_as_current_span('child') as child:
+            child.set_status(Status(StatusCode.ERROR))
+    assert [s.name for s in exporter.get_finished_spans()] == ['child', 'failed']
+
+    exporter.clear()
+    with tracer.start_as_current_span('slow'):
+        time.sleep(0.03)
+    assert [s.name for s in exporter.get_finished_spans()] == ['slow']
+    decisions = [c.args[1]['decision'] for c in counters['traces_tail_decisions_total'].add.call_args_list]
+    assert decisions == ['dropped', 'error', 'slow']
+
+
+def test_tail_sampling_ratio_and_buffer_bound(counters):
+    tracer, exporter = make_tracer(keep_ratio=1.0, max_traces=1)
+    with tracer.start_as_current_span('kept'):
+        pass
+    assert [s.name for s in exporter.get_finished_spans()] == ['kept']
+
+    #two unfinished local traces with a buffer of one: the oldest one is evicted
+    processor = sampling.TailSamplingSpanProcessor(SimpleSpanProcessor(exporter), max_traces=1)
+    with tracer.start_as_current_span('a') as a, tracer.start_as_current_span('a-child') as a_child:
+        pass
+    with tracer.start_as_current_span('b') as b, tracer.start_as_current_span('b-child') as b_child:
+        pass
+    processor.on_end(a_child)
+    processor.on_end(b_child)
+    assert list(processor._traces) == [b_child.context.trace_id]
+    counters['spans_dropped_total'].add.assert_called_with(1, {'reason': 'buffer_full'})
+
+
+def test_build_sampler():
+    assert 'AlwaysOnSampler' in sampling.build_sampler(1.0).get_description()
+    assert 'TraceIdRatioBased{0.25}' in sampling.build_sampler(0.25).get_description()
+
+
+class BlockingExporter(InMemorySpanExporter):
+    """Holds the processor's worker in export() until released"""
+    def __init__(self):
+        super().__init__()
+        self.entered, self.release = threading.Event(), threading.Event()
+
+    def export(self, spans):
+        self.entered.set()
+        self.release.wait(5)
+        return super().export(spans)
+
+def test_batch_processor_counts_queue_full_drops(counters):
+    exporter = BlockingExporter()
+    processor = sampling.CountingBatchSpanProcessor(exporter, max_queue_size=2, max_export_batch_size=1, schedule_delay_millis=60_000)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer('test')
+
+    def end_span(name: str):
+        with tracer.start_as_current_span(name):
+            pass
+
+    end_span('span0')
+    assert exporter.entered.wait(5) #span0 left the queue, the exporter is stuck: spans pile up
+    for i in range(1, 5):
+        end_span(f'span{i}')
+    assert counters['spans_dropped_total'].add.call_count == 2
+    counters['spans_dropped_total'].add.assert_called_with(1, {'reason': 'queue_full'})
+
+    exporter.release.set()
+    assert processor.force_flush()
+    assert [span.name for span in exporter.get_finished_spans()] == ['span0', 'span1', 'span2']
+
+    end_span('span5') #exported spans free the queue again
+    provider.shutdown()
+    assert counters['spans_dropped_total'].add.call_count == 2
+    assert exporter.get_finished_spans()[-1].name == 'span5'
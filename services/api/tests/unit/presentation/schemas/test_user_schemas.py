@@ -1,5 +1,6 @@
 import pytest
 import app.presentation.schemas as schemas
+import app.domain.models as dmod
 
 @pytest.mark.models
 def test_empty_string_to_none_conversion():
@@ -11,4 +12,12 @@ def test_empty_string_to_none_conversion():
     model = schemas.PublicUserUpdateModel(**data)
     assert model.username is None
     assert model.old_password is None
-    assert model.new_password is None
\ No newline at end of file
+    assert model.new_password is None
+
+@pytest.mark.models
+def test_user_dto_from_user_matches_validation():
+    user = dmod.User(id=3, username='test', password_hash='somehash', role='admin', status='active', version=1)
+    dto = schemas.UserDTO.from_user(user)
+    assert dto == schemas.UserDTO.model_validate(user, from_attributes=True)
+    assert dto.is_admin
+    assert dto.model_dump_json() == schemas.UserDTO.model_validate(user, from_attributes=True).model_dump_json()
@@ -0,0 +1,31 @@
+import json
+import app.presentation.responses as responses
+import app.presentation.schemas as schemas
+
+
+def make_users(n: int) -> list[schemas.UserDTO]:
+    return [schemas.UserDTO(id=i, username=f'user{i}', role='admin' if i == 0 else 'user', status='active') for i in range(n)]
+
+
+def test_serializer_matches_response_model_output():
+    users = make_users(3)
+    response = responses.UserListSerializer.response(users)
+    assert response.media_type == 'application/json'
+    assert response.status_code == 200
+    assert json.loads(response.body) == [user.model_dump(mode='json') for user in users]
+
+
+def test_serializer_status_and_single_models():
+    response = responses.UserSerializer.response(make_users(1)[0], status_code=201)
+    assert response.status_code == 201
+    assert json.loads(response.body) == {'id': 0, 'username': 'user0', 'role': 'admin', 'status': 'active'}
+
+    tokens = schemas.TokenResponse(access_token='a', refresh_token='r', access_expires=1.5, refresh_expires=2.5)
+    assert json.loads(responses.TokenSerializer.dump_json(tokens)) == tokens.model_dump()
+
+
+def test_default_response_is_orjson():
+    from fastapi.responses import ORJSONResponse
+    import app.main as main
+    assert main.app.router.default_response_class is ORJSONResponse
+    assert json.loads(responses.DefaultResponse({'detail': 'ü'}).body) == {'detail': 'ü'}
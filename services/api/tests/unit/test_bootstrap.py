@@ -0,0 +1,45 @@
+import pytest
+import app.bootstrap as bootstrap
+
+
+def test_boot_timer_records_phases(mocker, monkeypatch):
+    histogram = mocker.MagicMock()
+    monkeypatch.setattr(bootstrap, 'boot_phase_seconds', histogram)
+    timer = bootstrap.BootTimer('worker')
+    with timer.phase('redis_wait'):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.phase('db_wait'):
+            raise RuntimeError()
+    phases = timer.finish()
+    assert list(phases) == ['redis_wait', 'db_wait']
+    recorded = [c.args[1] for c in histogram.record.call_args_list]
+    assert recorded == [
+        {'stage': 'worker', 'phase': 'redis_wait'},
+        {'stage': 'worker', 'phase': 'db_wait'},
+        {'stage': 'worker', 'phase': 'total'},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_workers_skip_bootstrap_done_by_master(mocker, monkeypatch):
+    monkeypatch.setenv(bootstrap.BOOTSTRAP_DONE_ENV, '1')
+    cache_mgr, db_mgr = mocker.MagicMock(), mocker.MagicMock()
+    await bootstrap.ensure_bootstrapped(cache_mgr, db_mgr)
+    assert cache_mgr.mock_calls == [] and db_mgr.mock_calls == []
+
+
+def test_master_bootstraps_in_child_interpreter(mocker, monkeypatch):
+    monkeypatch.delenv(bootstrap.BOOTSTRAP_DONE_ENV, raising=False)
+    run = mocker.patch.object(bootstrap.subprocess, 'run', return_value=mocker.MagicMock(returncode=0))
+    bootstrap.bootstrap_in_master()
+    assert run.call_args.args[0][1:] == ['-m', 'app.bootstrap']
+    assert bootstrap.os.environ[bootstrap.BOOTSTRAP_DONE_ENV] == '1'
+
+
+def test_master_does_not_start_workers_when_bootstrap_fails(mocker, monkeypatch):
+    monkeypatch.delenv(bootstrap.BOOTSTRAP_DONE_ENV, raising=False)
+    mocker.patch.object(bootstrap.subprocess, 'run', return_value=mocker.MagicMock(returncode=1))
+    with pytest.raises(RuntimeError):
+        bootstrap.bootstrap_in_master()
+    assert bootstrap.BOOTSTRAP_DONE_ENV not in bootstrap.os.environ
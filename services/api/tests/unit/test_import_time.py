@@ -0,0 +1,63 @@
+#Worker boot time regression: `python -X importtime -c "import app.main"` in a clean interpreter
+import pytest, subprocess, sys, os, pathlib
+
+API_ROOT = pathlib.Path(__file__).resolve().parents[2]
+#Cumulative import time of app.main. ~1.1s on a dev machine; generous to absorb slow CI runners
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+#Loaded on first use / only when enabled, never by `import app.main` itself
+LAZY_MODULES = ('celery.app', 'grpc', 'opentelemetry.exporter.otlp', 'opentelemetry.exporter.prometheus', 'httpx', 'tzlocal')
+
+
+def run_python(code: str, *args: str, **env: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, '-c', code],
+        cwd=API_ROOT,
+        env=os.environ | {'MODE': 'test'} | env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """module -> cumulative import time, us"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.fixture(scope='module')
+def imported_modules() -> dict[str, int]:
+    return parse_importtime(run_python('import app.main', '-X', 'importtime', TRACING_ENABLED='0').stderr)
+
+
+def test_app_main_import_time_within_budget(imported_modules):
+    assert imported_modules['app.main'] / 1000 < IMPORT_TIME_BUDGET_MS
+
+
+@pytest.mark.parametrize('module', LAZY_MODULES)
+def test_heavy_modules_are_not_imported(imported_modules, module):
+    loaded = [name for name in imported_modules if name == module or name.startswith(f'{module}.')]
+    assert loaded == []
+
+
+def test_instrumentors_are_imported_only_with_tracing(imported_modules):
+    assert 'opentelemetry.instrumentation.redis' not in imported_modules
+    with_tracing = parse_importtime(run_python('import app.main', '-X', 'importtime', TRACING_ENABLED='1').stderr)
+    assert 'opentelemetry.instrumentation.redis' in with_tracing
+
+
+def test_celery_is_built_on_first_use():
+    code = (
+        "import sys, app.main\n"
+        "import app.infrastructure.dependencies as idep\n"
+        "assert 'celery.app' not in sys.modules\n"
+        "assert idep.TaskProcessor.celery is idep._celery\n"
+        "assert idep.TaskProcessorType is type(idep.TaskProcessor)\n"
+        "assert idep._celery.main\n"
+    )
+    run_python(code)